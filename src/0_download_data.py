@@ -1,9 +1,11 @@
 import os
-import urllib.request
+import sys
 import csv
-import ssl
+import argparse
+from tqdm import tqdm
 
-from src.utils import METADATA_URL, AUDIO_BASE_URL, METADATA_FILENAME as METADATA_FILE, DATA_DIR, ensure_dir
+from src.utils import ESC50_URL, METADATA_PATH, AUDIO_PATH, METADATA_FILENAME as METADATA_FILE, DATA_DIR, ensure_dir
+from src.downloader import WORKERS, DownloadError, make_source, fetch_file, download_all
 
 # Target Categories (Map our folder names to ESC-50 categories)
 TARGET_MAP = {
@@ -15,21 +17,21 @@ TARGET_MAP = {
 # Limit samples per category to save time/bandwidth (ESC-50 has 40 per class)
 SAMPLES_PER_CLASS = 40 
 
-def download_file(url, save_path):
-    try:
-        # bypass SSL verification for simplicity in some envs
-        context = ssl._create_unverified_context()
-        with urllib.request.urlopen(url, context=context) as response, open(save_path, 'wb') as out_file:
-            data = response.read()
-            out_file.write(data)
-        return True
-    except Exception as e:
-        print(f"Failed to download {url}: {e}")
-        return False
+# Size + SHA-256 of completed downloads (re-runs skip intact files)
+MANIFEST_FILE = os.path.join(DATA_DIR, "download_manifest.json")
+
+def main(source=ESC50_URL, workers=WORKERS):
+    """
+    source: base URL or local directory with the ESC-50 layout (meta/esc50.csv, audio/*.wav).
+    """
+    source = make_source(source)
 
-def main():
     print("Downloading metadata...")
-    download_file(METADATA_URL, METADATA_FILE)
+    try:
+        fetch_file(source, METADATA_PATH, METADATA_FILE)
+    except DownloadError as e:
+        print(f"Failed to download metadata: {e}")
+        sys.exit(1)
 
     # Read CSV
     files_to_download = {'gunshot': [], 'chainsaw': [], 'background': []}
@@ -46,26 +48,28 @@ def main():
                     if len(files_to_download[folder]) < SAMPLES_PER_CLASS:
                         files_to_download[folder].append(filename)
 
-    # Download Audio
-    print(f"Starting Download ({SAMPLES_PER_CLASS} samples per class)...")
+    # Download Audio: (source path, path under DATA_DIR)
+    jobs = []
     for folder, files in files_to_download.items():
-        save_dir = os.path.join(DATA_DIR, folder)
-        ensure_dir(save_dir)
-        
-        print(f"Downloading {len(files)} files for '{folder}'...")
-        for filename in files:
-            url = AUDIO_BASE_URL + filename
-            save_path = os.path.join(save_dir, filename)
-            if not os.path.exists(save_path):
-                print(f"Fetching {filename}...")
-                download_file(url, save_path)
-            else:
-                print(f"Skipping {filename} (exists)")
-    
+        ensure_dir(os.path.join(DATA_DIR, folder))
+        jobs.extend((AUDIO_PATH + filename, os.path.join(folder, filename)) for filename in files)
+
+    print(f"Starting Download ({SAMPLES_PER_CLASS} samples per class, {workers} threads)...")
+    with tqdm(total=len(jobs), desc="Downloading") as pbar:
+        counts = download_all(source, jobs, DATA_DIR, MANIFEST_FILE, workers=workers, progress=pbar)
+    print(f"Downloaded {counts['downloaded']}, skipped {counts['skipped']} (already complete), failed {counts['failed']}.")
+
     # Cleanup
     if os.path.exists(METADATA_FILE):
         os.remove(METADATA_FILE)
+    if counts['failed']:
+        print(f"Download incomplete: {counts['failed']} files failed (re-run to retry them).")
+        sys.exit(1)
     print("Download Complete.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Download the ESC-50 clips used for training.")
+    parser.add_argument("--source", default=ESC50_URL, help="Base URL or local ESC-50 mirror directory")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Download threads")
+    args = parser.parse_args()
+    main(args.source, args.workers)
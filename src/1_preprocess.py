@@ -1,16 +1,37 @@
 import os
+import time
 import numpy as np
 import librosa
 from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Constants
 # Constants
 # Constants
-from src.utils import DATA_DIR as BASE_DATA_DIR, SYNTHETIC_DIR, CLASSES, SAMPLE_RATE, DURATION, N_MELS, N_FFT, HOP_LENGTH, ensure_dir
+from src.utils import DATA_DIR as BASE_DATA_DIR, SYNTHETIC_DIR, SYNTHETIC_SHARD_DIR, SYNTHETIC_FORMAT, CLASSES, SAMPLE_RATE, DURATION, N_MELS, N_FFT, HOP_LENGTH, ensure_dir, file_digest
+from src.feature_cache import FeatureCache
+from src.features import log_mel_spectrogram, stft_power, power_to_mel, power_to_db
+from src.augment import add_noise, pitch_shift_power
+from src.shard_dataset import ShardDataset
+from src import source_cache
 
 # Constants
 DATA_DIR = SYNTHETIC_DIR
 OUTPUT_DIR = BASE_DATA_DIR
+NUM_VERSIONS = 4  # Clips per file from augment_features (original, noise, pitch -2, pitch +2)
+NOISE_FACTOR = 0.005
+PITCH_STEPS = [-2.0, 2.0]
+WORKERS = os.cpu_count()
+FILES_PER_TASK = 16
+SEED = 42  # Per-file noise is seeded from (SEED, file content), so output does not depend on WORKERS
+USE_CACHE = True
+
+# Everything that changes the features of a file (keys the feature cache)
+FEATURE_PARAMS = {
+    "sample_rate": SAMPLE_RATE, "n_mels": N_MELS, "n_fft": N_FFT, "hop_length": HOP_LENGTH, "duration": DURATION,
+    "num_versions": NUM_VERSIONS, "noise_factor": NOISE_FACTOR, "pitch_steps": PITCH_STEPS, "seed": SEED,
+    "augment": "spectrogram",  # Pitch shift domain (was per-clip librosa.effects.pitch_shift)
+}
 
 def extract_features(file_path):
     try:
@@ -25,101 +46,189 @@ def extract_features(file_path):
             audio = audio[:target_length]
 
         # Extract Mel-Spectrogram
-        mel_spec = librosa.feature.melspectrogram(y=audio, sr=SAMPLE_RATE, n_mels=N_MELS, n_fft=N_FFT, hop_length=HOP_LENGTH)
-        mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max)
-        
         # Shape: (n_mels, time_steps) -> (n_mels, time_steps, 1) for CNN
-        return mel_spec_db[..., np.newaxis]
+        return featurize(audio)
     except Exception as e:
         print(f"Error processing {file_path}: {e}")
         return None
 
-def augment_audio(audio, sr):
-    """Generate augmented versions of the audio."""
-    augmented_data = []
-    
-    # 1. Original
-    augmented_data.append(audio)
-    
-    # 2. White Noise
-    noise_factor = 0.005
-    noise = np.random.randn(len(audio))
-    augmented_data.append(audio + noise_factor * noise)
-    
-    # 3. Time Stretch (Speed up and Slow down) - simplified resampling
-    # Note: librosa.effects.time_stretch requires spectrogram or complex audio
-    # Using simple resampling for speed variation
-    for rate in [0.9, 1.1]:
-        try:
-             # Resample
-             new_len = int(len(audio) / rate)
-             # Basic interpolation (using numpy for simplicity to avoid heavy librosa dependency in augmentation loop if possible, 
-             # but librosa.resample is safer. Let's stick to simple noise/pitch for stability or use reliable methods)
-             # Actually, let's stick to safe augmentations that don't change array size unpredictably
-             pass
-        except:
-             pass
-
-    # 3. Pitch Shift (using librosa - might send warning but effective)
-    try:
-        # Shift -2 and +2 semitones
-        augmented_data.append(librosa.effects.pitch_shift(audio, sr=sr, n_steps=-2.0))
-        augmented_data.append(librosa.effects.pitch_shift(audio, sr=sr, n_steps=2.0))
-    except Exception as e:
-        pass # Skip if fails
-        
-    return augmented_data
+def augment_features(audio, rng=None):
+    """
+    Features of the augmented versions of a clip, shape (NUM_VERSIONS, n_mels, time_steps, 1):
+    original, white noise, and one pitch shift per PITCH_STEPS.
+    Pitch shifts are applied to the STFT power (no audio round trip), see src/augment.py.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+
+    # 1. Original, 2. White Noise
+    audio_versions = np.stack([audio, add_noise(audio[np.newaxis], NOISE_FACTOR, rng)[0]])
+    power = stft_power(audio_versions)
+
+    # 3. Pitch Shift (-2 and +2 semitones) of the original
+    pitched = pitch_shift_power(np.repeat(power[:1], len(PITCH_STEPS), axis=0), PITCH_STEPS)
+
+    mel_spec_db = power_to_db(power_to_mel(np.concatenate([power, pitched])))
+    return mel_spec_db[..., np.newaxis]
 
-def main():
-    X, y = [], []
-    
-    print("Starting Feature Extraction with Augmentation...")
+def list_files():
+    """Returns sorted (file_path, label_idx) pairs so row offsets are stable between runs."""
+    files = []
     for idx, label in enumerate(CLASSES):
         folder_path = os.path.join(DATA_DIR, label)
         if not os.path.exists(folder_path):
             print(f"Warning: Folder {folder_path} not found. Skipping.")
             continue
-            
-        files = [f for f in os.listdir(folder_path) if f.endswith('.wav')]
-        for file in tqdm(files, desc=f"Processing {label}"):
-            file_path = os.path.join(folder_path, file)
-            
-            try:
-                # Load audio once
-                raw_audio, _ = librosa.load(file_path, sr=SAMPLE_RATE, duration=DURATION)
-                
-                # Pad/Truncate
-                target_length = int(SAMPLE_RATE * DURATION)
-                if len(raw_audio) < target_length:
-                    raw_audio = np.pad(raw_audio, (0, target_length - len(raw_audio)))
-                else:
-                    raw_audio = raw_audio[:target_length]
-                    
-                # Augment
-                augmented_versions = augment_audio(raw_audio, SAMPLE_RATE)
-                
-                # Extract Features for each version
-                for audio_ver in augmented_versions:
-                    mel_spec = librosa.feature.melspectrogram(y=audio_ver, sr=SAMPLE_RATE, n_mels=N_MELS, n_fft=N_FFT, hop_length=HOP_LENGTH)
-                    mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max)
-                    feature = mel_spec_db[..., np.newaxis]
-                    
-                    X.append(feature)
-                    y.append(idx)
-                    
-            except Exception as e:
-                print(f"Error processing {file_path}: {e}")
-
-    X = np.array(X)
-    y = np.array(y)
-
-    print(f"Feature Extraction Complete.")
-    print(f"X shape: {X.shape}")
-    print(f"y shape: {y.shape}")
+        names = sorted(f for f in os.listdir(folder_path) if f.endswith('.wav'))
+        files.extend((os.path.join(folder_path, f), idx) for f in names)
+    return files
+
+def list_shard_items():
+    """(shard dataset index, label_idx) pairs and their stored content digests, in manifest order."""
+    dataset = shard_source()
+    return [(i, int(label)) for i, label in enumerate(dataset.labels)], [r["digest"] for r in dataset.records]
+
+# Synthetic shards, opened once per process (memory-mapped, so workers share the page cache)
+_shards = None
+
+def shard_source():
+    global _shards
+    if _shards is None:
+        _shards = ShardDataset(SYNTHETIC_SHARD_DIR)
+    return _shards
 
+def load_source(source):
+    """A clip from a WAV path, or row `source` of the synthetic shards (already SAMPLE_RATE / DURATION)."""
+    if isinstance(source, str):
+        return load_clip(source)
+    return shard_source()[source]
+
+def load_clip(file_path):
+    """Audio resampled to 16kHz and padded/truncated to DURATION, from the source cache."""
+    return source_cache.load_clip(file_path)
+
+def featurize(audio):
+    """
+    Mel-Spectrogram in dB, shape (n_mels, time_steps, 1) for CNN.
+    Also accepts a batch (N, samples) -> (N, n_mels, time_steps, 1).
+    """
+    return log_mel_spectrogram(audio)[..., np.newaxis]
+
+def process_files(x_path, items, use_cache=USE_CACHE):
+    """
+    Worker task: featurizes files and writes them straight into the memory-mapped X.npy.
+    items: (file_idx, file path or shard index, digest); file i owns rows [i * NUM_VERSIONS, (i + 1) * NUM_VERSIONS).
+    New features are also stored in the feature cache. Returns [(file_idx, number of valid rows)].
+    """
+    X = np.load(x_path, mmap_mode='r+')
+    cache = FeatureCache(FEATURE_PARAMS) if use_cache else None
+    counts = []
+    for file_idx, file_path, digest in items:
+        try:
+            raw_audio = load_source(file_path)
+            rng = np.random.default_rng([SEED, int(digest[:16], 16)])
+            features = augment_features(raw_audio, rng)
+            X[file_idx * NUM_VERSIONS:file_idx * NUM_VERSIONS + len(features)] = features
+            if cache:
+                cache.put(digest, features)
+            counts.append((file_idx, len(features)))
+        except Exception as e:
+            print(f"Error processing {file_path}: {e}")
+            counts.append((file_idx, 0))
+    X.flush()
+    del X
+    return counts
+
+def compact(path, keep, chunk_rows=4096):
+    """Rewrites a .npy file keeping only the rows in the boolean mask (chunked, out-of-core)."""
+    src = np.load(path, mmap_mode='r')
+    tmp_path = path + ".tmp.npy"
+    dst = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=src.dtype, shape=(int(keep.sum()), *src.shape[1:]))
+    out = 0
+    for start in range(0, len(src), chunk_rows):
+        rows = src[start:start + chunk_rows][keep[start:start + chunk_rows]]
+        dst[out:out + len(rows)] = rows
+        out += len(rows)
+    dst.flush()
+    del src, dst
+    os.replace(tmp_path, path)
+
+def main(workers=WORKERS, use_cache=USE_CACHE, fmt=SYNTHETIC_FORMAT):
+    if fmt == "shards":
+        files, digests = list_shard_items()  # Digests come from the manifest: nothing to hash
+    else:
+        files = list_files()
+        digests = None
+        # Decode new or changed files once (in parallel) so workers only read the cache
+        for label in CLASSES:
+            folder = os.path.join(DATA_DIR, label)
+            if os.path.isdir(folder):
+                source_cache.load_folder(folder, workers)
+    n_rows = len(files) * NUM_VERSIONS
+
+    print(f"Starting Feature Extraction with Augmentation ({len(files)} {'clips' if fmt == 'shards' else 'files'}, {workers} workers)...")
     ensure_dir(OUTPUT_DIR)
-    np.save(os.path.join(OUTPUT_DIR, "X.npy"), X)
-    np.save(os.path.join(OUTPUT_DIR, "y.npy"), y)
+    x_path = os.path.join(OUTPUT_DIR, "X.npy")
+    y_path = os.path.join(OUTPUT_DIR, "y.npy")
+
+    # Preallocate outputs on disk; workers fill X at known offsets
+    n_frames = 1 + int(SAMPLE_RATE * DURATION) // HOP_LENGTH
+    X = np.lib.format.open_memmap(x_path, mode='w+', dtype=np.float32, shape=(n_rows, N_MELS, n_frames, 1))
+    y = np.lib.format.open_memmap(y_path, mode='w+', dtype=np.int64, shape=(n_rows,))
+    y[:] = np.repeat([idx for _, idx in files], NUM_VERSIONS)
+
+    counts = np.zeros(len(files), dtype=np.int64)
+    if digests is None:
+        digests = [file_digest(path) for path, _ in tqdm(files, desc="Hashing", unit="file")]
+
+    # Reuse cached features of unchanged files
+    misses = []
+    cache = FeatureCache(FEATURE_PARAMS) if use_cache else None
+    for file_idx, ((file_path, _), digest) in enumerate(zip(files, digests)):
+        features = cache.get(digest) if cache else None
+        if features is None:
+            misses.append((file_idx, file_path, digest))
+        else:
+            X[file_idx * NUM_VERSIONS:file_idx * NUM_VERSIONS + len(features)] = features
+            counts[file_idx] = len(features)
+    X.flush()
+    del X, y
+    if cache:
+        print(f"Feature cache: {len(files) - len(misses)} hits, {len(misses)} misses.")
+
+    tasks = [misses[start:start + FILES_PER_TASK] for start in range(0, len(misses), FILES_PER_TASK)]
+    start_time = time.perf_counter()
+
+    with tqdm(total=len(misses), desc="Extracting", unit="file") as pbar:
+        def record(file_counts):
+            for file_idx, count in file_counts:
+                counts[file_idx] = count
+            pbar.update(len(file_counts))
+            pbar.set_postfix(clips_per_s=f"{pbar.n * NUM_VERSIONS / (time.perf_counter() - start_time):.0f}")
+
+        if workers <= 1:
+            for task in tasks:
+                record(process_files(x_path, task, use_cache))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for future in as_completed([pool.submit(process_files, x_path, task, use_cache) for task in tasks]):
+                    record(future.result())
+
+    elapsed = time.perf_counter() - start_time
+
+    # Drop rows of failed files
+    keep = (np.arange(NUM_VERSIONS)[None, :] < counts[:, None]).reshape(-1)
+    if not keep.all():
+        compact(x_path, keep)
+        compact(y_path, keep)
+
+    if cache:
+        cache.evict(digests)
+
+    X = np.load(x_path, mmap_mode='r')
+    y = np.load(y_path, mmap_mode='r')
+    print(f"Feature Extraction Complete in {elapsed:.1f} s ({len(misses) * NUM_VERSIONS / max(elapsed, 1e-9):.0f} clips/s).")
+    print(f"X shape: {X.shape}")
+    print(f"y shape: {y.shape}")
     print("Features saved to ./data/X.npy and ./data/y.npy")
 
 if __name__ == "__main__":
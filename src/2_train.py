@@ -1,4 +1,5 @@
 import os
+import sys
 import numpy as np
 import tensorflow as tf
 from tensorflow.keras import layers, models, optimizers
@@ -15,41 +16,56 @@ BATCH_SIZE = 128
 EPOCHS = 3 # Reduced for faster turnover, dataset is large enough for quick convergence
 # INPUT_SHAPE imported from utils
 
-def build_ds_cnn(input_shape, num_classes):
+# "arrays": train on X.npy / y.npy from 1_preprocess.py
+# "stream": mix source clips from data/<class>/ on the fly (no synthetic WAVs or X.npy needed;
+#           3_convert.py calibrates int8 on stream mixtures when X.npy is absent)
+TRAIN_MODE = "arrays"
+STEPS_PER_EPOCH = 100  # Stream mode: ~ the size of the synthetic dataset (3 x 1000 x 4 clips) per epoch
+VAL_BATCHES = 8  # Stream mode: fixed validation mixtures from held-out source files
+SEED = 42
+
+# Quantization-aware training: after the float epochs, fine-tune with fake-quantized int8 weights and
+# activations so 3_convert.py exports an int8 model that matches the float one
+QAT = False
+QAT_EPOCHS = 2
+QAT_LEARNING_RATE = 1e-4
+QAT_MODEL_PATH = os.path.join(MODEL_DIR, "forest_guard_qat.h5")
+
+def build_ds_cnn(input_shape, num_classes, width=1.0, depth=2):
     """
     Builds a Depthwise Separable CNN models optimized for Edge Devices (ESP32).
+    width scales every layer's channels (16 / 32 / 64 at 1.0); depth is the number of DS blocks
+    (block channels double up to 64 * width, with 2x2 pooling between blocks).
     """
+    def channels(n):
+        return max(1, int(round(n * width)))
+
     model = models.Sequential([
         layers.Input(shape=input_shape),
         
         # Standard Conv2D for initial feature extraction
-        layers.Conv2D(16, (3, 3), padding='same', use_bias=False),
-        layers.BatchNormalization(),
-        layers.ReLU(),
-        layers.MaxPooling2D(pool_size=(2, 2)),
-
-        # DS-CNN Block 1
-        layers.DepthwiseConv2D((3, 3), padding='same', use_bias=False),
-        layers.BatchNormalization(),
-        layers.ReLU(),
-        layers.Conv2D(32, (1, 1), padding='same', use_bias=False), # Pointwise
+        layers.Conv2D(channels(16), (3, 3), padding='same', use_bias=False),
         layers.BatchNormalization(),
         layers.ReLU(),
         layers.MaxPooling2D(pool_size=(2, 2)),
-
-        # DS-CNN Block 2
-        layers.DepthwiseConv2D((3, 3), padding='same', use_bias=False),
-        layers.BatchNormalization(),
-        layers.ReLU(),
-        layers.Conv2D(64, (1, 1), padding='same', use_bias=False), # Pointwise
-        layers.BatchNormalization(),
-        layers.ReLU(),
-        layers.GlobalAveragePooling2D(),
-        
-        # Classifier
-        layers.Dropout(0.3),
-        layers.Dense(num_classes, activation='softmax')
     ])
+
+    for block in range(depth):
+        # DS-CNN Block
+        model.add(layers.DepthwiseConv2D((3, 3), padding='same', use_bias=False))
+        model.add(layers.BatchNormalization())
+        model.add(layers.ReLU())
+        model.add(layers.Conv2D(channels(32 * 2 ** min(block, 1)), (1, 1), padding='same', use_bias=False)) # Pointwise
+        model.add(layers.BatchNormalization())
+        model.add(layers.ReLU())
+        if block < depth - 1:
+            model.add(layers.MaxPooling2D(pool_size=(2, 2)))
+
+    model.add(layers.GlobalAveragePooling2D())
+
+    # Classifier
+    model.add(layers.Dropout(0.3))
+    model.add(layers.Dense(num_classes, activation='softmax'))
     return model
 
 def plot_confusion_matrix(y_true, y_pred, classes):
@@ -63,14 +79,61 @@ def plot_confusion_matrix(y_true, y_pred, classes):
     plt.savefig(os.path.join(MODEL_DIR, "confusion_matrix.png"))
     print(f"Confusion Matrix saved to {os.path.join(MODEL_DIR, 'confusion_matrix.png')}")
 
-def main():
+def report(model, X_test, y_true_classes):
+    """Prints the classification report and saves the confusion matrix."""
+    y_pred = model.predict(X_test)
+    y_pred_classes = np.argmax(y_pred, axis=1)
+
+    print("\nClassification Report:")
+    print(classification_report(y_true_classes, y_pred_classes, labels=range(len(CLASSES)), target_names=CLASSES))
+
+    plot_confusion_matrix(y_true_classes, y_pred_classes, CLASSES)
+
+def save_model(model):
+    ensure_dir(MODEL_DIR)
+    model.save(os.path.join(MODEL_DIR, "forest_guard.h5"))
+    print(f"Model saved to {os.path.join(MODEL_DIR, 'forest_guard.h5')}")
+
+def check_qat(model):
+    """Exits before the float epochs if tfmot cannot wrap the model (e.g. Keras 3 without tf_keras, see src/__init__.py)."""
+    import tensorflow_model_optimization as tfmot
+
+    try:
+        tfmot.quantization.keras.quantize_model(model)
+    except (ValueError, TypeError) as e:
+        print(f"Error: Quantization-aware training cannot wrap the model ({e}). "
+              "Install tf_keras and keep TF_USE_LEGACY_KERAS=1, or set QAT = False.")
+        sys.exit(1)
+
+def finetune_qat(model, loss, **fit_kwargs):
+    """
+    Wraps a trained float model with int8 fake-quantization (Conv/BN/ReLU folded as in the TFLite
+    kernels), fine-tunes it at a low learning rate and saves it to QAT_MODEL_PATH.
+    """
+    import tensorflow_model_optimization as tfmot
+
+    print("\n--- Quantization-Aware Fine-Tuning ---")
+    qat_model = tfmot.quantization.keras.quantize_model(model)
+    qat_model.compile(optimizer=optimizers.Adam(QAT_LEARNING_RATE), loss=loss, metrics=['accuracy'])
+    qat_model.fit(epochs=QAT_EPOCHS, **fit_kwargs)
+
+    x, y = fit_kwargs["validation_data"]
+    loss, acc = qat_model.evaluate(x, y, batch_size=BATCH_SIZE)
+    print(f"QAT Test Accuracy: {acc*100:.2f}%")
+
+    ensure_dir(MODEL_DIR)
+    qat_model.save(QAT_MODEL_PATH)
+    print(f"QAT Model saved to {QAT_MODEL_PATH}")
+    return qat_model
+
+def train_arrays():
     # Load Data
     try:
         X = np.load(os.path.join(DATA_DIR, "X.npy"))
         y = np.load(os.path.join(DATA_DIR, "y.npy"))
     except FileNotFoundError:
         print("Error: X.npy or y.npy not found. Run 1_preprocess.py first.")
-        return
+        sys.exit(1)
 
     # Check Input Shape
     print(f"Data Shape: {X.shape}")
@@ -84,6 +147,8 @@ def main():
     # Build Model
     model = build_ds_cnn(input_shape=X.shape[1:], num_classes=len(CLASSES))
     model.summary()
+    if QAT:
+        check_qat(model)
     
     # Compile
     model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
@@ -97,18 +162,64 @@ def main():
     print(f"Test Accuracy: {acc*100:.2f}%")
 
     # Generate Report & Confusion Matrix
-    y_pred = model.predict(X_test)
-    y_pred_classes = np.argmax(y_pred, axis=1)
-    y_true_classes = np.argmax(y_test, axis=1)
+    report(model, X_test, np.argmax(y_test, axis=1))
 
-    print("\nClassification Report:")
-    print(classification_report(y_true_classes, y_pred_classes, target_names=CLASSES))
+    # Save Model
+    save_model(model)
 
-    plot_confusion_matrix(y_true_classes, y_pred_classes, CLASSES)
+    if QAT:
+        finetune_qat(model, 'categorical_crossentropy', x=X_train, y=y_train,
+                     validation_data=(X_test, y_test), batch_size=BATCH_SIZE)
+
+def train_stream():
+    from src.stream_dataset import load_sources, make_dataset
+
+    # Load source clips (a few MB), split by file so validation clips are never mixed into training
+    print("Loading Source Audio...")
+    train_sources, val_sources = load_sources(seed=SEED)
+    if "background" not in train_sources or "background" not in val_sources:
+        print("Error: Need at least 2 background clips. Run 0_download_data.py first.")
+        sys.exit(1)
+
+    # Fresh mixtures every epoch; validation is a fixed set drawn once
+    train_ds = make_dataset(train_sources, BATCH_SIZE, seed=SEED)
+    val_batches = list(make_dataset(val_sources, BATCH_SIZE, seed=SEED + 1, num_batches=VAL_BATCHES).as_numpy_iterator())
+    X_test = np.concatenate([b[0] for b in val_batches])
+    y_test = np.concatenate([b[1] for b in val_batches])
+    print(f"Validation Shape: {X_test.shape} (from held-out source clips)")
+
+    # Build Model
+    model = build_ds_cnn(input_shape=INPUT_SHAPE, num_classes=len(CLASSES))
+    model.summary()
+    if QAT:
+        check_qat(model)
+
+    # Compile (sparse labels, no one-hot copy)
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+
+    # Train
+    history = model.fit(train_ds, validation_data=(X_test, y_test), epochs=EPOCHS, steps_per_epoch=STEPS_PER_EPOCH)
+
+    # Evaluate
+    print("\n--- Evaluation ---")
+    loss, acc = model.evaluate(X_test, y_test, batch_size=BATCH_SIZE)
+    print(f"Test Accuracy: {acc*100:.2f}%")
+
+    # Generate Report & Confusion Matrix
+    report(model, X_test, y_test)
 
     # Save Model
-    model.save(os.path.join(MODEL_DIR, "forest_guard.h5"))
-    print(f"Model saved to {os.path.join(MODEL_DIR, 'forest_guard.h5')}")
+    save_model(model)
+
+    if QAT:
+        finetune_qat(model, 'sparse_categorical_crossentropy', x=train_ds,
+                     validation_data=(X_test, y_test), steps_per_epoch=STEPS_PER_EPOCH)
+
+def main(mode=TRAIN_MODE):
+    if mode == "stream":
+        train_stream()
+    else:
+        train_arrays()
 
 if __name__ == "__main__":
     main()
@@ -1,24 +1,70 @@
 import os
+import sys
+import importlib
 import numpy as np
 import tensorflow as tf
 
 # Constants
 from src.utils import DATA_DIR, MODEL_DIR
+from src.profile_model import profile_model, print_report, check_budget
+from src.evaluate_quantized import evaluate, check_accuracy_drop
 H5_MODEL_PATH = os.path.join(MODEL_DIR, "forest_guard.h5")
+QAT_MODEL_PATH = os.path.join(MODEL_DIR, "forest_guard_qat.h5")  # From 2_train.py with QAT = True
 TFLITE_MODEL_PATH = os.path.join(MODEL_DIR, "model_quantized.tflite")
 CC_MODEL_PATH = os.path.join(MODEL_DIR, "model_data.cc")
+CANDIDATE_MODEL_PATH = os.path.join(MODEL_DIR, "model_quantized.candidate.tflite")  # Checked here before it replaces TFLITE_MODEL_PATH
+PROFILE_RUNS = 50  # Host latency runs per op in the conversion report
+CALIBRATION_SAMPLES = 100  # Windows for post-training quantization ranges
 
 def representative_dataset_gen():
-    """Generates a representative dataset for Quantization."""
-    try:
-        X = np.load(os.path.join(DATA_DIR, "X.npy"))
+    """
+    Generates a representative dataset for Quantization: the first rows of X.npy, or (stream
+    mode, no X.npy) fresh mixtures of the training source clips, as 2_train.py sees them.
+    """
+    x_path = os.path.join(DATA_DIR, "X.npy")
+    if os.path.exists(x_path):
+        X = np.load(x_path, mmap_mode="r")
         # Use a subset of data for calibration
-        for i in range(min(100, len(X))):
-            # Ensure proper shape (1, 64, 63, 1) and dtype (float32)
-            yield [X[i].reshape(1, 64, 63, 1).astype(np.float32)]
-    except FileNotFoundError:
-        print("Error: X.npy not found. Cannot perform quantization without data.")
-        return
+        calibration = X[:CALIBRATION_SAMPLES]
+    else:
+        from src.stream_dataset import load_sources, mix_batch, BACKGROUND_CLASS
+        train = importlib.import_module("src.2_train")
+        train_sources, _ = load_sources(seed=train.SEED)
+        if BACKGROUND_CLASS not in train_sources:
+            # Mixtures need background clips (as 2_train.py stream mode)
+            print("Error: Neither X.npy nor background source clips found. Cannot perform quantization without data.")
+            return
+        print(f"X.npy not found: calibrating on {CALIBRATION_SAMPLES} stream-mode mixtures.")
+        calibration, _ = mix_batch(train_sources, CALIBRATION_SAMPLES, np.random.default_rng(train.SEED + 2))
+    for sample in calibration:
+        # Ensure proper shape (1, 64, 63, 1) and dtype (float32)
+        yield [np.asarray(sample, dtype=np.float32).reshape(1, 64, 63, 1)]
+
+def load_keras_model():
+    """
+    Returns (model, is_qat). The quantization-aware model is used when 2_train.py saved one
+    alongside the current float model; otherwise the float model is quantized post-training.
+    """
+    if os.path.exists(QAT_MODEL_PATH) and os.path.getmtime(QAT_MODEL_PATH) >= os.path.getmtime(H5_MODEL_PATH):
+        import tensorflow_model_optimization as tfmot
+        with tfmot.quantization.keras.quantize_scope():
+            return tf.keras.models.load_model(QAT_MODEL_PATH), True
+    return tf.keras.models.load_model(H5_MODEL_PATH), False
+
+def quantize_to_int8(model, representative_dataset=None):
+    """Full-integer (int8 in, int8 out) TFLite flatbuffer of a Keras model."""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    # Optimization: Int8 Quantization
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if representative_dataset is not None:
+        converter.representative_dataset = representative_dataset
+
+    # Ensure full integer quantization for ESP32
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    return converter.convert()
 
 def convert_to_c_array(tflite_model, output_path):
     """Converts TFLite binary to a C++ header file."""
@@ -42,40 +88,52 @@ const unsigned int g_model_len = {len(tflite_model)};
 def main():
     if not os.path.exists(H5_MODEL_PATH):
         print(f"Error: Model file {H5_MODEL_PATH} not found. Train the model first.")
-        return
+        sys.exit(1)
 
     # Load Keras Model
-    model = tf.keras.models.load_model(H5_MODEL_PATH)
-
-    # Convert to TFLite
-    converter = tf.lite.TFLiteConverter.from_keras_model(model)
-    
-    # Optimization: Int8 Quantization
-    converter.optimizations = [tf.lite.Optimize.DEFAULT]
-    converter.representative_dataset = representative_dataset_gen
-    
-    # Ensure full integer quantization for ESP32
-    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
-    converter.inference_input_type = tf.int8
-    converter.inference_output_type = tf.int8
+    model, is_qat = load_keras_model()
+    print(f"Converting {'quantization-aware' if is_qat else 'float'} model "
+          f"({QAT_MODEL_PATH if is_qat else H5_MODEL_PATH})")
 
     try:
-        tflite_model = converter.convert()
+        # A QAT model carries its learned ranges; the converter still needs samples for full-integer export
+        tflite_model = quantize_to_int8(model, representative_dataset_gen)
         
-        # Save TFLite Model
-        with open(TFLITE_MODEL_PATH, "wb") as f:
+        # Save the candidate; it only replaces the deployed model once every check below passes
+        with open(CANDIDATE_MODEL_PATH, "wb") as f:
             f.write(tflite_model)
-        print(f"Quantized TFLite Model saved to {TFLITE_MODEL_PATH}")
         print(f"Model Size: {len(tflite_model) / 1024:.2f} KB")
-
-        # Convert to C++
-        convert_to_c_array(tflite_model, CC_MODEL_PATH)
-        
     except Exception as e:
         print(f"Conversion Failed: {e}")
         # Fallback without quantization if data is missing (for testing script logic only)
         if not os.path.exists(os.path.join(DATA_DIR, "X.npy")):
-             print("TIP: You need 'X.npy' from the preprocessing step to perform Int8 Quantization.")
+             print("TIP: Int8 Quantization needs 'X.npy' from the preprocessing step, or the source clips in data/<class>/ (stream mode).")
+        sys.exit(1)
+
+    # Per-op profile and ESP32 budget check (see profile_model.py)
+    print("\n--- Model Profile ---")
+    profile = profile_model(CANDIDATE_MODEL_PATH, PROFILE_RUNS)
+    print_report(profile)
+    violations = check_budget(profile)
+
+    # Float vs int8 accuracy on the held-out split (see evaluate_quantized.py)
+    print("\n--- Int8 Evaluation ---")
+    accuracy_violation = check_accuracy_drop(evaluate(CANDIDATE_MODEL_PATH, H5_MODEL_PATH))
+    if accuracy_violation:
+        violations.append(accuracy_violation)
+
+    if violations:
+        for v in violations:
+            print(f"[FAIL] {v}")
+        os.remove(CANDIDATE_MODEL_PATH)
+        print(f"Conversion failed: {TFLITE_MODEL_PATH} and {CC_MODEL_PATH} were not updated.")
+        sys.exit(1)
+
+    os.replace(CANDIDATE_MODEL_PATH, TFLITE_MODEL_PATH)
+    print(f"Quantized TFLite Model saved to {TFLITE_MODEL_PATH}")
+
+    # Convert to C++
+    convert_to_c_array(tflite_model, CC_MODEL_PATH)
 
 if __name__ == "__main__":
     main()
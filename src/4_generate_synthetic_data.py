@@ -1,71 +1,113 @@
 import os
+import sys
 import numpy as np
-import librosa
 import soundfile as sf
 from tqdm import tqdm
-import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Constants
 # Constants
-from src.utils import DATA_DIR, CLASSES, SAMPLE_RATE, DURATION, SYNTHETIC_DIR, ensure_dir
+from src.utils import DATA_DIR, CLASSES, SAMPLE_RATE, SYNTHETIC_DIR, SYNTHETIC_SHARD_DIR, SYNTHETIC_FORMAT, ensure_dir
+from src.augment import augment_pitch_speed, mix_audio
+from src import shard_dataset, source_cache
 
 # Constants
 # SYNTHETIC_DIR imported from utils
 TARGET_CLASSES = [c for c in CLASSES if c != "background"]
 BACKGROUND_CLASS = "background"
 SAMPLES_PER_TARGET = 1000  # Generate 1000 samples per target class
+SEED = 42  # Sample i of a class is seeded from (SEED, class index, i), so output does not depend on WORKERS
+WORKERS = os.cpu_count()
+SAMPLES_PER_TASK = 64
 
 def load_audio_files(label):
-    folder = os.path.join(DATA_DIR, label)
-    files = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith('.wav')]
-    audio_data = []
-    for f in files:
-        y, _ = librosa.load(f, sr=SAMPLE_RATE, duration=DURATION)
-        # Fix length
-        target_len = int(SAMPLE_RATE * DURATION)
-        if len(y) < target_len:
-            y = np.pad(y, (0, target_len - len(y)))
-        else:
-            y = y[:target_len]
-        audio_data.append(y)
-    return audio_data
-
-def mix_audio(foreground, background, snr_db):
-    """Mix foreground signal with background noise at given SNR."""
-    # Calculate power
-    fg_power = np.mean(foreground ** 2)
-    bg_power = np.mean(background ** 2)
-    
-    if bg_power == 0:
-        return foreground
+    """Decoded, resampled, fixed-length clips of a class, from the source cache (see source_cache.py)."""
+    _, clips = source_cache.load_folder(os.path.join(DATA_DIR, label))
+    return list(np.array(clips))
 
-    # Calculate required background power
-    target_bg_power = fg_power / (10 ** (snr_db / 10))
-    
-    # Scale background
-    scale = np.sqrt(target_bg_power / bg_power)
-    mixed = foreground + background * scale
-    
-    # Normalize to prevent clipping
-    max_val = np.max(np.abs(mixed))
-    if max_val > 1.0:
-        mixed = mixed / max_val
-        
-    return mixed
-
-def augment_pitch_speed(audio):
-    """Apply random pitch shift or time stretch."""
-    if random.random() < 0.5:
-        # Pitch shift
-        n_steps = random.uniform(-2, 2)
-        return librosa.effects.pitch_shift(audio, sr=SAMPLE_RATE, n_steps=n_steps)
+def sample_rng(label, i):
+    return np.random.default_rng([SEED, CLASSES.index(label), i])
+
+def generate_target_samples(label, indices, clips, background_clips):
+    """Returns [(file name, audio, generation parameters)] for mixtures `indices` of a target class."""
+    fore_idx, back_idx, snrs = [], [], []
+    pitch_steps = np.full(len(indices), np.nan)
+    speed_rates = np.full(len(indices), np.nan)
+    for k, i in enumerate(indices):
+        rng = sample_rng(label, i)
+
+        # 1. Pick random foreground (target)
+        fore_idx.append(rng.integers(len(clips)))
+
+        # 2. Pick random background
+        back_idx.append(rng.integers(len(background_clips)))
+
+        # 3. HEAVY NOISE SCENARIO (FAN/AC):
+        # Range: -10dB (Target buried in noise) to 5dB (Target slightly louder)
+        snrs.append(rng.uniform(-10, 5))
+
+        # 4. Pick Pitch/Speed Augmentation for the foreground
+        if rng.random() < 0.8: # Increased chance of augmentation
+            if rng.random() < 0.5:
+                pitch_steps[k] = rng.uniform(-2, 2)
+            else:
+                speed_rates[k] = rng.uniform(0.8, 1.2)
+
+    # 5. Augment all foregrounds of the shard at once, then mix
+    fores = augment_pitch_speed(np.stack([clips[j] for j in fore_idx]), pitch_steps, speed_rates)
+    samples = []
+    for k, i in enumerate(indices):
+        mixed = mix_audio(fores[k], background_clips[back_idx[k]], snrs[k])
+        params = {"label": label, "index": i, "snr": float(snrs[k]), "fore_clip": int(fore_idx[k]),
+                  "back_clip": int(back_idx[k]), "pitch_steps": None if np.isnan(pitch_steps[k]) else float(pitch_steps[k]),
+                  "speed_rate": None if np.isnan(speed_rates[k]) else float(speed_rates[k])}
+        samples.append((f"synth_{label}_{i:04d}_snr{int(snrs[k])}.wav", mixed, params))
+    return samples
+
+def generate_background_sample(i, background_clips):
+    """Returns (file name, audio, generation parameters) for "pure" background sample i."""
+    rng = sample_rng(BACKGROUND_CLASS, i)
+    back_idx = rng.integers(len(background_clips))
+    bg = background_clips[back_idx]
+    gain = 1.0
+    # Augment
+    if rng.random() < 0.5:
+        # Add volume variation
+        gain = rng.uniform(0.5, 1.5)
+        bg = bg * gain
+    return f"synth_bg_{i:04d}.wav", bg, {"label": BACKGROUND_CLASS, "index": i, "back_clip": int(back_idx), "gain": float(gain)}
+
+# Source clips per worker process (set by _init_worker)
+_sources = None
+
+def _init_worker(background_clips, target_clips):
+    global _sources
+    _sources = (background_clips, target_clips)
+
+def generate_shard(label, indices, fmt=SYNTHETIC_FORMAT):
+    """
+    Worker task: generates samples `indices` of one class and writes them as WAVs, or as one
+    int16 shard ("shards"). Returns (label, count, manifest records of the shard).
+    """
+    background_clips, target_clips = _sources
+    if label == BACKGROUND_CLASS:
+        samples = [generate_background_sample(i, background_clips) for i in indices]
     else:
-        # Time stretch (simple resampling for speed)
-        rate = random.uniform(0.8, 1.2)
-        return librosa.effects.time_stretch(audio, rate=rate)
+        samples = generate_target_samples(label, indices, target_clips[label], background_clips)
+    if fmt == "shards":
+        records = shard_dataset.write_shard(SYNTHETIC_SHARD_DIR, f"{label}_{indices[0]:05d}",
+                                            [audio for _, audio, _ in samples], [params for _, _, params in samples])
+        return label, len(indices), records
+    output_folder = os.path.join(SYNTHETIC_DIR, label)
+    for out_name, audio, _ in samples:
+        sf.write(os.path.join(output_folder, out_name), audio, SAMPLE_RATE)
+    return label, len(indices), []
 
-def main():
-    ensure_dir(SYNTHETIC_DIR)
+def main(workers=WORKERS, fmt=SYNTHETIC_FORMAT):
+    if fmt == "shards":
+        shard_dataset.create(SYNTHETIC_SHARD_DIR)
+    else:
+        ensure_dir(SYNTHETIC_DIR)
         
     print("Loading Source Audio...")
     background_clips = load_audio_files(BACKGROUND_CLASS)
@@ -73,67 +115,51 @@ def main():
     
     if not background_clips:
         print("Error: No background clips found!")
-        return
+        sys.exit(1)
 
-    print(f"Generating {SAMPLES_PER_TARGET} samples per target class...")
-    
+    print(f"Generating {SAMPLES_PER_TARGET} samples per target class ({workers} workers)...")
+
+    # Target mixtures, plus "pure" background samples (just augment existing backgrounds)
+    # We want the model to have a "Background" class too.
+    labels = []
     for label in TARGET_CLASSES:
-        output_folder = os.path.join(SYNTHETIC_DIR, label)
-        ensure_dir(output_folder)
-            
-        clips = target_clips[label]
-        if not clips:
+        if not target_clips[label]:
             print(f"Warning: No clips for {label}")
             continue
-            
-        for i in tqdm(range(SAMPLES_PER_TARGET), desc=f"Generating {label}"):
-            # 1. Pick random foreground (target)
-            fore = random.choice(clips)
-            
-            # 2. Pick random background
-            back = random.choice(background_clips)
-            
-            # 3. Augment foreground first? (Optional, let's keep it simple mixing first)
-            
-            # 4. HEAVY NOISE SCENARIO (FAN/AC):
-            # Range: -10dB (Target buried in noise) to 5dB (Target slightly louder)
-            snr = random.uniform(-10, 5)
-            mixed = mix_audio(fore, back, snr)
-            
-            # 5. Apply Pitch/Speed Augmentation
-            if random.random() < 0.8: # Increased chance of augmentation
-                 try:
-                    fore_aug = augment_pitch_speed(fore)
-                    # Fix length again after aug
-                    target_len = int(SAMPLE_RATE * DURATION)
-                    if len(fore_aug) < target_len:
-                        fore_aug = np.pad(fore_aug, (0, target_len - len(fore_aug)))
-                    else:
-                        fore_aug = fore_aug[:target_len]
-                    mixed = mix_audio(fore_aug, back, snr)
-                 except:
-                    pass # Fallback to original mix
-            
-            # Save
-            out_name = f"synth_{label}_{i:04d}_snr{int(snr)}.wav"
-            sf.write(os.path.join(output_folder, out_name), mixed, SAMPLE_RATE)
-            
-    # Also generate "pure" background samples (just augment existing backgrounds)
-    # We want the model to have a "Background" class too.
-    bg_folder = os.path.join(SYNTHETIC_DIR, BACKGROUND_CLASS)
-    bg_folder = os.path.join(SYNTHETIC_DIR, BACKGROUND_CLASS)
-    ensure_dir(bg_folder)
-        
-    for i in tqdm(range(SAMPLES_PER_TARGET), desc="Generating Background"):
-        bg = random.choice(background_clips)
-        # Augment
-        if random.random() < 0.5:
-             # Add volume variation
-             gain = random.uniform(0.5, 1.5)
-             bg = bg * gain
-             
-        out_name = f"synth_bg_{i:04d}.wav"
-        sf.write(os.path.join(bg_folder, out_name), bg, SAMPLE_RATE)
+        labels.append(label)
+    labels.append(BACKGROUND_CLASS)
+
+    tasks = []
+    for label in labels:
+        if fmt != "shards":
+            ensure_dir(os.path.join(SYNTHETIC_DIR, label))
+        for start in range(0, SAMPLES_PER_TARGET, SAMPLES_PER_TASK):
+            tasks.append((label, range(start, min(start + SAMPLES_PER_TASK, SAMPLES_PER_TARGET))))
+
+    records = []
+    with tqdm(total=len(labels) * SAMPLES_PER_TARGET, desc="Generating") as pbar:
+        if workers <= 1:
+            _init_worker(background_clips, target_clips)
+            for task in tasks:
+                _, count, shard_records = generate_shard(*task, fmt)
+                records += shard_records
+                pbar.update(count)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(background_clips, target_clips)) as pool:
+                for future in as_completed([pool.submit(generate_shard, *task, fmt) for task in tasks]):
+                    _, count, shard_records = future.result()
+                    records += shard_records
+                    pbar.update(count)
+
+    if fmt == "shards":
+        # Stable order (class, sample index) regardless of which worker finished first
+        records.sort(key=lambda r: (CLASSES.index(r["label"]), r["index"]))
+        # Only the files that decoded (and so could be mixed in) are sources
+        sources = {label: [os.path.basename(f) for f in source_cache.load_folder(os.path.join(DATA_DIR, label))[0]]
+                   for label in [BACKGROUND_CLASS] + labels[:-1]}
+        shard_dataset.write_manifest(SYNTHETIC_SHARD_DIR, records, seed=SEED, sources=sources)
+        print(f"{len(records)} clips written to {SYNTHETIC_SHARD_DIR} ({len(set(r['shard'] for r in records))} shards).")
 
     print("Synthetic Generation Complete.")
 
@@ -0,0 +1,6 @@
+import os
+
+# tensorflow-model-optimization (QAT, see 2_train.py) only wraps Keras 2 models, and .h5 files saved by
+# one Keras major version do not load in the other. So on TensorFlow >= 2.16 every script uses Keras 2
+# from the tf_keras package (requirements.txt). Export TF_USE_LEGACY_KERAS=0 to use Keras 3 (no QAT).
+os.environ.setdefault("TF_USE_LEGACY_KERAS", "1")
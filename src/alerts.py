@@ -0,0 +1,276 @@
+import sys
+import json
+import time
+import queue
+import logging
+import threading
+import logging.handlers
+import urllib.request
+
+import numpy as np
+
+from src.utils import CLASSES
+
+# Constants
+THRESHOLD = 0.6  # Same as demo_laptop_mic.py
+ALERT_CLASSES = ["chainsaw", "gunshot"]
+DEDUP_SECONDS = 10.0  # Repeats of the same class within this window are folded into one alert
+BATCH_SIZE = 20  # Alerts handed to a sink per call, at most
+BATCH_SECONDS = 0.5  # A sink's batch waits at most this long to fill
+QUEUE_EVENTS = 256  # Pending alerts per sink; the oldest are dropped beyond this
+LOG_PATH = "alerts.log"
+LOG_MAX_BYTES = 1 << 20
+LOG_BACKUPS = 5
+WEBHOOK_URL = "http://127.0.0.1:8787/alerts"  # Local stand-in for the ranger dispatch endpoint (serve_webhook_stub)
+WEBHOOK_TIMEOUT = 2.0
+SOUND_MIN_CONFIDENCE = 0.8  # Beep only for confident alerts, as the demo did
+RATE_LIMITS = {"sound": 6, "webhook": 60}  # Alerts per minute per sink name (others unlimited)
+
+
+class ConsoleSink:
+    """Prints each alert in red on stdout."""
+    name = "console"
+
+    def emit(self, events):
+        for e in events:
+            repeats = f", {e['suppressed']} repeats folded into the last alert" if e["suppressed"] else ""
+            print(f"\n\033[91m[DANGER] >>> DETECTED: {e['label'].upper()} ({e['confidence']:.2f}){repeats} "
+                  f"[{e['sensor']}] <<<\033[0m")
+
+
+class LogFileSink:
+    """One JSON line per alert in a size-rotated log file."""
+    name = "logfile"
+
+    def __init__(self, path=LOG_PATH, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+        self.logger = logging.getLogger(f"ecoguardian.alerts.{path}")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        if not self.logger.handlers:
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+
+    def emit(self, events):
+        for e in events:
+            self.logger.info(json.dumps(e))
+
+
+class WebhookSink:
+    """POSTs each batch as one JSON array (the whole batch fails or succeeds together)."""
+    name = "webhook"
+
+    def __init__(self, url=WEBHOOK_URL, timeout=WEBHOOK_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def emit(self, events):
+        request = urllib.request.Request(self.url, data=json.dumps(events).encode(),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class SoundSink:
+    """One beep per batch with a confident alert: winsound on Windows, the terminal bell elsewhere."""
+    name = "sound"
+
+    def __init__(self, min_confidence=SOUND_MIN_CONFIDENCE, frequency=1000, duration_ms=200):
+        self.min_confidence = min_confidence
+        self.frequency = frequency
+        self.duration_ms = duration_ms
+
+    def emit(self, events):
+        if not any(e["confidence"] > self.min_confidence for e in events):
+            return
+        if sys.platform == "win32":
+            import winsound
+            winsound.Beep(self.frequency, self.duration_ms)
+        else:
+            sys.stdout.write("\a")
+            sys.stdout.flush()
+
+
+class CallbackSink:
+    """Calls fn(events) on the sink's thread (e.g. to hand alerts to a GUI queue)."""
+
+    def __init__(self, fn, name="callback"):
+        self.fn = fn
+        self.name = name
+
+    def emit(self, events):
+        self.fn(events)
+
+
+class SinkWorker:
+    """
+    Runs one sink on its own thread behind a bounded queue, so a slow or failing sink only
+    delays (or, past queue_events, drops) its own alerts. Alerts are handed over in batches of
+    up to batch_size, or whatever arrived within batch_seconds of the first. max_per_minute
+    (token bucket) limits alerts per sink; alerts over the limit are counted and dropped.
+    """
+
+    def __init__(self, sink, batch_size=BATCH_SIZE, batch_seconds=BATCH_SECONDS, queue_events=QUEUE_EVENTS,
+                 max_per_minute=None):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.max_per_minute = max_per_minute
+        self.queue = queue.Queue(maxsize=queue_events)
+        self.tokens = float(max_per_minute or 0)
+        self._refilled = time.monotonic()
+        self.counters = {"emitted": 0, "dropped": 0, "rate_limited": 0, "errors": 0}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"alerts-{sink.name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def put(self, event):
+        """Never blocks: drops the oldest pending alert when the queue is full."""
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.counters["dropped"] += 1
+                except queue.Empty:
+                    pass
+
+    def _allow(self):
+        if not self.max_per_minute:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.max_per_minute, self.tokens + (now - self._refilled) * self.max_per_minute / 60)
+        self._refilled = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        self.counters["rate_limited"] += 1
+        return False
+
+    def _run(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            try:
+                batch = [self.queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.batch_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            batch = [e for e in batch if self._allow()]
+            if not batch:
+                continue
+            try:
+                self.sink.emit(batch)
+                self.counters["emitted"] += len(batch)
+            except Exception as e:
+                self.counters["errors"] += 1
+                print(f"Alert sink '{self.sink.name}' failed: {e}", file=sys.stderr)
+
+    def stop(self, timeout=None):
+        """Delivers what is still queued (within timeout), then stops the thread."""
+        self._stop.set()
+        self._thread.join(timeout)
+
+
+class AlertDispatcher:
+    """
+    Turns classified windows into alerts and fans them out to sinks without blocking the caller.
+
+    on_result() is an AudioProcessor.subscribe() callback: it runs on the inference thread, so it
+    only thresholds, de-duplicates and enqueues. Repeats of a class within dedup_seconds of its
+    last alert are folded into that alert (not sent), so an ongoing detection re-alerts every
+    dedup_seconds; the next alert of that class reports how many were folded in 'suppressed'.
+    Each sink gets its own SinkWorker (thread, queue, batching and rate limit).
+    """
+
+    def __init__(self, sinks, threshold=THRESHOLD, classes=ALERT_CLASSES, dedup_seconds=DEDUP_SECONDS,
+                 sensor="local", rate_limits=RATE_LIMITS, **worker_kwargs):
+        rate_limits = rate_limits or {}
+        self.workers = [SinkWorker(sink, max_per_minute=rate_limits.get(sink.name), **worker_kwargs) for sink in sinks]
+        self.threshold = threshold  # May be changed while running (e.g. from a GUI slider)
+        self.classes = set(classes)
+        self.dedup_seconds = dedup_seconds
+        self.sensor = sensor
+        self._last = {}  # (sensor, label) -> [time of the last alert sent, repeats folded since]
+        self._lock = threading.Lock()
+        self.alerts = 0
+        self.deduplicated = 0
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+        return self
+
+    def on_result(self, result):
+        """AudioProcessor subscriber: result is (prediction, confidence, label, rms, window end)."""
+        prediction, confidence, label, rms, _ = result
+        self.submit(label, confidence, rms, probabilities=prediction)
+
+    def submit(self, label, confidence, rms=None, sensor=None, timestamp=None, probabilities=None):
+        """Offers one classified window. Returns the alert event, or None if it was below threshold or a repeat."""
+        if label not in self.classes or confidence <= self.threshold:
+            return None
+        sensor = sensor or self.sensor
+        now = time.time() if timestamp is None else timestamp
+        with self._lock:
+            episode = self._last.get((sensor, label))
+            if episode is not None and now - episode[0] < self.dedup_seconds:
+                episode[1] += 1
+                self.deduplicated += 1
+                return None
+            suppressed = episode[1] if episode is not None else 0
+            self._last[(sensor, label)] = [now, 0]
+            self.alerts += 1
+        event = {"time": now, "sensor": sensor, "label": label, "confidence": round(float(confidence), 4),
+                 "rms": None if rms is None else round(float(rms), 5), "suppressed": suppressed}
+        if probabilities is not None:
+            event["probabilities"] = {c: round(float(p), 4) for c, p in zip(CLASSES, np.asarray(probabilities).ravel())}
+        for worker in self.workers:
+            worker.put(event)
+        return event
+
+    def counters(self):
+        return {"alerts": self.alerts, "deduplicated": self.deduplicated,
+                **{f"{w.sink.name}_{k}": v for w in self.workers for k, v in w.counters.items()}}
+
+    def stop(self, timeout=2.0):
+        for worker in self.workers:
+            worker.stop(timeout)
+
+
+def default_sinks(log_path=LOG_PATH, webhook_url=None, sound=True):
+    """Console and rotating log file, plus the sound and webhook sinks if asked."""
+    sinks = [ConsoleSink(), LogFileSink(log_path)]
+    if sound:
+        sinks.append(SoundSink())
+    if webhook_url:
+        sinks.append(WebhookSink(webhook_url))
+    return sinks
+
+
+def serve_webhook_stub(port=8787, host="127.0.0.1"):
+    """Local stand-in for the dispatch endpoint: prints every POSTed batch. Runs on a daemon thread; returns the server."""
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            events = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"[]")
+            for e in events:
+                print(f"[webhook] {e['sensor']}: {e['label']} ({e['confidence']:.2f})")
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="webhook-stub", daemon=True).start()
+    return server
@@ -2,69 +2,208 @@ import numpy as np
 import librosa
 import tensorflow as tf
 import queue
-import sounddevice as sd
+import threading
+import time
 import os
 
-from src.utils import CLASSES, SAMPLE_RATE, DURATION, MODEL_DIR, N_MELS, N_FFT, HOP_LENGTH
+from src.utils import CLASSES, SAMPLE_RATE, DURATION, MODEL_DIR, N_MELS, N_FFT, HOP_LENGTH, BLOCK_SIZE, WINDOW_STEP, STEP_SIZE
+from src.features import StreamingMelSpectrogram, log_mel_spectrogram
+from src.inference import load_backend, DEFAULT_MODEL_PATHS
+from src.gating import InferenceGate, FIRST_STAGE_MODEL_PATH
+from src.audio_sources import MicrophoneSource
+from src.metrics import Metrics
 
 # Derived constants
 MODEL_PATH = os.path.join(MODEL_DIR, "forest_guard.h5")
-BLOCK_SIZE = int(SAMPLE_RATE * DURATION)
-WINDOW_STEP = 0.5  # Seconds
-STEP_SIZE = int(SAMPLE_RATE * WINDOW_STEP)
+BACKEND = "keras"  # "keras" (forest_guard.h5), "tflite" (model_quantized.tflite) or "streaming" (forest_guard.h5, reuses the previous hop)
+GATE = "off"  # "off", "rms", "flux" or "model" (see gating.py): skip the classifier on quiet hops
+POLICIES = ["every", "latest"]
+POLICY = "every"  # Inference worker: classify every hop, or only the newest window when it falls behind
+QUEUE_BLOCKS = 16  # Captured blocks (8 s) buffered for the inference worker; the oldest is dropped beyond this
+# BLOCK_SIZE, WINDOW_STEP, STEP_SIZE imported from utils
 
 class AudioProcessor:
-    def __init__(self, model_path=MODEL_PATH):
-        self.model_path = model_path
+    """
+    Captures audio and classifies the sliding window on a dedicated inference thread.
+
+    The sounddevice callback only enqueues blocks into a bounded queue and never waits:
+    when the queue is full the oldest block is dropped. The worker either classifies every
+    hop ("every") or pushes all queued blocks through the frontend and classifies only the
+    newest window ("latest"). Consumers poll latest_result() or subscribe() to results,
+    so a slow consumer never backs up into capture. Each result carries the stream time of
+    its window's end, counted in captured samples (dropped and coalesced blocks included).
+
+    Per-stage latencies (queue wait, buffer update, features, inference, post-processing),
+    counters and the queue depth are recorded in self.metrics (see metrics.py).
+    """
+
+    def __init__(self, model_path=None, backend=BACKEND, gate=GATE, policy=POLICY, queue_blocks=QUEUE_BLOCKS,
+                 first_stage_path=FIRST_STAGE_MODEL_PATH):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy '{policy}'. Choose from {POLICIES}.")
+        self.backend = backend
+        self.model_path = model_path or DEFAULT_MODEL_PATHS[backend]
         self.model = None
-        self.audio_queue = queue.Queue()
-        self.audio_buffer = np.zeros(BLOCK_SIZE, dtype=np.float32)
+        self.policy = policy
+        self.gain = 1.0  # Applied by the worker to every block
+        self.audio_queue = queue.Queue(maxsize=queue_blocks)
+        self.frontend = StreamingMelSpectrogram(window_size=BLOCK_SIZE)
+        self.audio_buffer = self.frontend.audio  # View of the rolling 2s window
+        self.samples_captured = 0  # Stream position of the last enqueued block's end
+        self.window_end = 0  # Stream position (samples) of the current window's end
         self.running = False
-        self.stream = None
+        self.source = None
+        self.gate = InferenceGate(gate, first_stage_path=first_stage_path)
+
+        # Results and counters (shared with the worker thread)
+        self._lock = threading.Lock()
+        self._latest = None
+        self._subscribers = []
+        self._worker = None
+        self._stop = threading.Event()
+        self.metrics = Metrics()
         
         self.load_model()
 
     def load_model(self):
         if os.path.exists(self.model_path):
-            print("Loading Model...")
-            self.model = tf.keras.models.load_model(self.model_path)
+            print(f"Loading Model ({self.backend})...")
+            self.model = load_backend(self.backend, self.model_path)
             print("Model Loaded.")
         else:
             print(f"Error: Model {self.model_path} not found.")
 
     def audio_callback(self, indata, frames, time, status):
-        """Callback function to capture audio."""
-        if status:
-            print(status)
-        self.audio_queue.put(indata.copy())
-
-    def start_stream(self):
-        if self.stream is None:
-            self.stream = sd.InputStream(callback=self.audio_callback, channels=1, samplerate=SAMPLE_RATE, blocksize=STEP_SIZE)
-            self.stream.start()
+        """Callback function to capture audio. Never blocks: drops the oldest block when the queue is full."""
+        if status.input_overflow:  # sounddevice.CallbackFlags, or audio_sources.NO_STATUS on replay
+            self.metrics.inc("input_overflows")
+        self.enqueue(indata.copy())
+
+    def enqueue(self, block, wait=False):
+        """
+        Queues a captured block for the worker (stamped for the queue-wait metric, and with its end
+        position in the stream). wait=False drops the oldest block when the queue is full; wait=True
+        blocks until there is space.
+        """
+        self.samples_captured += len(block)
+        item = (time.perf_counter(), self.samples_captured, block)
+        if wait:
+            self.audio_queue.put(item)
+            return
+        while True:
+            try:
+                self.audio_queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.audio_queue.get_nowait()
+                    self.audio_queue.task_done()
+                    self.metrics.inc("blocks_dropped")
+                except queue.Empty:
+                    pass
+
+    def start_stream(self, source=None):
+        """Starts the inference worker and an audio source (default: the microphone, see audio_sources.py)."""
+        if self.source is None:
+            self._stop.clear()
+            self.samples_captured = self.window_end = 0
+            self._worker = threading.Thread(target=self._inference_loop, name="inference", daemon=True)
+            self._worker.start()
+            self.source = source or MicrophoneSource()
+            self.source.start(self)
             self.running = True
             print("Audio stream started.")
 
     def stop_stream(self):
-        if self.stream:
-            self.stream.stop()
-            self.stream.close()
-            self.stream = None
+        if self.source:
+            self.source.stop()
+            self.source = None
+            self._stop.set()
+            self._worker.join()
+            self._worker = None
             self.running = False
             print("Audio stream stopped.")
 
+    def wait_until_done(self):
+        """Blocks until a finite source (replay) has been fed and every queued block processed."""
+        self.source.join()
+        self.audio_queue.join()
+
+    def _inference_loop(self):
+        while not self._stop.is_set():
+            try:
+                items = [self.audio_queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            if self.policy == "latest":
+                # Stale windows: keep their frames in the frontend, classify only the newest
+                while True:
+                    try:
+                        items.append(self.audio_queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self.metrics.inc("windows_coalesced", len(items) - 1)
+                for _, end_sample, block in items[:-1]:
+                    try:
+                        self.frontend.push(block * self.gain)
+                        self.window_end = end_sample
+                    except Exception as e:
+                        self._block_failed(e)
+                    finally:
+                        self.audio_queue.task_done()
+                items = items[-1:]
+            for queued_at, end_sample, block in items:
+                try:
+                    self.metrics.queue_depth = self.audio_queue.qsize()
+                    self.metrics.observe("queue_wait", time.perf_counter() - queued_at)
+                    self.process_block(block, publish=True, end_sample=end_sample)
+                except Exception as e:
+                    self._block_failed(e)
+                finally:
+                    # Always mark the block done, or wait_until_done() would never return
+                    self.audio_queue.task_done()
+
+    def _block_failed(self, error):
+        """A block the worker could not process: counted and logged, the worker keeps going."""
+        self.metrics.inc("inference_errors")
+        print(f"Inference error: {error!r}")
+
+    def _publish(self, result):
+        with self._lock:
+            self._latest = result
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(result)
+            except Exception as e:
+                print(f"Subscriber error: {e}")
+
+    def latest_result(self):
+        """Most recent (prediction, confidence, label, rms, window end), or None before the first window."""
+        with self._lock:
+            return self._latest
+
+    def subscribe(self, callback):
+        """Calls callback(result) on the inference thread for every classified window. Keep it short."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers.remove(callback)
+
+    def counters(self):
+        """Snapshot of the capture / inference counters (self.metrics.snapshot() adds stage latencies)."""
+        c = self.metrics.counters
+        return {"processed": c["windows_processed"], "coalesced": c["windows_coalesced"],
+                "dropped_blocks": c["blocks_dropped"], "overruns": c["input_overflows"],
+                "queued": self.audio_queue.qsize(), "gate_skipped": c["gate_skipped"]}
+
     def preprocess_audio(self, audio_buffer):
         """Convert raw audio buffer to Mel-Spectrogram."""
         audio = audio_buffer.flatten()
         
-        mel_spec = librosa.feature.melspectrogram(
-            y=audio,
-            sr=SAMPLE_RATE,
-            n_mels=N_MELS,
-            n_fft=N_FFT,
-            hop_length=HOP_LENGTH
-        )
-        mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max)
+        mel_spec_db = log_mel_spectrogram(audio)
         
         expected_width = 63
         current_width = mel_spec_db.shape[1]
@@ -78,24 +217,54 @@ class AudioProcessor:
 
     def process_next_chunk(self, gain=1.0):
         """
-        Process the next chunk of audio from the queue.
-        Returns: (prediction, confidence, label, rms) or None if queue is empty
+        Process the next chunk of audio from the queue (synchronous use, without start_stream's worker).
+        Returns: (prediction, confidence, label, rms, window end) or None if queue is empty
         """
-        if not self.audio_queue.empty():
-            new_data = self.audio_queue.get() * gain
-            
-            # Update rolling buffer
-            self.audio_buffer = np.roll(self.audio_buffer, -STEP_SIZE)
-            self.audio_buffer[-STEP_SIZE:] = new_data.flatten()
-            
-            if self.model:
-                input_data = self.preprocess_audio(self.audio_buffer)
-                prediction = self.model.predict(input_data, verbose=0)
-                class_idx = np.argmax(prediction)
-                confidence = prediction[0][class_idx]
-                label = CLASSES[class_idx]
-                rms = np.sqrt(np.mean(self.audio_buffer**2))
-                
-                return prediction[0], confidence, label, rms
-        
-        return None
+        try:
+            queued_at, end_sample, block = self.audio_queue.get_nowait()
+        except queue.Empty:
+            return None
+        self.audio_queue.task_done()
+        self.metrics.observe("queue_wait", time.perf_counter() - queued_at)
+        return self.process_block(block, gain, end_sample=end_sample)
+
+    def process_block(self, block, gain=None, publish=False, end_sample=None):
+        """
+        Shifts one captured block into the window and classifies it (publishing the result if asked).
+        end_sample: the block's end position in the stream (default: right after the previous block).
+        Returns: (prediction, confidence, label, rms, window end in stream seconds) or None without a model
+        """
+        t0 = time.perf_counter()
+        new_data = block * (self.gain if gain is None else gain)
+
+        # Update rolling buffer and compute only the new mel frames
+        shifted = self.frontend.append(new_data)
+        self.window_end = self.window_end + len(block) if end_sample is None else end_sample
+        t1 = time.perf_counter()
+        mel_spec_db = self.frontend.update(shifted)
+        t2 = time.perf_counter()
+        self.metrics.observe("buffer_update", t1 - t0)
+        self.metrics.observe("features", t2 - t1)
+
+        if not self.model:
+            return None
+        input_data = mel_spec_db.reshape(1, 64, 63, 1)
+        if self.gate.should_run(new_data, input_data):
+            prediction = self.model.predict(input_data)[0]
+        else:
+            prediction = self.gate.fallback  # Quiet hop: background (or the first-stage model's output)
+            self.metrics.inc("gate_skipped")
+        t3 = time.perf_counter()
+        self.metrics.observe("inference", t3 - t2)
+
+        class_idx = np.argmax(prediction)
+        confidence = prediction[class_idx]
+        label = CLASSES[class_idx]
+        rms = np.sqrt(np.mean(self.audio_buffer**2))
+        result = (prediction, confidence, label, rms, self.window_end / SAMPLE_RATE)
+        if publish:
+            self._publish(result)
+        self.metrics.observe("postprocess", time.perf_counter() - t3)
+        self.metrics.inc("windows_processed")
+
+        return result
@@ -0,0 +1,104 @@
+import time
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.utils import SAMPLE_RATE, STEP_SIZE
+
+NO_STATUS = SimpleNamespace(input_overflow=False)  # Replayed blocks never overflow
+
+
+class MicrophoneSource:
+    """Live input: a sounddevice.InputStream delivering STEP_SIZE blocks to the processor's callback."""
+
+    def __init__(self, device=None):
+        self.device = device
+        self.stream = None
+
+    def start(self, processor):
+        import sounddevice as sd  # Needs PortAudio; not imported on headless replay
+        self.stream = sd.InputStream(callback=processor.audio_callback, channels=1, samplerate=SAMPLE_RATE,
+                                     blocksize=STEP_SIZE, device=self.device)
+        self.stream.start()
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+    def join(self, timeout=None):
+        """A live stream never finishes on its own."""
+        return False
+
+
+class ReplaySource:
+    """
+    Feeds a recording (WAV path or float array at SAMPLE_RATE) to the processor in STEP_SIZE blocks.
+
+    speed=1.0 paces blocks at real time through the same non-blocking callback as the
+    microphone (so a slow processor drops blocks, as it would live); speed > 1 is paced that
+    many times faster. speed=0 replays as fast as possible and waits for queue space instead
+    of dropping, so every block is processed and runs are deterministic.
+    """
+
+    def __init__(self, audio, speed=0.0):
+        self.audio = audio
+        self.speed = speed
+        self.samples = 0  # Samples fed so far
+        self.wall_time = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def blocks(self):
+        """STEP_SIZE blocks of the recording, shape (STEP_SIZE, 1) like sounddevice; the tail is zero-padded."""
+        if isinstance(self.audio, str):
+            from src.scan_recordings import read_blocks
+            chunks = read_blocks(self.audio)
+        else:
+            chunks = [np.asarray(self.audio, dtype=np.float32)]
+        pending = np.zeros(0, dtype=np.float32)
+        for chunk in chunks:
+            pending = np.concatenate([pending, chunk])
+            while len(pending) >= STEP_SIZE:
+                yield pending[:STEP_SIZE, np.newaxis]
+                pending = pending[STEP_SIZE:]
+        if len(pending):
+            yield np.pad(pending, (0, STEP_SIZE - len(pending)))[:, np.newaxis]
+
+    def start(self, processor):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(processor,), name="replay", daemon=True)
+        self._thread.start()
+
+    def _run(self, processor):
+        interval = STEP_SIZE / SAMPLE_RATE / self.speed if self.speed > 0 else 0.0
+        begin = time.perf_counter()
+        for k, block in enumerate(self.blocks()):
+            if self._stop.is_set():
+                break
+            if interval:
+                time.sleep(max(0.0, begin + k * interval - time.perf_counter()))
+                processor.audio_callback(block, STEP_SIZE, None, NO_STATUS)
+            else:
+                processor.enqueue(block.copy(), wait=True)  # Waits for space: lossless
+            self.samples += STEP_SIZE
+        self.wall_time = time.perf_counter() - begin
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def join(self, timeout=None):
+        """Waits until the whole recording has been fed. Returns True when it has."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+            return not self._thread.is_alive()
+        return True
+
+    @property
+    def audio_seconds(self):
+        return self.samples / SAMPLE_RATE
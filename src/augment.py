@@ -0,0 +1,276 @@
+import functools
+import numpy as np
+import scipy.fft
+import librosa
+
+# Phase vocoder STFT (librosa.effects.time_stretch defaults)
+STFT_N_FFT = 2048
+STFT_HOP = 512
+CHUNK_SIZE = 32  # Clips per STFT pass (bounds temporary memory)
+
+
+@functools.lru_cache(maxsize=None)
+def _window(n_fft=STFT_N_FFT):
+    window = librosa.filters.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+    window.flags.writeable = False
+    return window
+
+
+def _per_clip(values, n):
+    """Broadcasts a scalar or per-clip parameter to shape (n,)."""
+    return np.broadcast_to(np.asarray(values, dtype=np.float64), (n,))
+
+
+def _gather(array, idx):
+    """array: (N, M, ...), idx: (N, K) -> (N, K, ...), one index row per clip."""
+    return array[np.arange(len(array))[:, None], idx]
+
+
+def _interp_rows(array, positions):
+    """
+    Linear interpolation along axis 1 of (N, M, ...) at per-clip fractional positions (N, K).
+    Positions past M - 1 give zero.
+    """
+    n, size = array.shape[:2]
+    positions = np.asarray(positions, dtype=np.float32)
+    floor = np.floor(np.minimum(positions, size - 1))
+    frac = (positions - floor).reshape(positions.shape + (1,) * (array.ndim - 2))
+    # One zero sample appended per row, and flat row-major indices (much faster than 2-D fancy indexing)
+    flat = np.concatenate([array, np.zeros_like(array[:, :1])], axis=1).reshape(n * (size + 1), *array.shape[2:])
+    idx = floor.astype(np.int64)
+    idx += (np.arange(n) * (size + 1))[:, None]
+    left = flat[idx]
+    out = flat[idx + 1]
+    out -= left
+    out *= frac
+    out += left
+    out[positions > size - 1] = 0.0
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Audio domain: (N, samples) batches of equal-length clips, output at the same length
+# ---------------------------------------------------------------------------
+
+def _stft(batch):
+    """(N, samples) -> (N, frames, bins), centred with zero padding."""
+    pad = STFT_N_FFT // 2
+    padded = np.pad(batch, ((0, 0), (pad, pad)))
+    frames = np.lib.stride_tricks.sliding_window_view(padded, STFT_N_FFT, axis=-1)[:, ::STFT_HOP]
+    return scipy.fft.rfft(frames * _window(), axis=-1)
+
+
+def _istft(spec, length, frames=None):
+    """
+    (N, frames, bins) -> (N, length) by windowed overlap-add (inverse of _stft).
+    frames: per clip number of frames the clip really has (default all). Each clip is normalised by
+    the window overlap of its own frames only, as librosa.istft of that clip alone would.
+    """
+    n, n_frames, _ = spec.shape
+    frames = np.full(n, n_frames) if frames is None else np.minimum(frames, n_frames)
+    signal = scipy.fft.irfft(spec, n=STFT_N_FFT, axis=-1).astype(np.float32, copy=False)
+    signal *= _window()
+
+    overlap = STFT_N_FFT // STFT_HOP
+    n_blocks = n_frames + overlap - 1  # Hop-sized output blocks
+    out = np.zeros((n, n_blocks * STFT_HOP), dtype=np.float32)
+    # Overlap-add one hop-sized slice of every frame at a time (n_fft // hop passes)
+    for j in range(overlap):
+        seg = slice(j * STFT_HOP, (j + 1) * STFT_HOP)
+        out[:, j * STFT_HOP:(j + n_frames) * STFT_HOP] += signal[:, :, seg].reshape(n, -1)
+
+    # Window sum-square per clip: block b gets slice j of frame b - j when that frame is one of the clip's
+    window_sq = (_window() ** 2).reshape(overlap, STFT_HOP)
+    source = np.arange(n_blocks)[None, :] - np.arange(overlap)[:, None]  # (overlap, blocks) frame index
+    present = (source[None] >= 0) & (source[None] < frames[:, None, None])  # (N, overlap, blocks)
+    norm = np.einsum("njb,jr->nbr", present.astype(np.float32), window_sq).reshape(n, -1)
+    out /= np.where(norm > np.finfo(np.float32).tiny, norm, 1.0)
+
+    start = STFT_N_FFT // 2
+    out = out[:, start:start + length]
+    if out.shape[1] < length:
+        out = np.pad(out, ((0, 0), (0, length - out.shape[1])))
+    return out
+
+
+def _frames_for(length):
+    """STFT frames that overlap the first `length` output samples."""
+    return -(-(length + STFT_N_FFT // 2) // STFT_HOP)
+
+
+def _phase_vocoder(spec, rates, n_out):
+    """
+    Batched librosa.phase_vocoder with a different rate per clip, computing the first n_out output frames.
+    spec: (N, frames, bins). Returns ((N, n_out, bins), per clip number of stretched frames
+    ceil(frames / rate)); frames past the end of a clip are zero.
+
+    Phases are carried as unit phasors: the phase advance between two frames is
+    next * conj(previous), already wrapped, so no angles (arctan2 / cos / sin) are computed.
+    Like librosa it steps through the output frames, but each step covers every clip of the batch.
+    """
+    n, n_frames, n_bins = spec.shape
+    steps = np.arange(n_out)[None, :] * rates[:, None]  # (N, n_out) source frame positions
+    idx = np.minimum(np.floor(steps).astype(np.int64), n_frames)
+
+    # Magnitude and phasor once per source frame (two zero frames appended, like librosa)
+    phasor = np.zeros((n, n_frames + 2, n_bins), dtype=np.complex64)
+    phasor[:, :n_frames] = spec
+    mag = np.abs(phasor)
+    silent = mag == 0
+    phasor += silent  # Zero bins have phase 0: phasor 1
+    phasor *= 1.0 / np.where(silent, np.float32(1.0), mag)
+    advance = phasor[:, 1:] * phasor[:, :-1].conj()
+
+    out = _interp_rows(mag, steps).astype(np.complex64)
+    out[steps >= n_frames] = 0.0
+    rows = np.arange(n)
+    acc = phasor[:, 0].copy()
+    for t in range(n_out):
+        out[:, t] *= acc
+        acc *= advance[rows, idx[:, t]]
+    return out, np.ceil(n_frames / rates).astype(np.int64)
+
+
+def _lowpass(batch, cutoffs):
+    """Zeroes everything above cutoffs (fraction of Nyquist, per clip)."""
+    rows = np.flatnonzero(cutoffs < 1.0)
+    if len(rows) == 0:
+        return batch
+    spectrum = scipy.fft.rfft(batch[rows], axis=-1)
+    bins = np.arange(spectrum.shape[1]) / (spectrum.shape[1] - 1)
+    spectrum *= bins[None, :] <= cutoffs[rows, None]
+    out = batch.copy()
+    out[rows] = scipy.fft.irfft(spectrum, n=batch.shape[1], axis=-1)
+    return out
+
+
+def change_speed(batch, rates):
+    """
+    Plays each clip `rate` times faster (pitch and tempo both change, like tape speed).
+    batch: (N, samples). rates: scalar or (N,). Output is zero-padded to the input length.
+    """
+    batch = np.asarray(batch, dtype=np.float32)
+    rates = _per_clip(rates, len(batch))
+    # Anti-aliasing when reading faster
+    batch = _lowpass(batch, 1.0 / rates)
+    return _interp_rows(batch, np.arange(batch.shape[1])[None, :] * rates[:, None])
+
+
+def time_stretch(batch, rates):
+    """
+    Batched librosa.effects.time_stretch (tempo changes, pitch does not).
+    batch: (N, samples). rates: scalar or (N,). Output is cropped/zero-padded to the input length.
+    """
+    batch = np.asarray(batch, dtype=np.float32)
+    rates = _per_clip(rates, len(batch))
+    length = batch.shape[1]
+    out = np.empty_like(batch)
+    for start in range(0, len(batch), CHUNK_SIZE):
+        chunk = slice(start, start + CHUNK_SIZE)
+        # Only the frames that reach the kept `length` samples are synthesised
+        spec, frames = _phase_vocoder(_stft(batch[chunk]), rates[chunk], _frames_for(length))
+        out[chunk] = _istft(spec, length, frames)
+    # Stretched length is round(length / rate); the rest is padding
+    out[np.arange(length)[None, :] >= np.round(length / rates)[:, None]] = 0.0
+    return out
+
+
+def pitch_shift(batch, n_steps, bins_per_octave=12):
+    """
+    Batched librosa.effects.pitch_shift: phase-vocoder stretch by `rate`, then resample by 1/rate.
+    batch: (N, samples). n_steps: scalar or (N,) semitones. Output has the input length.
+    """
+    batch = np.asarray(batch, dtype=np.float32)
+    rates = 2.0 ** (-_per_clip(n_steps, len(batch)) / bins_per_octave)
+    length = batch.shape[1]
+    out = np.empty_like(batch)
+    for start in range(0, len(batch), CHUNK_SIZE):
+        chunk = slice(start, start + CHUNK_SIZE)
+        chunk_rates = rates[chunk]
+        stretched_length = int(np.ceil(length / chunk_rates.min())) + 1
+        stretched, frames = _phase_vocoder(_stft(batch[chunk]), chunk_rates, _frames_for(stretched_length))
+        # Anti-aliasing for shifting up: drop bins that would land above Nyquist after resampling
+        bins = np.arange(stretched.shape[-1]) / (stretched.shape[-1] - 1)
+        stretched *= (bins[None, :] <= chunk_rates[:, None])[:, None, :]
+        y_stretch = _istft(stretched, stretched_length, frames)
+        y_stretch[np.arange(y_stretch.shape[1])[None, :] >= np.round(length / chunk_rates)[:, None]] = 0.0
+        out[chunk] = _interp_rows(y_stretch, np.arange(length)[None, :] / chunk_rates[:, None])
+    return out
+
+
+def mix_audio(foreground, background, snr_db):
+    """
+    Mix foreground signal with background noise at given SNR.
+    Single clips (samples,) with a scalar snr_db, or batches (N, samples) with one SNR per clip.
+    """
+    if np.ndim(foreground) > 1:
+        snr_db = np.asarray(snr_db, dtype=np.float64).reshape(-1, 1)
+
+    # Calculate power
+    fg_power = np.mean(foreground ** 2, axis=-1, keepdims=True)
+    bg_power = np.mean(background ** 2, axis=-1, keepdims=True)
+    silent = bg_power == 0  # Nothing to mix in: foreground is returned unchanged
+
+    # Calculate required background power, then scale background
+    target_bg_power = fg_power / (10 ** (snr_db / 10))
+    scale = np.sqrt(target_bg_power / np.where(silent, 1, bg_power))
+    mixed = foreground + background * scale
+
+    # Normalize to prevent clipping
+    max_val = np.max(np.abs(mixed), axis=-1, keepdims=True)
+    mixed = mixed / np.where((max_val > 1.0) & ~silent, max_val, 1)
+    return np.where(silent, foreground, mixed).astype(np.result_type(foreground), copy=False)
+
+
+def augment_pitch_speed(clips, pitch_steps, speed_rates):
+    """
+    Apply pitch shift or time stretch to a batch of equal-length clips.
+    pitch_steps / speed_rates: per clip, NaN where that augmentation is not applied.
+    """
+    out = np.array(clips, dtype=np.float32)
+    pitch = ~np.isnan(pitch_steps)
+    speed = ~np.isnan(speed_rates)
+    if pitch.any():
+        # Pitch shift (phase vocoder)
+        out[pitch] = pitch_shift(out[pitch], pitch_steps[pitch])
+    if speed.any():
+        # Time stretch (phase vocoder: tempo changes, pitch does not)
+        out[speed] = time_stretch(out[speed], speed_rates[speed])
+    return out
+
+
+def apply_gain(batch, gains):
+    """Scales each clip by its gain (scalar or (N,))."""
+    batch = np.asarray(batch, dtype=np.float32)
+    return batch * _per_clip(gains, len(batch)).astype(np.float32)[:, None]
+
+
+def add_noise(batch, noise_factors, rng):
+    """Adds white noise with per-clip standard deviation noise_factors (scalar or (N,))."""
+    batch = np.asarray(batch, dtype=np.float32)
+    noise = rng.standard_normal(batch.shape, dtype=np.float32)
+    return batch + _per_clip(noise_factors, len(batch)).astype(np.float32)[:, None] * noise
+
+
+# ---------------------------------------------------------------------------
+# Spectrogram domain: (N, frames, bins) STFT power (see features.stft_power)
+# Much cheaper than the audio-domain versions when only features are needed.
+# ---------------------------------------------------------------------------
+
+def pitch_shift_power(power, n_steps, bins_per_octave=12):
+    """Pitch shift on an STFT power spectrogram: moves energy at bin f to f * 2 ** (n_steps / 12)."""
+    factors = 2.0 ** (_per_clip(n_steps, len(power)) / bins_per_octave)
+    positions = np.arange(power.shape[-1])[None, :] / factors[:, None]
+    return np.swapaxes(_interp_rows(np.swapaxes(power, 1, 2), positions), 1, 2)
+
+
+def time_stretch_power(power, rates):
+    """Time stretch on an STFT power spectrogram (frame interpolation), same number of frames."""
+    rates = _per_clip(rates, len(power))
+    return _interp_rows(power, np.arange(power.shape[1])[None, :] * rates[:, None])
+
+
+def change_speed_power(power, rates):
+    """Speed change (tape style) on an STFT power spectrogram: pitch and tempo both scale by rate."""
+    rates = _per_clip(rates, len(power))
+    return time_stretch_power(pitch_shift_power(power, 12 * np.log2(rates)), rates)
@@ -0,0 +1,66 @@
+import time
+import numpy as np
+import librosa
+
+from src.utils import SAMPLE_RATE, DURATION
+from src.features import stft_power
+from src.augment import pitch_shift, time_stretch, change_speed, pitch_shift_power, add_noise, apply_gain, augment_pitch_speed
+
+BLOCK_SIZE = int(SAMPLE_RATE * DURATION)
+BATCH_SIZE = 128
+LIBROSA_CLIPS = 16  # Per-clip librosa is slow; time fewer clips
+
+def clips_per_second(fn, num_clips):
+    fn()  # Warmup
+    start = time.perf_counter()
+    fn()
+    return num_clips / (time.perf_counter() - start)
+
+def main():
+    rng = np.random.default_rng(0)
+    batch = (rng.standard_normal((BATCH_SIZE, BLOCK_SIZE)) * 0.1).astype(np.float32)
+    n_steps = rng.uniform(-2, 2, BATCH_SIZE)
+    rates = rng.uniform(0.8, 1.2, BATCH_SIZE)
+    few = batch[:LIBROSA_CLIPS]
+    # Generator mix: half pitch shift, half time stretch (NaN = not applied)
+    use_pitch = np.arange(BATCH_SIZE) % 2 == 0
+    pitch_steps = np.where(use_pitch, n_steps, np.nan)
+    speed_rates = np.where(use_pitch, np.nan, rates)
+
+    def librosa_generator():
+        for y, s, r in zip(few, pitch_steps, speed_rates):
+            if np.isnan(r):
+                librosa.effects.pitch_shift(y, sr=SAMPLE_RATE, n_steps=s)
+            else:
+                librosa.util.fix_length(librosa.effects.time_stretch(y, rate=r), size=BLOCK_SIZE)
+
+    rows = [
+        ("Pitch shift",
+         lambda: [librosa.effects.pitch_shift(y, sr=SAMPLE_RATE, n_steps=s) for y, s in zip(few, n_steps)],
+         lambda: pitch_shift(batch, n_steps)),
+        ("Pitch shift (spectrogram)",
+         lambda: [librosa.effects.pitch_shift(y, sr=SAMPLE_RATE, n_steps=s) for y, s in zip(few, n_steps)],
+         lambda: pitch_shift_power(stft_power(batch), n_steps)),
+        ("Time stretch",
+         lambda: [librosa.effects.time_stretch(y, rate=r) for y, r in zip(few, rates)],
+         lambda: time_stretch(batch, rates)),
+        ("Speed change",
+         lambda: [librosa.resample(y, orig_sr=SAMPLE_RATE * r, target_sr=SAMPLE_RATE) for y, r in zip(few, rates)],
+         lambda: change_speed(batch, rates)),
+        ("Pitch / stretch (generator)",
+         librosa_generator,
+         lambda: augment_pitch_speed(batch, pitch_steps, speed_rates)),
+        ("Gain + noise",
+         lambda: [y * g + 0.005 * np.random.randn(len(y)) for y, g in zip(few, rates)],
+         lambda: add_noise(apply_gain(batch, rates), 0.005, rng)),
+    ]
+
+    print(f"Batch size {BATCH_SIZE}, {DURATION:.0f}s clips at {SAMPLE_RATE} Hz")
+    print(f"{'Augmentation':<28} {'librosa clips/s':>16} {'batched clips/s':>16} {'speedup':>8}")
+    for name, per_clip, batched in rows:
+        base = clips_per_second(per_clip, LIBROSA_CLIPS)
+        fast = clips_per_second(batched, BATCH_SIZE)
+        print(f"{name:<28} {base:>16.0f} {fast:>16.0f} {fast / base:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
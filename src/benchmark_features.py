@@ -0,0 +1,38 @@
+import time
+import numpy as np
+import librosa
+
+from src.utils import SAMPLE_RATE, DURATION, N_MELS, N_FFT, HOP_LENGTH
+from src.features import log_mel_spectrogram
+
+BLOCK_SIZE = int(SAMPLE_RATE * DURATION)
+BATCH_SIZES = [1, 8, 32, 128, 512]
+MIN_CLIPS = 512  # Clips timed per configuration
+
+def librosa_per_clip(batch):
+    """Current per-clip path (Same logic as the original 1_preprocess.py)."""
+    out = []
+    for audio in batch:
+        mel_spec = librosa.feature.melspectrogram(y=audio, sr=SAMPLE_RATE, n_mels=N_MELS, n_fft=N_FFT, hop_length=HOP_LENGTH)
+        out.append(librosa.power_to_db(mel_spec, ref=np.max))
+    return np.array(out)
+
+def clips_per_second(fn, batch):
+    fn(batch)  # Warmup (filterbank/window caches, FFT plans)
+    runs = max(1, MIN_CLIPS // len(batch))
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn(batch)
+    return runs * len(batch) / (time.perf_counter() - start)
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'Batch size':>10} {'librosa clips/s':>16} {'batched clips/s':>16} {'speedup':>8}")
+    for batch_size in BATCH_SIZES:
+        batch = (rng.standard_normal((batch_size, BLOCK_SIZE)) * 0.1).astype(np.float32)
+        base = clips_per_second(librosa_per_clip, batch)
+        fast = clips_per_second(log_mel_spectrogram, batch)
+        print(f"{batch_size:>10} {base:>16.0f} {fast:>16.0f} {fast / base:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+from src.utils import CLASSES, SAMPLE_RATE, BLOCK_SIZE, STEP_SIZE
+from src.features import StreamingMelSpectrogram
+from src.inference import load_backend, BACKENDS
+from src.gating import InferenceGate, GATE_MODES, FIRST_STAGE_MODEL_PATH
+from src.scan_recordings import detect_events, THRESHOLD
+from src.stream_dataset import load_sources
+
+# Constants
+STREAM_MINUTES = 10  # Length of the replayed recording
+EVENTS_PER_MINUTE = 2  # Chainsaw / gunshot clips inserted into the quiet background
+FOREST_LEVEL_DB = (-65.0, -45.0)  # dBFS of the background bed (quiet forest)
+EVENT_LEVEL_DB = (-35.0, -10.0)  # dBFS of inserted events
+BACKEND = "tflite"
+SEED = 0
+
+
+def scale_to_db(clip, level_db):
+    rms = np.sqrt(np.mean(clip ** 2)) + 1e-10
+    return clip * (10 ** (level_db / 20) / rms)
+
+
+def make_recording(sources, minutes=STREAM_MINUTES, seed=SEED):
+    """
+    A long quiet background recording with target clips inserted at random times.
+    Returns (audio, events) with events a list of (start_s, end_s, label).
+    """
+    rng = np.random.default_rng(seed)
+    background = sources["background"]
+    n_clips = int(minutes * 60 * SAMPLE_RATE) // BLOCK_SIZE
+    audio = np.concatenate([scale_to_db(background[i], rng.uniform(*FOREST_LEVEL_DB))
+                            for i in rng.integers(len(background), size=n_clips)]).astype(np.float32)
+
+    targets = [c for c in CLASSES if c != "background" and c in sources]
+    n_events = int(minutes * EVENTS_PER_MINUTE)
+    # One event per slot, so inserted clips never overlap
+    slot = len(audio) // n_events
+    events = []
+    for k in range(n_events):
+        label = targets[rng.integers(len(targets))]
+        clip = sources[label][rng.integers(len(sources[label]))]
+        start = k * slot + rng.integers(0, slot - BLOCK_SIZE)
+        audio[start:start + BLOCK_SIZE] += scale_to_db(clip, rng.uniform(*EVENT_LEVEL_DB))
+        events.append((start / SAMPLE_RATE, (start + BLOCK_SIZE) / SAMPLE_RATE, label))
+    return audio, events
+
+
+def replay_windows(audio):
+    """(blocks, windows): every STEP_SIZE block and the model input after pushing it, as in AudioProcessor."""
+    frontend = StreamingMelSpectrogram(window_size=BLOCK_SIZE)
+    blocks, windows = [], []
+    frontend.push(audio[:BLOCK_SIZE])
+    for start in range(BLOCK_SIZE, len(audio) - STEP_SIZE + 1, STEP_SIZE):
+        block = audio[start:start + STEP_SIZE]
+        blocks.append(block)
+        windows.append(frontend.push(block).reshape(1, 64, 63, 1).copy())
+    return blocks, windows
+
+
+def run(gate, model, blocks, windows):
+    """Replays the windows through the gate and model. Returns ([(start_s, probs)], seconds)."""
+    predictions = []
+    begin = time.perf_counter()
+    for k, (block, window) in enumerate(zip(blocks, windows)):
+        probs = model.predict(window)[0] if gate.should_run(block, window) else gate.fallback
+        predictions.append(((k + 1) * STEP_SIZE / SAMPLE_RATE, probs))
+    return predictions, time.perf_counter() - begin
+
+
+def recall(truth, detected):
+    """Fraction of ground-truth events overlapped by a detected event of the same class."""
+    hits = sum(any(d["class"] == label and d["start"] < end and d["end"] > start for d in detected)
+               for start, end, label in truth)
+    return hits / max(len(truth), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute saved vs detection recall of the inference gates on a replayed recording.")
+    parser.add_argument("--backend", default=BACKEND, choices=BACKENDS)
+    parser.add_argument("--model", default=None, help="Model path (default depends on backend)")
+    parser.add_argument("--minutes", type=float, default=STREAM_MINUTES)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--first-stage", default=FIRST_STAGE_MODEL_PATH, help="First-stage .tflite model of the 'model' gate")
+    args = parser.parse_args()
+
+    _, sources = load_sources(seed=SEED)  # Held-out clips, as in evaluation
+    if "background" not in sources or len(sources) < 2:
+        print("Error: Need background and target clips. Run 0_download_data.py first.")
+        sys.exit(1)
+
+    audio, truth = make_recording(sources, args.minutes)
+    blocks, windows = replay_windows(audio)
+    model = load_backend(args.backend, args.model)
+    print(f"Replaying {len(audio) / SAMPLE_RATE / 60:.1f} min ({len(windows)} hops, {len(truth)} events) "
+          f"with the {args.backend} model")
+
+    modes = [m for m in GATE_MODES if m != "model" or os.path.exists(args.first_stage)]
+    if "model" not in modes:
+        print(f"Note: {args.first_stage} not found (run sweep_models.py); skipping the 'model' gate.")
+
+    print(f"\n{'Gate':<6} {'Skipped':>8} {'Full runs':>10} {'Time s':>8} {'Saved':>7} {'Recall':>7} {'vs off':>7}")
+    baseline_time, baseline_events = None, None
+    for mode in modes:
+        gate = InferenceGate(mode, first_stage_path=args.first_stage)
+        predictions, seconds = run(gate, model, blocks, windows)
+        detected = detect_events(predictions, args.threshold)
+        if mode == "off":
+            baseline_time, baseline_events = seconds, detected
+        # Ground-truth recall, and recall of the ungated detections (what the gate clipped)
+        kept = recall([(d["start"], d["end"], d["class"]) for d in baseline_events], detected)
+        print(f"{mode:<6} {gate.skip_fraction * 100:>7.1f}% {gate.windows - gate.skipped:>10} {seconds:>8.2f} "
+              f"{(1 - seconds / baseline_time) * 100:>6.1f}% {recall(truth, detected) * 100:>6.1f}% {kept * 100:>6.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+import time
+import importlib
+import numpy as np
+import tensorflow as tf
+
+from src.utils import CLASSES, INPUT_SHAPE
+from src.inference import KERAS_MODEL_PATH, TFLITE_MODEL_PATH, TFLiteBackend
+
+NUM_RUNS = 200
+WARMUP_RUNS = 10
+
+def time_per_window(fn, input_data, runs=NUM_RUNS):
+    """Returns per-call latencies in milliseconds."""
+    for _ in range(WARMUP_RUNS):
+        fn(input_data)
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(input_data)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+def load_keras_model():
+    if os.path.exists(KERAS_MODEL_PATH):
+        return tf.keras.models.load_model(KERAS_MODEL_PATH)
+    # Latency does not depend on the weights, so an untrained model is fine for timing
+    print(f"Warning: {KERAS_MODEL_PATH} not found. Timing an untrained build_ds_cnn.")
+    train = importlib.import_module("src.2_train")
+    return train.build_ds_cnn(INPUT_SHAPE, len(CLASSES))
+
+def main():
+    input_data = np.random.uniform(-80, 0, size=(1, *INPUT_SHAPE)).astype(np.float32)
+    results = {}
+
+    model = load_keras_model()
+    results["Keras predict"] = time_per_window(lambda x: model.predict(x, verbose=0), input_data)
+    results["Keras __call__"] = time_per_window(lambda x: model(x, training=False).numpy(), input_data)
+
+    if os.path.exists(TFLITE_MODEL_PATH):
+        backend = TFLiteBackend(TFLITE_MODEL_PATH)
+        results["TFLite int8"] = time_per_window(backend.predict, input_data)
+    else:
+        print(f"Warning: {TFLITE_MODEL_PATH} not found. Run 3_convert.py first.")
+
+    print(f"\nPer-window latency over {NUM_RUNS} runs (batch size 1):")
+    print(f"{'Backend':<16} {'median ms':>10} {'p95 ms':>10} {'windows/s':>10}")
+    for name, latencies in results.items():
+        median = np.median(latencies)
+        print(f"{name:<16} {median:>10.3f} {np.percentile(latencies, 95):>10.3f} {1000 / median:>10.1f}")
+
+if __name__ == "__main__":
+    main()
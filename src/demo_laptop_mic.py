@@ -5,94 +5,90 @@ import sounddevice as sd
 import tensorflow as tf
 import queue
 import time
-import winsound  # For Windows Beep
 
 # Constants
-from src.utils import MODEL_DIR, CLASSES, SAMPLE_RATE, DURATION, N_MELS, N_FFT, HOP_LENGTH, INPUT_SHAPE
+from src.utils import MODEL_DIR, CLASSES, SAMPLE_RATE, DURATION, N_MELS, N_FFT, HOP_LENGTH, INPUT_SHAPE, WINDOW_STEP, STEP_SIZE
+from src.features import StreamingMelSpectrogram
+from src.inference import load_backend, DEFAULT_MODEL_PATHS
+from src.metrics import Metrics, JsonLinesExporter, serve_prometheus, print_summary
+from src.alerts import AlertDispatcher, default_sinks
+from src.detection_store import DetectionStore
 
 # Constants
-MODEL_PATH = os.path.join(MODEL_DIR, "forest_guard.h5")
+BACKEND = "keras"  # "keras" (forest_guard.h5) or "tflite" (model_quantized.tflite, same model as the ESP32)
+MODEL_PATH = DEFAULT_MODEL_PATHS[BACKEND]
 # CLASSES, SAMPLE_RATE, DURATION imported from utils
 BLOCK_SIZE = int(SAMPLE_RATE * DURATION)
 THRESHOLD = 0.6 # Confidence threshold - lowered for better sensitivity
+METRICS_JSONL = None  # e.g. "metrics.jsonl": append a metrics snapshot every 10 s
+METRICS_PORT = None  # e.g. 9100: serve Prometheus metrics at http://localhost:9100/metrics
+DETECTION_DB = None  # e.g. detection_store.DB_PATH: keep every window's probabilities, RMS and events
+ALERT_WEBHOOK = None  # e.g. alerts.WEBHOOK_URL: also POST alerts (see alerts.serve_webhook_stub)
 
 # Sliding Window Constants
-WINDOW_STEP = 0.5 # Seconds (Overlap = DURATION - WINDOW_STEP)
-STEP_SIZE = int(SAMPLE_RATE * WINDOW_STEP)
+# WINDOW_STEP, STEP_SIZE imported from utils (Overlap = DURATION - WINDOW_STEP)
 
-# Audio Buffer (Rolling)
-# We initialized it with zeros
-audio_buffer = np.zeros(BLOCK_SIZE, dtype=np.float32)
+# Streaming Mel frontend (owns the rolling audio buffer)
+frontend = StreamingMelSpectrogram(window_size=BLOCK_SIZE)
+audio_buffer = frontend.audio
 
 # Audio Queue
 audio_queue = queue.Queue()
 
-def audio_callback(indata, frames, time, status):
+# Per-stage latency histograms and counters (see metrics.py)
+metrics = Metrics()
+
+def audio_callback(indata, frames, time_info, status):
     """Callback function to capture audio."""
     if status:
         print(status)
-    # Add incoming audio to the queue
-    audio_queue.put(indata.copy())
-
-def preprocess_audio(audio_buffer):
-    """Convert raw audio buffer to Mel-Spectrogram."""
-    # Flatten buffer
-    audio = audio_buffer.flatten()
-    
-    # Extract Mel-Spectrogram (Same logic as 1_preprocess.py)
-    mel_spec = librosa.feature.melspectrogram(
-        y=audio,
-        sr=SAMPLE_RATE,
-        n_mels=N_MELS,
-        n_fft=N_FFT,
-        hop_length=HOP_LENGTH
-    )
-    mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max)
-    
-    # Ensure shape matches model input (1, 64, 63, 1)
-    # Resize/Pad if necessary (simple resizing for real-time stability)
-    expected_width = 63
-    current_width = mel_spec_db.shape[1]
-    
-    if current_width < expected_width:
-        mel_spec_db = np.pad(mel_spec_db, ((0, 0), (0, expected_width - current_width)))
-    elif current_width > expected_width:
-        mel_spec_db = mel_spec_db[:, :expected_width]
-        
-    return mel_spec_db.reshape(1, 64, 63, 1)
+        if status.input_overflow:
+            metrics.inc("input_overflows")
+    # Add incoming audio to the queue (stamped for the queue-wait metric)
+    audio_queue.put((time.perf_counter(), indata.copy()))
 
 def main():
     if not os.path.exists(MODEL_PATH):
         print(f"Error: Model {MODEL_PATH} not found.")
         return
 
-    print("Loading Model...")
-    model = tf.keras.models.load_model(MODEL_PATH)
+    print(f"Loading Model ({BACKEND})...")
+    model = load_backend(BACKEND, MODEL_PATH)
     print("Model Loaded. Starting Real-Time Detection...")
     print("Listening... (Press Ctrl+C to stop)")
     print("-" * 50)
 
-    # Global buffer 
-    global audio_buffer
+    exporter = JsonLinesExporter(metrics, METRICS_JSONL).start() if METRICS_JSONL else None
+    if METRICS_PORT:
+        serve_prometheus(metrics, METRICS_PORT)
+    # Console, log file, beep (and webhook) run on their own threads: an alert never stalls this loop
+    alerts = AlertDispatcher(default_sinks(webhook_url=ALERT_WEBHOOK), threshold=THRESHOLD).start()
+    store = DetectionStore(DETECTION_DB, threshold=THRESHOLD).start() if DETECTION_DB else None
 
     # Start Recording Stream with smaller blocks
     with sd.InputStream(callback=audio_callback, channels=1, samplerate=SAMPLE_RATE, blocksize=STEP_SIZE):
         while True:
             try:
                 # Get small block (0.5s)
-                new_data = audio_queue.get()
-                
-                # Update rolling buffer
-                # Shift left
-                audio_buffer = np.roll(audio_buffer, -STEP_SIZE)
-                # Overwrite end with new data (flatten to 1D)
-                audio_buffer[-STEP_SIZE:] = new_data.flatten()
+                queued_at, new_data = audio_queue.get()
+                t0 = time.perf_counter()
+                metrics.observe("queue_wait", t0 - queued_at)
+                metrics.queue_depth = audio_queue.qsize()
                 
-                # Preprocess current 2s buffer
-                input_data = preprocess_audio(audio_buffer)
+                # Update rolling buffer and compute only the new mel frames
+                # (Same features as 1_preprocess.py, shape (1, 64, 63, 1))
+                shifted = frontend.append(new_data)
+                t1 = time.perf_counter()
+                mel_spec_db = frontend.update(shifted)
+                input_data = mel_spec_db.reshape(1, 64, 63, 1)
+                t2 = time.perf_counter()
                 
                 # Predict
-                prediction = model.predict(input_data, verbose=0)
+                prediction = model.predict(input_data)
+                t3 = time.perf_counter()
+                metrics.observe("buffer_update", t1 - t0)
+                metrics.observe("features", t2 - t1)
+                metrics.observe("inference", t3 - t2)
                 class_idx = np.argmax(prediction)
                 confidence = prediction[0][class_idx]
                 label = CLASSES[class_idx]
@@ -108,21 +104,26 @@ def main():
                 # Dynamic print row (overwrites previous line if supported, or just prints)
                 print(f"[DEBUG] Vol:{rms:.3f} | BG:{bg_conf:.2f} | CHAIN:{chain_conf:.2f} | GUN:{gun_conf:.2f}")
 
-                # Display Result
-                if confidence > THRESHOLD:
-                    if label in ["gunshot", "chainsaw"]:
-                        print(f"\n\033[91m[DANGER] >>> DETECTED: {label.upper()} ({confidence:.2f}) <<<\033[0m")
-                        if confidence > 0.8:
-                             winsound.Beep(1000, 200) 
-                    else:
-                        pass 
-                else:
-                    pass
+                # Alert (thresholded, de-duplicated and dispatched off this thread)
+                alerts.submit(label, confidence, rms, probabilities=prediction[0])
+                if store:
+                    store.record("local", time.time(), prediction[0], rms)
+
+                metrics.observe("postprocess", time.perf_counter() - t3)
+                metrics.inc("windows_processed")
                 
             except KeyboardInterrupt:
                 break
             except Exception as e:
                 print(f"Error: {e}")
 
+    alerts.stop()
+    if store:
+        store.close()
+    if exporter:
+        exporter.stop()
+    print()
+    print_summary(metrics)
+
 if __name__ == "__main__":
     main()
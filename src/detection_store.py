@@ -0,0 +1,361 @@
+import os
+import sys
+import time
+import queue
+import sqlite3
+import argparse
+import threading
+import numpy as np
+
+from src.utils import CLASSES, SAMPLE_RATE, BLOCK_SIZE, STEP_SIZE, DATA_DIR
+
+# Constants
+DB_PATH = os.path.join(DATA_DIR, "detections.db")
+THRESHOLD = 0.6  # Same as demo_laptop_mic.py: windows above it (non-background) form events
+WINDOW_SECONDS = BLOCK_SIZE / SAMPLE_RATE
+ROLLUP_LEVELS = [60, 3600]  # Bucket widths (seconds) of the dashboard rollups
+FLUSH_SECONDS = 1.0  # The writer commits at least this often
+BATCH_ROWS = 2000  # ... or as soon as this many windows are waiting
+QUEUE_ROWS = 100_000  # Windows buffered for the writer; newer ones are dropped (and counted) beyond this
+PROB_COLUMNS = [f"p_{c}" for c in CLASSES]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS sensors (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS windows (
+    sensor INTEGER NOT NULL, t REAL NOT NULL, rms REAL, {", ".join(f"{c} REAL" for c in PROB_COLUMNS)},
+    PRIMARY KEY (sensor, t)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY, sensor INTEGER NOT NULL, label TEXT NOT NULL,
+    start REAL NOT NULL, end REAL NOT NULL, peak_confidence REAL NOT NULL, windows INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS events_label_time ON events (label, end);
+CREATE INDEX IF NOT EXISTS events_sensor_label_time ON events (sensor, label, end);
+CREATE TABLE IF NOT EXISTS rollups (
+    sensor INTEGER NOT NULL, level INTEGER NOT NULL, bucket REAL NOT NULL, windows INTEGER NOT NULL,
+    rms_sum REAL NOT NULL, rms_max REAL NOT NULL,
+    {", ".join(f"{c}_sum REAL NOT NULL, {c}_max REAL NOT NULL" for c in PROB_COLUMNS)},
+    PRIMARY KEY (sensor, level, bucket)) WITHOUT ROWID;
+"""
+
+
+class DetectionStore:
+    """
+    Append-only SQLite (WAL) store of per-window probabilities, RMS, detected events and
+    dashboard rollups, for any number of sensors.
+
+    record() only enqueues: one writer thread owns the write connection, tracks events per
+    sensor (consecutive above-threshold windows of one class, as scan_recordings.detect_events)
+    and commits in batches of BATCH_ROWS / every FLUSH_SECONDS. A window whose (sensor, t) is
+    already stored is skipped (counted in `duplicates`). Windows are clustered by
+    (sensor, time) and events indexed by (label, end) and (sensor, label, end), so time-range
+    queries touch only the rows they return. Readers use their own connections and never
+    block the writer.
+    """
+
+    def __init__(self, path=DB_PATH, threshold=THRESHOLD, flush_seconds=FLUSH_SECONDS, batch_rows=BATCH_ROWS,
+                 queue_rows=QUEUE_ROWS):
+        self.path = path
+        self.threshold = threshold
+        self.flush_seconds = flush_seconds
+        self.batch_rows = batch_rows
+        self.queue = queue.Queue(maxsize=queue_rows)
+        self.dropped = 0
+        self.written = 0
+        self.duplicates = 0  # Windows whose (sensor, t) was already stored: skipped
+        self._local = threading.local()
+        self._sensor_ids = {}
+        self._open_events = {}  # sensor id -> event dict being extended
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = self._connect(check_same_thread=False)  # Used by the writer thread only (after setup)
+        self._db.executescript(SCHEMA)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="detection-store", daemon=True)
+
+    def _connect(self, **kwargs):
+        db = sqlite3.connect(self.path, timeout=30, **kwargs)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")  # WAL: durable up to the last checkpoint, no fsync per commit
+        return db
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    # Writing (any thread)
+
+    def record(self, sensor, t, probabilities, rms=None):
+        """Queues one classified window (t: window end, epoch seconds). Never blocks."""
+        try:
+            self.queue.put_nowait((sensor, t, probabilities, rms))
+        except queue.Full:
+            self.dropped += 1
+
+    def subscriber(self, sensor="local"):
+        """An AudioProcessor.subscribe() callback recording every window under `sensor` at wall-clock time."""
+        def on_result(result):
+            prediction, confidence, label, rms, _ = result
+            self.record(sensor, time.time(), prediction, rms)
+        return on_result
+
+    def close(self):
+        """Writes everything queued, closes open events and stops the writer."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        else:
+            self._flush(self._drain())
+        self._close_events(list(self._open_events))
+        self._db.commit()
+        self._db.close()
+
+    # Writer thread
+
+    def _drain(self):
+        rows = []
+        while True:
+            try:
+                rows.append(self.queue.get_nowait())
+            except queue.Empty:
+                return rows
+
+    def _run(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            deadline = time.monotonic() + self.flush_seconds
+            rows = []
+            while len(rows) < self.batch_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (self._stop.is_set() and self.queue.empty()):
+                    break
+                try:
+                    rows.append(self.queue.get(timeout=min(remaining, 0.1)))
+                except queue.Empty:
+                    pass
+            self._flush(rows)
+
+    def _sensor_id(self, name):
+        if name not in self._sensor_ids:
+            self._db.execute("INSERT OR IGNORE INTO sensors (name) VALUES (?)", (name,))
+            self._sensor_ids[name] = self._db.execute("SELECT id FROM sensors WHERE name = ?", (name,)).fetchone()[0]
+        return self._sensor_ids[name]
+
+    def _flush(self, rows):
+        """One transaction: windows, closed events and rollup upserts for a batch."""
+        if not rows:
+            return
+        sensors = np.array([self._sensor_id(r[0]) for r in rows], dtype=np.int64)
+        times = np.array([r[1] for r in rows], dtype=np.float64)
+        rms = np.array([np.nan if r[3] is None else r[3] for r in rows], dtype=np.float64)
+        probs = np.stack([np.asarray(r[2], dtype=np.float64).ravel() for r in rows])
+        keep = self._new_windows(sensors, times)
+        if not keep.all():
+            self.duplicates += int((~keep).sum())
+            sensors, times, rms, probs = sensors[keep], times[keep], rms[keep], probs[keep]
+
+        self._db.executemany(
+            f"INSERT INTO windows VALUES ({', '.join('?' * (3 + len(CLASSES)))})",
+            ((int(s), float(t), None if np.isnan(r) else float(r), *map(float, p))
+             for s, t, r, p in zip(sensors, times, rms, probs)))
+        self._track_events(sensors, times, probs)
+        self._update_rollups(sensors, times, np.nan_to_num(rms), probs)
+        self._db.commit()
+        self.written += len(times)
+
+    def _new_windows(self, sensors, times):
+        """Mask of the rows not stored yet (nor earlier in the batch), so a window is never counted twice in events or rollups."""
+        keep = np.zeros(len(times), dtype=bool)
+        keep[np.unique(np.stack([sensors.astype(np.float64), times], axis=1), axis=0, return_index=True)[1]] = True
+        for s in np.unique(sensors).tolist():
+            rows = sensors == s
+            stored = self._db.execute("SELECT t FROM windows WHERE sensor = ? AND t BETWEEN ? AND ?",
+                                      (s, float(times[rows].min()), float(times[rows].max()))).fetchall()
+            if stored:
+                keep &= ~(rows & np.isin(times, [r[0] for r in stored]))
+        return keep
+
+    def _track_events(self, sensors, times, probs):
+        class_idx = probs.argmax(axis=1)
+        confidence = probs[np.arange(len(probs)), class_idx]
+        for s, t, k, conf in zip(sensors.tolist(), times.tolist(), class_idx.tolist(), confidence.tolist()):
+            label = CLASSES[k]
+            detected = conf > self.threshold and label != "background"
+            current = self._open_events.get(s)
+            # A gap of more than one hop also ends an event (stream restarted, or windows dropped)
+            if current is not None and (not detected or label != current["label"] or t - current["end"] > 2 * STEP_SIZE / SAMPLE_RATE):
+                self._close_events([s])
+                current = None
+            if detected:
+                if current is None:
+                    self._open_events[s] = {"label": label, "start": t - WINDOW_SECONDS, "end": t,
+                                            "peak_confidence": conf, "windows": 1}
+                else:
+                    current["end"] = t
+                    current["peak_confidence"] = max(current["peak_confidence"], conf)
+                    current["windows"] += 1
+
+    def _close_events(self, sensors):
+        for s in sensors:
+            e = self._open_events.pop(s, None)
+            if e is not None:
+                self._db.execute("INSERT INTO events (sensor, label, start, end, peak_confidence, windows) VALUES (?, ?, ?, ?, ?, ?)",
+                                 (s, e["label"], e["start"], e["end"], e["peak_confidence"], e["windows"]))
+
+    def _update_rollups(self, sensors, times, rms, probs):
+        merge = ", ".join(["windows = windows + excluded.windows", "rms_sum = rms_sum + excluded.rms_sum",
+                           "rms_max = max(rms_max, excluded.rms_max)"]
+                          + [f"{c}_sum = {c}_sum + excluded.{c}_sum, {c}_max = max({c}_max, excluded.{c}_max)"
+                             for c in PROB_COLUMNS])
+        sql = (f"INSERT INTO rollups VALUES ({', '.join('?' * (6 + 2 * len(CLASSES)))}) "
+               f"ON CONFLICT (sensor, level, bucket) DO UPDATE SET {merge}")
+        for level in ROLLUP_LEVELS:
+            keys, group = np.unique(np.stack([sensors.astype(np.float64), np.floor(times / level) * level], axis=1),
+                                    axis=0, return_inverse=True)
+            group = group.ravel()
+            values = np.concatenate([rms[:, None], probs], axis=1)
+            sums = np.zeros((len(keys), values.shape[1]))
+            maxes = np.full((len(keys), values.shape[1]), -np.inf)
+            np.add.at(sums, group, values)
+            np.maximum.at(maxes, group, values)
+            counts = np.bincount(group, minlength=len(keys))
+            # Column order of the table: rms_sum, rms_max, then sum/max per class
+            stats = np.stack([sums, maxes], axis=2).reshape(len(keys), -1)
+            self._db.executemany(sql, ((int(s), level, float(b), int(n), *map(float, row))
+                                       for (s, b), n, row in zip(keys, counts, stats)))
+
+    # Reading (any thread, own connection)
+
+    def _reader(self):
+        if getattr(self._local, "db", None) is None:
+            self._local.db = self._connect()
+            self._local.db.row_factory = sqlite3.Row
+        return self._local.db
+
+    def _sensor_filter(self, sensor):
+        if sensor is None:
+            return None
+        row = self._reader().execute("SELECT id FROM sensors WHERE name = ?", (sensor,)).fetchone()
+        return -1 if row is None else row[0]
+
+    def sensors(self):
+        return [r[0] for r in self._reader().execute("SELECT name FROM sensors ORDER BY name")]
+
+    def events(self, label=None, sensor=None, since=None, until=None, min_confidence=None):
+        """Closed events (dicts) overlapping [since, until], oldest first."""
+        where, args = [], []
+        sensor_id = self._sensor_filter(sensor)
+        if sensor_id is not None:
+            where.append("e.sensor = ?"), args.append(sensor_id)
+        if label is not None:
+            where.append("e.label = ?"), args.append(label)
+        if since is not None:
+            where.append("e.end >= ?"), args.append(since)  # Range scan of the (sensor,) label, end indexes
+        if until is not None:
+            where.append("e.start <= ?"), args.append(until)
+        if min_confidence is not None:
+            where.append("e.peak_confidence > ?"), args.append(min_confidence)
+        sql = ("SELECT s.name AS sensor, e.label, e.start, e.end, e.peak_confidence, e.windows "
+               "FROM events e JOIN sensors s ON s.id = e.sensor")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return [dict(r) for r in self._reader().execute(sql + " ORDER BY e.start", args)]
+
+    def trace(self, sensor, since, until):
+        """Per-window (t, rms, probabilities) arrays of one sensor in [since, until]."""
+        rows = self._reader().execute(
+            f"SELECT t, rms, {', '.join(PROB_COLUMNS)} FROM windows WHERE sensor = ? AND t BETWEEN ? AND ? ORDER BY t",
+            (self._sensor_filter(sensor), since, until)).fetchall()
+        data = np.array([tuple(r) for r in rows], dtype=np.float64).reshape(-1, 2 + len(CLASSES))
+        return data[:, 0], data[:, 1], data[:, 2:]
+
+    def rollup(self, sensor, level, since, until):
+        """Dashboard series: per bucket (start, windows, mean/max RMS, mean/max probability per class)."""
+        if level not in ROLLUP_LEVELS:
+            raise ValueError(f"No rollup at {level} s. Choose from {ROLLUP_LEVELS}.")
+        rows = self._reader().execute(
+            "SELECT * FROM rollups WHERE sensor = ? AND level = ? AND bucket BETWEEN ? AND ? ORDER BY bucket",
+            (self._sensor_filter(sensor), level, since, until)).fetchall()
+        series = []
+        for r in rows:
+            entry = {"bucket": r["bucket"], "windows": r["windows"], "rms_mean": r["rms_sum"] / r["windows"],
+                     "rms_max": r["rms_max"]}
+            for c, column in zip(CLASSES, PROB_COLUMNS):
+                entry[f"{c}_mean"] = r[f"{column}_sum"] / r["windows"]
+                entry[f"{c}_max"] = r[f"{column}_max"]
+            series.append(entry)
+        return series
+
+
+def parse_age(text):
+    """'90s', '15m', '12h', '7d' or '2w' -> seconds."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+    return float(text[:-1]) * units[text[-1]] if text[-1] in units else float(text)
+
+
+def fill(store, sensors, days, seed=0):
+    """Writes `days` of synthetic windows (one per hop, with occasional events) for each sensor, ending now."""
+    rng = np.random.default_rng(seed)
+    hop = STEP_SIZE / SAMPLE_RATE
+    end = time.time()
+    n = int(days * 86400 / hop)
+    for sensor in sensors:
+        times = end - (n - np.arange(n)) * hop
+        probs = rng.dirichlet([20, 1, 1], size=n).astype(np.float32)
+        for start in rng.integers(n - 8, size=max(1, n // 20000)):  # A few events per 3 hours
+            probs[start:start + 6] = [0.02, 0.9, 0.08] if rng.random() < 0.5 else [0.02, 0.08, 0.9]
+        rms = rng.uniform(0.001, 0.05, size=n)
+        for t, p, r in zip(times, probs, rms):
+            store.queue.put((sensor, float(t), p, float(r)))  # Blocking put: fill everything
+    return n * len(sensors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query (or fill with synthetic data) the detection store.")
+    parser.add_argument("--db", default=DB_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    q = sub.add_parser("events", help="List events")
+    q.add_argument("--label", choices=CLASSES)
+    q.add_argument("--sensor")
+    q.add_argument("--since", default="7d", help="Age, e.g. 12h, 7d, 4w")
+    q.add_argument("--min-confidence", type=float)
+    r = sub.add_parser("rollup", help="Dashboard rollup of one sensor")
+    r.add_argument("sensor")
+    r.add_argument("--level", type=int, default=ROLLUP_LEVELS[-1], choices=ROLLUP_LEVELS)
+    r.add_argument("--since", default="1d")
+    f = sub.add_parser("fill", help="Write synthetic windows (to measure write rate and query latency)")
+    f.add_argument("--sensors", type=int, default=1)
+    f.add_argument("--days", type=float, default=30)
+    args = parser.parse_args()
+
+    if args.command == "fill":
+        store = DetectionStore(args.db).start()
+        start = time.perf_counter()
+        n = fill(store, [f"sim-{i:03d}" for i in range(args.sensors)], args.days)
+        store.close()
+        seconds = time.perf_counter() - start
+        print(f"Wrote {n} windows in {seconds:.1f} s ({n / seconds:.0f} windows/s, "
+              f"{n / seconds * STEP_SIZE / SAMPLE_RATE:.0f} real-time streams), {os.path.getsize(args.db) / 2**20:.0f} MB")
+        return
+
+    if not os.path.exists(args.db):
+        print(f"Error: {args.db} not found.", file=sys.stderr)
+        sys.exit(1)
+    store = DetectionStore(args.db)
+    since = time.time() - parse_age(args.since)
+    start = time.perf_counter()
+    if args.command == "events":
+        rows = store.events(args.label, args.sensor, since, min_confidence=args.min_confidence)
+        elapsed = time.perf_counter() - start
+        for e in rows:
+            print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(e['start']))}  {e['sensor']:<12} "
+                  f"{e['label']:<10} {e['end'] - e['start']:6.1f} s  peak {e['peak_confidence']:.2f}")
+        print(f"{len(rows)} events in {elapsed * 1000:.1f} ms")
+    else:
+        series = store.rollup(args.sensor, args.level, since, time.time())
+        elapsed = time.perf_counter() - start
+        print(f"{'Bucket':<20} {'Windows':>8} {'RMS':>7} " + " ".join(f"{c[:8] + ' max':>13}" for c in CLASSES))
+        for b in series:
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(b['bucket'])):<20} {b['windows']:>8} "
+                  f"{b['rms_mean']:>7.4f} " + " ".join(f"{b[c + '_max']:>13.2f}" for c in CLASSES))
+        print(f"{len(series)} buckets in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
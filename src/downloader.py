@@ -0,0 +1,274 @@
+import os
+import ssl
+import json
+import time
+import random
+import hashlib
+import threading
+import http.client
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Constants
+WORKERS = 8
+RETRIES = 4
+BACKOFF = 0.5  # Seconds before the first retry, doubled on each attempt
+TIMEOUT = 30
+CHUNK_SIZE = 1 << 16
+PART_SUFFIX = ".part"
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+REDIRECT_STATUS = {301, 302, 303, 307, 308}
+MAX_REDIRECTS = 5
+
+
+class DownloadError(Exception):
+    """A download that failed for good (e.g. HTTP 404, or out of retries)."""
+
+
+class HTTPSource:
+    """
+    Files under an HTTP(S) base URL. Each thread keeps one persistent
+    (keep-alive) connection per host, redirects are followed (up to MAX_REDIRECTS)
+    and partial files are resumed with Range requests.
+    """
+
+    def __init__(self, base_url, timeout=TIMEOUT, verify_ssl=False):
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.timeout = timeout
+        # SSL verification is off by default (same as the previous urllib downloader)
+        self.ssl_context = ssl.create_default_context() if verify_ssl else ssl._create_unverified_context()
+        self._local = threading.local()
+
+    def _connection(self, url):
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        conns = self._local.__dict__.setdefault("conns", {})
+        if key not in conns:
+            if parts.scheme == "https":
+                conns[key] = http.client.HTTPSConnection(parts.netloc, timeout=self.timeout, context=self.ssl_context)
+            else:
+                conns[key] = http.client.HTTPConnection(parts.netloc, timeout=self.timeout)
+        return key, conns[key]
+
+    def _request(self, method, path, headers=None):
+        url = urllib.parse.urljoin(self.base_url, path)
+        for _ in range(MAX_REDIRECTS + 1):
+            key, conn = self._connection(url)
+            parts = urllib.parse.urlsplit(url)
+            try:
+                conn.request(method, parts.path + (f"?{parts.query}" if parts.query else ""), headers=headers or {})
+                response = conn.getresponse()
+            except (OSError, http.client.HTTPException):
+                # Drop the broken connection; the retry opens a new one
+                conn.close()
+                del self._local.conns[key]
+                raise
+            location = response.getheader("Location")
+            if response.status not in REDIRECT_STATUS or location is None:
+                return response
+            response.read()
+            url = urllib.parse.urljoin(url, location)
+        raise DownloadError(f"More than {MAX_REDIRECTS} redirects for {path}")
+
+    def _check_status(self, response, path):
+        if response.status in RETRY_STATUS:
+            response.read()
+            raise ConnectionError(f"HTTP {response.status} for {path}")
+        if not 200 <= response.status < 300:
+            response.read()
+            raise DownloadError(f"HTTP {response.status} for {path}")
+
+    @staticmethod
+    def _range_total(response):
+        """Full size from a Content-Range header ("bytes 0-99/1234" or "bytes */1234"), None if unknown."""
+        total = (response.getheader("Content-Range") or "").split("/")[-1]
+        return int(total) if total.isdigit() else None
+
+    def reset(self):
+        """Closes this thread's connections (after an error mid-response)."""
+        for conn in self._local.__dict__.pop("conns", {}).values():
+            conn.close()
+
+    def size(self, path):
+        """Size of the remote file, or None if the server does not report it."""
+        response = self._request("HEAD", path)
+        response.read()
+        self._check_status(response, path)
+        length = response.getheader("Content-Length")
+        return int(length) if length is not None else None
+
+    def open(self, path, offset=0):
+        """
+        Returns (stream, start, total): a readable response positioned at `start`
+        (offset if the server honoured the range, else 0) and the full file size
+        (None if the server does not report it).
+        """
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        response = self._request("GET", path, headers)
+        if response.status == 416:
+            response.read()
+            total = self._range_total(response)
+            if total == offset:  # Nothing left after offset: already complete
+                return response, offset, total
+            # The partial file is longer than the remote one (it changed): start over
+            return self.open(path)
+        self._check_status(response, path)
+        if response.status == 206:
+            start = int(response.getheader("Content-Range").split()[1].split("-")[0])
+            return response, start, self._range_total(response)
+        length = response.getheader("Content-Length")  # Absent for chunked responses
+        return response, 0, int(length) if length is not None else None
+
+
+class MirrorSource:
+    """Files under a local directory with the same layout (e.g. a clone of the ESC-50 repository)."""
+
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+
+    def _path(self, path):
+        return os.path.join(self.base_dir, *path.split("/"))
+
+    def reset(self):
+        pass
+
+    def size(self, path):
+        try:
+            return os.path.getsize(self._path(path))
+        except FileNotFoundError as e:
+            raise DownloadError(str(e))
+
+    def open(self, path, offset=0):
+        try:
+            f = open(self._path(path), "rb")
+        except FileNotFoundError as e:
+            raise DownloadError(str(e))
+        size = os.fstat(f.fileno()).st_size
+        offset = offset if offset <= size else 0  # Partial file longer than the source: start over
+        f.seek(offset)
+        return f, offset, size
+
+
+def make_source(location):
+    """HTTPSource for http(s):// URLs, MirrorSource for local directories."""
+    if location.startswith(("http://", "https://")):
+        return HTTPSource(location)
+    return MirrorSource(location)
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fetch_file(source, path, save_path, retries=RETRIES, backoff=BACKOFF):
+    """
+    Downloads `path` from `source` to `save_path`, resuming from `save_path + ".part"`
+    if a previous attempt was interrupted. The final file only appears once complete.
+    Transient errors are retried with exponential backoff. Returns the file size
+    (not checked if the source does not report it).
+    """
+    part_path = save_path + PART_SUFFIX
+    for attempt in range(retries + 1):
+        try:
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            stream, start, total = source.open(path, offset)
+            with stream, open(part_path, "ab" if start else "wb") as out_file:
+                out_file.truncate(start)
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    out_file.write(chunk)
+            size = os.path.getsize(part_path)
+            if total is not None and size != total:
+                if size > total:  # Cannot be resumed: the next attempt starts from scratch
+                    os.remove(part_path)
+                raise ConnectionError(f"Incomplete download of {path} ({size}/{total} bytes)")
+            os.replace(part_path, save_path)
+            return size
+        except DownloadError:
+            raise
+        except (OSError, http.client.HTTPException) as e:
+            source.reset()
+            if attempt == retries:
+                raise DownloadError(f"{path}: {e}") from e
+            time.sleep(backoff * 2 ** attempt * (1 + random.random()))
+
+
+class Manifest:
+    """
+    Size and SHA-256 of every completed download (JSON, keyed by path relative to the data dir),
+    so a re-run skips intact files without contacting the source.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def entry(file_path):
+        return {"size": os.path.getsize(file_path), "sha256": sha256_file(file_path)}
+
+    def is_complete(self, key, file_path):
+        entry = self.entries.get(key)
+        if entry is None or not os.path.exists(file_path) or os.path.getsize(file_path) != entry["size"]:
+            return False
+        return sha256_file(file_path) == entry["sha256"]
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def _download_one(source, path, save_path, key, manifest):
+    """Returns ("skipped" or "downloaded", new manifest entry or None). Raises DownloadError on failure."""
+    if manifest.is_complete(key, save_path):
+        return "skipped", None
+    if os.path.exists(save_path) and key not in manifest.entries:
+        # Present but not recorded (older downloader): keep it if the size matches the source.
+        # The check is best effort: if it fails, fetch_file (with its retries) decides.
+        try:
+            if os.path.getsize(save_path) == source.size(path):
+                return "skipped", Manifest.entry(save_path)
+        except (OSError, http.client.HTTPException, DownloadError):
+            source.reset()
+    fetch_file(source, path, save_path)
+    return "downloaded", Manifest.entry(save_path)
+
+
+def download_all(source, jobs, data_dir, manifest_path, workers=WORKERS, progress=None):
+    """
+    Downloads jobs [(source path, path relative to data_dir)] in a thread pool.
+    Returns a dict of counts: downloaded, skipped, failed.
+    """
+    manifest = Manifest(manifest_path)
+    counts = {"downloaded": 0, "skipped": 0, "failed": 0}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for path, key in jobs:
+            save_path = os.path.join(data_dir, key)
+            futures[pool.submit(_download_one, source, path, save_path, key, manifest)] = (path, key)
+        for future in as_completed(futures):
+            path, key = futures[future]
+            try:
+                status, entry = future.result()
+                counts[status] += 1
+                if entry is not None:
+                    manifest.entries[key] = entry
+            except Exception as e:  # One bad file never aborts the run (or loses the manifest)
+                counts["failed"] += 1
+                print(f"Failed to download {path}: {e}")
+            if progress is not None:
+                progress.update(1)
+    manifest.save()
+    return counts
@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+import argparse
+import importlib
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from sklearn.metrics import confusion_matrix
+
+from src.utils import DATA_DIR, CLASSES
+from src.inference import KERAS_MODEL_PATH, TFLITE_MODEL_PATH, KerasBackend, TFLiteBackend
+
+# Constants
+BATCH_SIZE = 256  # Windows per interpreter invoke
+WORKERS = os.cpu_count()  # One single-threaded interpreter per thread
+LATENCY_RUNS = 200  # Batch-size-1 invokes for the latency percentiles
+MAX_ACCURACY_DROP = 2.0  # Percentage points int8 may lose against the float model
+TEST_SIZE = 0.2  # Same held-out split as 2_train.py
+SPLIT_SEED = 42
+
+
+def load_held_out():
+    """
+    The held-out split 2_train.py evaluates on: the train_test_split test rows of X.npy
+    (read through a memory map), or the fixed validation mixtures of stream mode if there is no X.npy.
+    Returns (X_test, y_test) with sparse labels.
+    """
+    x_path = os.path.join(DATA_DIR, "X.npy")
+    if os.path.exists(x_path):
+        from sklearn.model_selection import train_test_split
+        X = np.load(x_path, mmap_mode="r")
+        y = np.load(os.path.join(DATA_DIR, "y.npy"))
+        _, test_idx = train_test_split(np.arange(len(y)), test_size=TEST_SIZE, random_state=SPLIT_SEED)
+        test_idx.sort()  # Sequential reads from the memory map
+        return np.asarray(X[test_idx], dtype=np.float32), y[test_idx]
+
+    from src.stream_dataset import load_sources, make_dataset
+    train = importlib.import_module("src.2_train")
+    _, val_sources = load_sources(seed=train.SEED)
+    batches = list(make_dataset(val_sources, train.BATCH_SIZE, seed=train.SEED + 1,
+                                num_batches=train.VAL_BATCHES).as_numpy_iterator())
+    return np.concatenate([b[0] for b in batches]), np.concatenate([b[1] for b in batches])
+
+
+def predict_tflite(X, model_path=TFLITE_MODEL_PATH, batch_size=BATCH_SIZE, workers=WORKERS):
+    """
+    Int8 predictions over X in batches of batch_size, spread over `workers` threads
+    (each with its own interpreter; invoke() releases the GIL). Returns (probabilities, seconds).
+    """
+    local = threading.local()
+    out = np.empty((len(X), len(CLASSES)), dtype=np.float32)
+
+    def run(start):
+        if not hasattr(local, "backend"):
+            local.backend = TFLiteBackend(model_path, num_threads=1)
+        out[start:start + batch_size] = local.backend.predict(X[start:start + batch_size])
+
+    begin = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run, range(0, len(X), batch_size)))
+    return out, time.perf_counter() - begin
+
+
+def predict_keras(X, model_path=KERAS_MODEL_PATH, batch_size=BATCH_SIZE):
+    backend = KerasBackend(model_path)
+    return np.concatenate([backend.predict(X[i:i + batch_size]) for i in range(0, len(X), batch_size)])
+
+
+def window_latency(X, model_path=TFLITE_MODEL_PATH, runs=LATENCY_RUNS):
+    """Per-window (batch size 1, one thread) invoke latencies in ms, as on the device loop."""
+    backend = TFLiteBackend(model_path, num_threads=1)
+    latencies = np.empty(runs)
+    for r in range(runs):
+        window = X[r % len(X)][np.newaxis]
+        start = time.perf_counter()
+        backend.predict(window)
+        latencies[r] = (time.perf_counter() - start) * 1000
+    return latencies
+
+
+def accuracy(y_true, probs):
+    return float(np.mean(np.argmax(probs, axis=1) == y_true) * 100)
+
+
+def print_confusion(y_true, y_pred, title):
+    cm = confusion_matrix(y_true, y_pred, labels=range(len(CLASSES)))
+    print(f"\n{title} (rows: actual, columns: predicted)")
+    print(f"{'':>12}" + "".join(f"{c:>12}" for c in CLASSES) + f"{'recall':>10}")
+    for i, row in enumerate(cm):
+        recall = row[i] / max(row.sum(), 1) * 100
+        print(f"{CLASSES[i]:>12}" + "".join(f"{v:>12}" for v in row) + f"{recall:>9.1f}%")
+
+
+def evaluate(model_path=TFLITE_MODEL_PATH, keras_model_path=KERAS_MODEL_PATH, batch_size=BATCH_SIZE,
+             workers=WORKERS, latency_runs=LATENCY_RUNS):
+    """
+    Runs the float and int8 models over the held-out split and prints the report.
+    Returns a dict: int8_accuracy, float_accuracy (None without the .h5), windows_per_s, latency_ms (p50, p90, p99).
+    """
+    X, y = load_held_out()
+    print(f"Held-out split: {len(X)} windows")
+
+    int8_probs, seconds = predict_tflite(X, model_path, batch_size, workers)
+    results = {"int8_accuracy": accuracy(y, int8_probs), "float_accuracy": None,
+               "windows_per_s": len(X) / seconds}
+
+    if keras_model_path and os.path.exists(keras_model_path):
+        float_probs = predict_keras(X, keras_model_path, batch_size)
+        results["float_accuracy"] = accuracy(y, float_probs)
+        agreement = np.mean(np.argmax(float_probs, axis=1) == np.argmax(int8_probs, axis=1)) * 100
+        print(f"Float accuracy: {results['float_accuracy']:.2f}%")
+        print(f"Int8 accuracy:  {results['int8_accuracy']:.2f}% "
+              f"({results['int8_accuracy'] - results['float_accuracy']:+.2f} pts, {agreement:.1f}% same predictions)")
+        print_confusion(y, np.argmax(float_probs, axis=1), "Float confusion")
+    else:
+        print(f"Int8 accuracy:  {results['int8_accuracy']:.2f}% (no float model at {keras_model_path})")
+    print_confusion(y, np.argmax(int8_probs, axis=1), "Int8 confusion")
+
+    latencies = window_latency(X, model_path, latency_runs)
+    results["latency_ms"] = tuple(float(np.percentile(latencies, p)) for p in (50, 90, 99))
+    print(f"\nThroughput: {results['windows_per_s']:.0f} windows/s (batch {batch_size}, {workers} threads)")
+    print("Latency per window: p50 {:.3f} ms, p90 {:.3f} ms, p99 {:.3f} ms".format(*results["latency_ms"]))
+    return results
+
+
+def check_accuracy_drop(results, max_drop=MAX_ACCURACY_DROP):
+    """Returns a violation message if int8 lost more than max_drop points, else None."""
+    if results["float_accuracy"] is None:
+        return None
+    drop = results["float_accuracy"] - results["int8_accuracy"]
+    if drop > max_drop:
+        return f"Int8 accuracy drop {drop:.2f} pts > {max_drop} pts"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Float vs int8 accuracy, confusion and latency on the held-out split.")
+    parser.add_argument("--model", default=TFLITE_MODEL_PATH)
+    parser.add_argument("--keras-model", default=KERAS_MODEL_PATH)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--max-drop", type=float, default=MAX_ACCURACY_DROP, help="Allowed accuracy loss (points)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"Error: Model file {args.model} not found. Run 3_convert.py first.")
+        sys.exit(1)
+
+    results = evaluate(args.model, args.keras_model, args.batch_size, args.workers)
+    violation = check_accuracy_drop(results, args.max_drop)
+    if violation:
+        print(f"[FAIL] {violation}")
+        sys.exit(1)
+    print("[OK] Int8 accuracy within tolerance.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import os
+import numpy as np
+
+from src.utils import DATA_DIR, params_digest, ensure_dir
+
+CACHE_DIR = os.path.join(DATA_DIR, "feature_cache")
+CACHE_MAX_MB = 2048
+
+
+class FeatureCache:
+    """
+    Content-addressed store of per-file features.
+
+    Entries live at <cache_dir>/<params digest>/<file content digest>.npy, so a changed
+    file or a changed feature/augmentation parameter simply misses the cache.
+    """
+
+    def __init__(self, params, cache_dir=CACHE_DIR, max_mb=CACHE_MAX_MB):
+        self.cache_dir = cache_dir
+        self.params_key = params_digest(params)
+        self.entry_dir = os.path.join(cache_dir, self.params_key)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        ensure_dir(self.entry_dir)
+
+    def path(self, digest):
+        return os.path.join(self.entry_dir, f"{digest}.npy")
+
+    def get(self, digest):
+        """Returns the cached array for a file digest, or None on a miss."""
+        path = self.path(digest)
+        try:
+            features = np.load(path)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        os.utime(path)  # Mark as recently used
+        return features
+
+    def put(self, digest, features):
+        """Stores an array atomically (safe with concurrent writers)."""
+        path = self.path(digest)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, features)
+        os.replace(tmp_path, path)
+
+    def evict(self, live_digests):
+        """
+        Enforces the size cap by removing entries that no longer correspond to any
+        source file (other parameter sets count as stale), least recently used first.
+        Returns (bytes in cache, bytes removed).
+        """
+        live = set(live_digests)
+        entries = []
+        total = 0
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                total += stat.st_size
+                is_live = root == self.entry_dir and name[:-len(".npy")] in live
+                if not is_live:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total - removed <= self.max_bytes:
+                break
+            os.remove(path)
+            removed += size
+
+        for name in os.listdir(self.cache_dir):
+            sub = os.path.join(self.cache_dir, name)
+            if sub != self.entry_dir and os.path.isdir(sub) and not os.listdir(sub):
+                os.rmdir(sub)
+
+        if total - removed > self.max_bytes:
+            print(f"Warning: Feature cache is {(total - removed) / 2**20:.0f} MB, over the {self.max_bytes / 2**20:.0f} MB cap, "
+                  "but all remaining entries are in use.")
+        return total - removed, removed
@@ -0,0 +1,172 @@
+import functools
+import numpy as np
+import scipy.fft
+import librosa
+
+from src.utils import SAMPLE_RATE, DURATION, N_MELS, N_FFT, HOP_LENGTH
+
+AMIN = 1e-10  # librosa.power_to_db defaults
+TOP_DB = 80.0
+CHUNK_SIZE = 64  # Clips per STFT pass (bounds temporary memory)
+
+
+@functools.lru_cache(maxsize=None)
+def mel_filterbank(sr=SAMPLE_RATE, n_fft=N_FFT, n_mels=N_MELS):
+    """Mel filterbank (n_mels, 1 + n_fft // 2), built once per parameter set."""
+    basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+    basis.flags.writeable = False
+    return basis
+
+
+@functools.lru_cache(maxsize=None)
+def fft_window(n_fft=N_FFT):
+    """Periodic Hann window (same as librosa.stft), built once per n_fft."""
+    window = librosa.filters.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+    window.flags.writeable = False
+    return window
+
+
+def power_to_db(mel_power):
+    """
+    librosa.power_to_db(S, ref=np.max) applied independently to each clip.
+    mel_power: (..., n_mels, frames).
+    """
+    log_spec = 10.0 * np.log10(np.maximum(AMIN, mel_power))
+    ref = 10.0 * np.log10(np.maximum(AMIN, mel_power.max(axis=(-2, -1), keepdims=True)))
+    log_spec -= ref
+    return np.maximum(log_spec, log_spec.max(axis=(-2, -1), keepdims=True) - TOP_DB)
+
+
+def frames_to_power(frames):
+    """(..., frames, n_fft) audio frames -> (..., frames, 1 + n_fft // 2) power spectrum."""
+    n_fft = frames.shape[-1]
+    # scipy.fft keeps float32 end to end (numpy.fft works in float64 internally)
+    spectrum = scipy.fft.rfft(frames * fft_window(n_fft), axis=-1)
+    return (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32, copy=False)
+
+
+def power_to_mel(power, sr=SAMPLE_RATE, n_mels=N_MELS):
+    """(..., frames, bins) power spectrum -> (..., n_mels, frames) mel power."""
+    n_fft = 2 * (power.shape[-1] - 1)
+    return np.swapaxes(power @ mel_filterbank(sr, n_fft, n_mels).T, -1, -2)
+
+
+def frames_to_mel_power(frames, sr=SAMPLE_RATE, n_mels=N_MELS):
+    """(..., frames, n_fft) audio frames -> (..., n_mels, frames) mel power."""
+    return power_to_mel(frames_to_power(frames), sr, n_mels)
+
+
+def stft_power(audio, n_fft=N_FFT, hop_length=HOP_LENGTH):
+    """
+    Batched centred STFT power (librosa center=True, pad_mode="constant").
+    audio: (N, samples). Returns (N, frames, 1 + n_fft // 2) float32.
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    pad = n_fft // 2
+    n_frames = 1 + audio.shape[-1] // hop_length
+    padded = np.pad(audio, ((0, 0), (pad, pad)))
+    frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft, axis=-1)[:, ::hop_length][:, :n_frames]
+    return frames_to_power(frames)
+
+
+def log_mel_spectrogram(audio, sr=SAMPLE_RATE, n_mels=N_MELS, n_fft=N_FFT, hop_length=HOP_LENGTH):
+    """
+    Batched Log-Mel-Spectrogram, matching librosa.feature.melspectrogram + power_to_db(ref=np.max).
+    audio: (samples,) or (N, samples). Returns (n_mels, frames) or (N, n_mels, frames) float32.
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    single = audio.ndim == 1
+    batch = audio[np.newaxis] if single else audio
+
+    n_frames = 1 + batch.shape[-1] // hop_length
+    out = np.empty((len(batch), n_mels, n_frames), dtype=np.float32)
+    for start in range(0, len(batch), CHUNK_SIZE):
+        power = stft_power(batch[start:start + CHUNK_SIZE], n_fft, hop_length)
+        out[start:start + CHUNK_SIZE] = power_to_db(power_to_mel(power, sr, n_mels))
+    return out[0] if single else out
+
+
+class StreamingMelSpectrogram:
+    """
+    Incremental Log-Mel-Spectrogram for a sliding window over a live stream.
+
+    Produces the same output as running librosa.feature.melspectrogram +
+    power_to_db(ref=np.max) over the whole window, but keeps the mel frames
+    that are still inside the window and only computes the new ones on each push.
+    Pushes whose length is not a multiple of hop_length fall back to a full recompute.
+    """
+
+    def __init__(self, window_size=int(SAMPLE_RATE * DURATION), sr=SAMPLE_RATE,
+                 n_mels=N_MELS, n_fft=N_FFT, hop_length=HOP_LENGTH):
+        self.window_size = window_size
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.pad = n_fft // 2
+        self.n_frames = 1 + window_size // hop_length
+        self.sr = sr
+        self.n_mels = n_mels
+
+        # Frames fully inside the window (no centre padding) can be reused after a shift
+        self.first_interior = -(-self.pad // hop_length)
+        self.last_interior = (window_size - n_fft + self.pad) // hop_length
+
+        # Audio window with permanent zero padding on both sides (librosa center=True)
+        self._padded = np.zeros(window_size + 2 * self.pad, dtype=np.float32)
+        self._frames = np.lib.stride_tricks.sliding_window_view(self._padded, n_fft)[::hop_length]
+        self.mel_frames = np.zeros((n_mels, self.n_frames), dtype=np.float32)
+
+    @property
+    def audio(self):
+        """View of the current audio window."""
+        return self._padded[self.pad:self.pad + self.window_size]
+
+    def reset(self):
+        self._padded[:] = 0.0
+        self.mel_frames[:] = 0.0
+
+    def _compute_frames(self, frame_idx):
+        self.mel_frames[:, frame_idx] = frames_to_mel_power(self._frames[frame_idx], self.sr, self.n_mels)
+
+    def push(self, block):
+        """
+        Shift a new block of samples into the window.
+        Returns the Log-Mel-Spectrogram of the updated window, shape (n_mels, n_frames).
+        """
+        return self.update(self.append(block))
+
+    def append(self, block):
+        """
+        Shifts a new block into the audio window (mel frames are not updated yet).
+        Returns the number of samples shifted in, to pass to update().
+        """
+        block = np.asarray(block, dtype=np.float32).flatten()
+        n = len(block)
+        audio = self.audio
+
+        if n >= self.window_size:
+            audio[:] = block[-self.window_size:]
+        else:
+            audio[:-n] = audio[n:]
+            audio[-n:] = block
+        return n
+
+    def update(self, n):
+        """
+        Brings the mel frames up to date after append() shifted in n samples.
+        Returns the Log-Mel-Spectrogram of the window, shape (n_mels, n_frames).
+        """
+        shift = n // self.hop_length
+        if n >= self.window_size or n % self.hop_length or shift > self.last_interior - self.first_interior:
+            self._compute_frames(np.arange(self.n_frames))
+            return self.log_mel()
+
+        self.mel_frames[:, :-shift] = self.mel_frames[:, shift:]
+        new_idx = np.r_[
+            0:self.first_interior,
+            self.last_interior - shift + 1:self.n_frames,
+        ]
+        self._compute_frames(new_idx)
+        return self.log_mel()
+
+    def log_mel(self):
+        return power_to_db(self.mel_frames)
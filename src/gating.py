@@ -0,0 +1,101 @@
+import os
+import numpy as np
+
+from src.utils import CLASSES, MODEL_DIR, STEP_SIZE, HOP_LENGTH
+
+# Constants
+GATE_MODES = ["off", "rms", "flux", "model"]
+RMS_THRESHOLD_DB = -50.0  # dBFS of the newest block; quiet forest sits well below this
+FLUX_THRESHOLD_DB = 3.0  # Mean per-band rise (dB) between consecutive mel frames of the newest block
+FIRST_STAGE_THRESHOLD = 0.2  # Non-background probability of the tiny model that wakes the full model
+# Smallest variant of sweep_models.py (width 0.25, one DS block)
+FIRST_STAGE_MODEL_PATH = os.path.join(MODEL_DIR, "sweep", "ds_cnn_w0.25_d1.tflite")
+# Hops the gate stays open after the last trigger: the whole window (an event seen in the newest
+# block stays in the window for BLOCK_SIZE / STEP_SIZE hops)
+HOLD_HOPS = 4
+HOP_FRAMES = STEP_SIZE // HOP_LENGTH
+
+
+class InferenceGate:
+    """
+    Cheap first stage in front of the classifier. Decides per hop whether the full model runs:
+
+    - "off":   always run the full model.
+    - "rms":   run when the newest block is louder than rms_threshold_db.
+    - "flux":  run on onsets: spectral flux of the newest mel frames above flux_threshold_db.
+    - "model": run a tiny first-stage model on every hop and the full model only when it
+               gives more than first_stage_threshold to a non-background class
+               (otherwise its probabilities are used, i.e. inference is downgraded).
+
+    Once triggered the gate stays open for hold_hops more hops so the tail of an event is
+    still classified. When the full model is skipped, `fallback` holds the probabilities to report
+    (read-only; copy it to modify).
+    """
+
+    def __init__(self, mode="rms", rms_threshold_db=RMS_THRESHOLD_DB, flux_threshold_db=FLUX_THRESHOLD_DB,
+                 hold_hops=HOLD_HOPS, first_stage_path=FIRST_STAGE_MODEL_PATH,
+                 first_stage_threshold=FIRST_STAGE_THRESHOLD):
+        if mode not in GATE_MODES:
+            raise ValueError(f"Unknown gate mode '{mode}'. Choose from {GATE_MODES}.")
+        self.mode = mode
+        self.rms_threshold_db = rms_threshold_db
+        self.flux_threshold_db = flux_threshold_db
+        self.hold_hops = hold_hops
+        self.first_stage_threshold = first_stage_threshold
+        self.first_stage = None
+        if mode == "model":
+            if not os.path.exists(first_stage_path):
+                raise FileNotFoundError(f"First-stage model {first_stage_path} not found. Run sweep_models.py "
+                                        f"or pass the path of a small .tflite model.")
+            from src.inference import load_backend
+            self.first_stage = load_backend("tflite", first_stage_path, num_threads=1)
+
+        self.background = np.zeros(len(CLASSES), dtype=np.float32)
+        self.background[CLASSES.index("background")] = 1.0
+        self.background.setflags(write=False)  # Handed out as `fallback`: callers must not change it in place
+        self.fallback = self.background
+        self.reset()
+
+    def reset(self):
+        self.hold = 0
+        self.windows = 0  # Hops seen
+        self.skipped = 0  # Hops where the full model did not run
+        self.downgraded = 0  # Skipped hops answered by the first-stage model
+
+    @property
+    def skip_fraction(self):
+        return self.skipped / max(self.windows, 1)
+
+    def triggered(self, block, input_data):
+        """Whether this hop has activity, according to the gate mode."""
+        if self.mode == "rms":
+            rms = np.sqrt(np.mean(np.square(block, dtype=np.float64)))
+            return 20 * np.log10(max(rms, 1e-10)) > self.rms_threshold_db
+        if self.mode == "flux":
+            # Newest frames and the one before them (same window, so the same dB reference)
+            frames = input_data.reshape(input_data.shape[-3], input_data.shape[-2])[:, -(HOP_FRAMES + 1):]
+            flux = np.maximum(np.diff(frames, axis=1), 0).mean(axis=0)
+            return flux.max() > self.flux_threshold_db
+        probs = self.first_stage.predict(input_data.reshape(1, *input_data.shape[-3:]))[0]
+        self.fallback = probs
+        return 1.0 - probs[CLASSES.index("background")] > self.first_stage_threshold
+
+    def should_run(self, block, input_data):
+        """
+        block: newest audio samples (after gain). input_data: the window the classifier would see.
+        Returns True if the full model should run on this hop.
+        """
+        self.windows += 1
+        if self.mode == "off":
+            return True
+        self.fallback = self.background
+        if self.triggered(block, input_data):
+            self.hold = self.hold_hops
+            return True
+        if self.hold > 0:
+            self.hold -= 1
+            return True
+        self.skipped += 1
+        if self.first_stage is not None:
+            self.downgraded += 1
+        return False
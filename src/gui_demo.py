@@ -1,11 +1,13 @@
 import tkinter as tk
 from tkinter import ttk
 import threading
+import queue
 import time
 import numpy as np
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from audio_processor import AudioProcessor
+from alerts import AlertDispatcher, CallbackSink, LogFileSink, SoundSink
 
 class EcoGuardianGUI:
     def __init__(self, root):
@@ -13,8 +15,15 @@ class EcoGuardianGUI:
         self.root.title("Eco-Guardian Real-Time Detection")
         self.root.geometry("1000x700") # Increased size for plots
         
-        # Audio Processor
-        self.processor = AudioProcessor()
+        # Audio Processor (classifies on its own thread; the GUI only shows the newest window)
+        self.processor = AudioProcessor(policy="latest")
+        self.last_result = None
+
+        # Alerts are thresholded and de-duplicated on the inference thread and delivered by sink
+        # threads; the GUI's sink only queues them for update_loop (Tk is not thread-safe)
+        self.alert_queue = queue.SimpleQueue()
+        self.alerts = AlertDispatcher([CallbackSink(self.alert_queue.put, "gui"), LogFileSink(), SoundSink()]).start()
+        self.processor.subscribe(self.alerts.on_result)
         
         # UI Setup
         self.setup_ui()
@@ -93,6 +102,18 @@ class EcoGuardianGUI:
         self.canvas = FigureCanvasTkAgg(fig, master=main_frame)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
+        # Event Log
+        self.log_text = tk.Text(main_frame, height=6, state=tk.DISABLED, font=("Courier", 9))
+        self.log_text.tag_config("danger", foreground="red")
+        self.log_text.tag_config("info", foreground="gray")
+        self.log_text.pack(fill=tk.X, pady=5)
+
+    def log_event(self, message, tag="info"):
+        self.log_text.config(state=tk.NORMAL)
+        self.log_text.insert(tk.END, f"{time.strftime('%H:%M:%S')}  {message}\n", tag)
+        self.log_text.see(tk.END)
+        self.log_text.config(state=tk.DISABLED)
+
 
     def update_leds(self, detected_label):
         # Reset all to gray
@@ -119,23 +140,34 @@ class EcoGuardianGUI:
         self.stop_button.config(state=tk.DISABLED)
         # self.status_var.set("Status: Stopped")
         self.processor.stop_stream()
-        self.log_event("Monitoring stopped.", "info")
+        c = self.processor.counters()
+        self.log_event(f"Monitoring stopped. {c['processed']} windows classified, {c['coalesced']} skipped as stale, "
+                       f"{c['dropped_blocks']} blocks dropped, {c['overruns']} overruns.", "info")
         self.update_leds(None) # Turn off LEDs
 
     def update_loop(self):
         if not self.running:
             return
             
-        # Process audio chunk
-        # Loop to drain queue so we are always up to date
-        result = None
-        gain = self.gain_var.get()
-        while not self.processor.audio_queue.empty():
-            result = self.processor.process_next_chunk(gain=gain)
+        # Newest result from the inference thread (windows we fell behind on are never classified)
+        self.processor.gain = self.gain_var.get()
+        self.alerts.threshold = self.threshold_var.get()
+        result = self.processor.latest_result()
+
+        # Alerts delivered since the last tick (batched by the sink thread)
+        while True:
+            try:
+                events = self.alert_queue.get_nowait()
+            except queue.Empty:
+                break
+            for e in events:
+                repeats = f" (+{e['suppressed']} repeats)" if e["suppressed"] else ""
+                self.log_event(f"DETECTED: {e['label'].upper()} ({e['confidence']:.2f}){repeats}", "danger")
         
         # If we got a result (means new data processed)
-        if result:
-            probs, confidence, label, rms = result
+        if result is not None and result is not self.last_result:
+            self.last_result = result
+            probs, confidence, label, rms, _ = result
             
             # Threshold from slider
             threshold = self.threshold_var.get()
@@ -147,7 +179,6 @@ class EcoGuardianGUI:
                  
                  if label in ["chainsaw", "gunshot"]:
                      self.result_label.config(foreground="red")
-                     self.log_event(f"DETECTED: {label.upper()} ({confidence:.2f})", "danger")
                  else:
                      self.result_label.config(foreground="green")
             else:
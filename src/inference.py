@@ -0,0 +1,110 @@
+import os
+import numpy as np
+import tensorflow as tf
+
+from src.utils import MODEL_DIR, INPUT_SHAPE
+
+KERAS_MODEL_PATH = os.path.join(MODEL_DIR, "forest_guard.h5")
+TFLITE_MODEL_PATH = os.path.join(MODEL_DIR, "model_quantized.tflite")
+BACKENDS = ["keras", "tflite", "streaming"]
+DEFAULT_MODEL_PATHS = {"keras": KERAS_MODEL_PATH, "tflite": TFLITE_MODEL_PATH, "streaming": KERAS_MODEL_PATH}
+
+
+class KerasBackend:
+    """Float Keras model. Calls the model directly instead of model.predict to skip its per-call setup."""
+
+    def __init__(self, model_path=KERAS_MODEL_PATH):
+        self.model_path = model_path
+        self.model = tf.keras.models.load_model(model_path)
+
+    def predict(self, input_data):
+        """input_data: (N, 64, 63, 1) float32. Returns (N, num_classes) probabilities."""
+        return self.model(input_data, training=False).numpy()
+
+
+class TFLiteBackend:
+    """
+    Quantized TFLite model through a persistent tf.lite.Interpreter (same model as the ESP32).
+    Input/output buffers are preallocated and int8 quantize/dequantize is handled here.
+    Batches are padded up to a power of two, so varying batch sizes (ingest_server.py) only
+    resize the interpreter the first time each size class is seen.
+    """
+
+    def __init__(self, model_path=TFLITE_MODEL_PATH, num_threads=None):
+        self.model_path = model_path
+        self.interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+
+        input_details = self.interpreter.get_input_details()[0]
+        output_details = self.interpreter.get_output_details()[0]
+        self.input_index = input_details["index"]
+        self.output_index = output_details["index"]
+        self.input_dtype = input_details["dtype"]
+        self.output_dtype = output_details["dtype"]
+        self.input_scale, self.input_zero_point = input_details["quantization"]
+        self.output_scale, self.output_zero_point = output_details["quantization"]
+
+        self.batch_size = None
+        self._allocate(1)
+
+    def _allocate(self, batch_size):
+        """(Re)allocates interpreter tensors and host buffers for the padded size of a batch."""
+        batch_size = 1 << (batch_size - 1).bit_length()
+        if batch_size != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input_index, (batch_size, *INPUT_SHAPE))
+            self.interpreter.allocate_tensors()
+            output_shape = self.interpreter.get_output_details()[0]["shape"]
+            self._scaled = np.zeros((batch_size, *INPUT_SHAPE), dtype=np.float32)
+            self._input = np.zeros((batch_size, *INPUT_SHAPE), dtype=self.input_dtype)
+            self._output = np.empty(output_shape, dtype=np.float32)
+            self.batch_size = batch_size
+
+    def quantize(self, input_data):
+        """
+        Float features -> interpreter input dtype, written into the first rows of the preallocated
+        input buffer (the padding rows keep whatever they held; their outputs are discarded).
+        """
+        n = len(input_data)
+        if self.input_scale == 0:  # Float model, no quantization
+            self._input[:n] = input_data
+            return self._input
+
+        info = np.iinfo(self.input_dtype)
+        scaled = self._scaled[:n]
+        np.divide(input_data, self.input_scale, out=scaled)
+        np.add(scaled, self.input_zero_point, out=scaled)
+        np.round(scaled, out=scaled)
+        np.clip(scaled, info.min, info.max, out=scaled)
+        self._input[:n] = scaled
+        return self._input
+
+    def dequantize(self, output_data):
+        """Interpreter output -> float probabilities, written into the preallocated output buffer."""
+        if self.output_scale == 0:
+            self._output[...] = output_data
+            return self._output
+
+        np.subtract(output_data, self.output_zero_point, out=self._output, dtype=np.float32)
+        np.multiply(self._output, self.output_scale, out=self._output)
+        return self._output
+
+    def predict(self, input_data):
+        """input_data: (N, 64, 63, 1) float32. Returns (N, num_classes) probabilities."""
+        n = len(input_data)
+        self._allocate(n)
+        self.interpreter.set_tensor(self.input_index, self.quantize(input_data))
+        self.interpreter.invoke()
+        # Copy out: the buffer is reused by the next call
+        return self.dequantize(self.interpreter.get_tensor(self.output_index))[:n].copy()
+
+
+def load_backend(backend="keras", model_path=None, **kwargs):
+    """Creates an inference backend by name ("keras", "tflite" or "streaming")."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Choose from {BACKENDS}.")
+    model_path = model_path or DEFAULT_MODEL_PATHS[backend]
+    if backend == "tflite":
+        return TFLiteBackend(model_path, **kwargs)
+    if backend == "streaming":
+        from src.streaming_model import StreamingBackend  # Imports this module
+        return StreamingBackend(model_path)
+    return KerasBackend(model_path)
@@ -0,0 +1,313 @@
+import sys
+import time
+import struct
+import asyncio
+import argparse
+from collections import defaultdict
+
+import numpy as np
+
+from src.utils import CLASSES, SAMPLE_RATE, BLOCK_SIZE, STEP_SIZE
+from src.features import StreamingMelSpectrogram
+from src.inference import load_backend, BACKENDS
+from src.detection_store import DetectionStore
+
+# Constants
+HOST = "0.0.0.0"
+TCP_PORT = 5005
+UDP_PORT = 5006
+BACKEND = "tflite"
+MAX_BATCH = 64  # Windows per inference call
+MAX_LATENCY_MS = 100.0  # A window waits at most this long for the batch to fill
+MAX_PENDING = 16 * MAX_BATCH  # Windows waiting for inference; newer ones are dropped (and counted) beyond this
+THRESHOLD = 0.6  # Same as demo_laptop_mic.py
+REPORT_INTERVAL = 10.0  # Seconds between stats reports
+# Wire format: 16-bit little-endian mono PCM at SAMPLE_RATE.
+# TCP: one "ECOG <sensor id>\n" line, then raw PCM. UDP: UDP_HEADER (sensor id, sequence number) + PCM.
+TCP_HELLO = b"ECOG"
+UDP_HEADER = struct.Struct("<16sI")
+CLIENT_CHUNK = 320  # Samples per send in the simulated clients (20 ms, one I2S DMA buffer)
+
+
+class SensorStream:
+    """Per-sensor rolling audio: slices incoming PCM into hops and keeps that sensor's mel frontend."""
+
+    def __init__(self, sensor_id):
+        self.sensor_id = sensor_id
+        self.frontend = StreamingMelSpectrogram(window_size=BLOCK_SIZE)  # Only touched by the inference thread
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.partial = b""  # Odd trailing byte of the last TCP read
+        self.started = False  # First full window received
+        self.windows = 0
+        self.dropped_windows = 0  # Windows the batcher had no room for
+        self.lost_packets = 0
+        self.next_seq = None
+        self.last_end = None  # End time of the last window
+        self.latest = None  # (time, probabilities)
+
+    def feed(self, pcm, now=None):
+        """
+        Appends int16 PCM bytes received at `now` (epoch seconds). Returns (block, window end time)
+        for each block that completes a window (first: BLOCK_SIZE, then STEP_SIZE).
+        """
+        now = time.time() if now is None else now
+        pcm = self.partial + pcm
+        even = len(pcm) // 2 * 2
+        self.partial = pcm[even:]
+        samples = np.frombuffer(pcm[:even], dtype="<i2").astype(np.float32) / 32768.0
+        self.pending = np.concatenate([self.pending, samples])
+        blocks = []
+        if not self.started and len(self.pending) >= BLOCK_SIZE:
+            blocks.append(self.pending[:BLOCK_SIZE])
+            self.pending = self.pending[BLOCK_SIZE:]
+            self.started = True
+        while self.started and len(self.pending) >= STEP_SIZE:
+            blocks.append(self.pending[:STEP_SIZE])
+            self.pending = self.pending[STEP_SIZE:]
+
+        # A window ends when its last sample arrived (this read's samples end at `now`), and at least
+        # one hop after the previous window, so windows of one read never share a time
+        ends = []
+        behind = len(self.pending)
+        for block in reversed(blocks):
+            ends.append(now - behind / SAMPLE_RATE)
+            behind += len(block)
+        windows = []
+        for block, end in zip(blocks, reversed(ends)):
+            if self.last_end is not None:
+                end = max(end, self.last_end + STEP_SIZE / SAMPLE_RATE)
+            self.last_end = end
+            windows.append((block, end))
+        return windows
+
+
+class Batcher:
+    """
+    Collects ready windows from every sensor and runs them through the model in one call,
+    as soon as max_batch windows are waiting or the oldest has waited max_latency_ms.
+    Mel features and inference run on one worker thread, so the event loop only does I/O.
+    If inference falls behind, at most max_pending windows wait; newer ones are dropped.
+    """
+
+    def __init__(self, backend, max_batch=MAX_BATCH, max_latency_ms=MAX_LATENCY_MS, threshold=THRESHOLD, store=None,
+                 max_pending=MAX_PENDING):
+        self.backend = backend
+        self.store = store  # DetectionStore: every window's probabilities, RMS and events
+        self.max_batch = max_batch
+        self.max_latency = max_latency_ms / 1000
+        self.threshold = threshold
+        self.max_pending = max_pending
+        self.pending = []  # (stream, block, ready time, window end time)
+        self.dropped = 0
+        self.errors = 0
+        self.wakeup = asyncio.Event()
+        self.stats = defaultdict(lambda: {"batches": 0, "windows": 0, "infer_s": 0.0, "latencies": []})
+
+    def submit(self, stream, block, end):
+        if len(self.pending) >= self.max_pending:
+            # This hop never reaches the sensor's frontend, so its next window spans the gap
+            stream.dropped_windows += 1
+            self.dropped += 1
+            return
+        self.pending.append((stream, block, time.perf_counter(), end))
+        # First window starts the deadline, a full batch ends it
+        if len(self.pending) == 1 or len(self.pending) >= self.max_batch:
+            self.wakeup.set()
+
+    def _infer(self, items):
+        """Worker thread: features (in stream order) and one batched predict."""
+        batch = np.empty((len(items), 64, 63, 1), dtype=np.float32)
+        rms = np.empty(len(items), dtype=np.float32)
+        for i, (stream, block, _, _) in enumerate(items):
+            batch[i, ..., 0] = stream.frontend.push(block)
+            rms[i] = np.sqrt(np.mean(stream.frontend.audio ** 2))
+        start = time.perf_counter()
+        probs = self.backend.predict(batch)
+        return probs, rms, time.perf_counter() - start
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self.pending:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            deadline = self.pending[0][2] + self.max_latency
+            if len(self.pending) < self.max_batch:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), max(0.0, deadline - time.perf_counter()))
+                except asyncio.TimeoutError:
+                    pass
+
+            items, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+            try:
+                await self._process(loop, items)
+            except Exception as exc:  # One bad batch must not stop inference for every sensor
+                self.errors += 1
+                print(f"Batch of {len(items)} windows failed: {exc!r}", file=sys.stderr)
+
+    async def _process(self, loop, items):
+        """Runs one batch on the worker thread and publishes its results."""
+        probs, rms, infer_s = await loop.run_in_executor(None, self._infer, items)
+        done = time.perf_counter()
+
+        stats = self.stats[len(items)]
+        stats["batches"] += 1
+        stats["windows"] += len(items)
+        stats["infer_s"] += infer_s
+        stats["latencies"].extend(done - ready for _, _, ready, _ in items)
+        for (stream, _, _, end), p, r in zip(items, probs, rms):
+            stream.windows += 1
+            stream.latest = (done, p)
+            if self.store is not None:
+                self.store.record(stream.sensor_id, end, p, float(r))
+            class_idx = int(np.argmax(p))
+            if p[class_idx] > self.threshold and CLASSES[class_idx] != "background":
+                print(f"[{stream.sensor_id}] DETECTED: {CLASSES[class_idx].upper()} ({p[class_idx]:.2f})")
+
+    def report(self):
+        """Per batch size (since the last report): batches, windows/s of inference and end-to-end latency percentiles (ready -> result)."""
+        print(f"{'Batch':>6} {'Batches':>8} {'Infer ms':>9} {'Windows/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+        for size in sorted(self.stats):
+            s = self.stats[size]
+            latencies = np.array(s["latencies"]) * 1000
+            print(f"{size:>6} {s['batches']:>8} {s['infer_s'] / s['batches'] * 1000:>9.2f} "
+                  f"{s['windows'] / max(s['infer_s'], 1e-9):>10.0f} "
+                  f"{np.percentile(latencies, 50):>8.1f} {np.percentile(latencies, 99):>8.1f}")
+
+
+class IngestServer(asyncio.DatagramProtocol):
+    """Accepts PCM from many sensors over TCP and UDP and feeds their windows to one Batcher."""
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+        self.streams = {}
+
+    def stream(self, sensor_id):
+        if sensor_id not in self.streams:
+            self.streams[sensor_id] = SensorStream(sensor_id)
+            print(f"Sensor connected: {sensor_id} ({len(self.streams)} streams)")
+        return self.streams[sensor_id]
+
+    def feed(self, stream, pcm):
+        for block, end in stream.feed(pcm):
+            self.batcher.submit(stream, block, end)
+
+    async def handle_tcp(self, reader, writer):
+        try:
+            hello = (await reader.readline()).split()
+            if len(hello) != 2 or hello[0] != TCP_HELLO:
+                print(f"Rejected connection from {writer.get_extra_info('peername')}: bad hello")
+                return
+            stream = self.stream(hello[1].decode(errors="replace"))
+            while True:
+                pcm = await reader.read(1 << 14)
+                if not pcm:
+                    break
+                self.feed(stream, pcm)
+        finally:
+            writer.close()
+
+    def datagram_received(self, data, addr):
+        if len(data) <= UDP_HEADER.size:
+            return
+        raw_id, seq = UDP_HEADER.unpack_from(data)
+        stream = self.stream(raw_id.rstrip(b"\0").decode(errors="replace"))
+        gap = 0 if stream.next_seq is None else (seq - stream.next_seq) % (1 << 32)
+        if gap >= 1 << 31:  # Late (reordered) packet, already counted as lost: its audio would go out of order
+            return
+        stream.lost_packets += gap
+        stream.next_seq = (seq + 1) % (1 << 32)
+        self.feed(stream, data[UDP_HEADER.size:])
+
+    def error_received(self, exc):
+        print(f"UDP error: {exc}")
+
+
+async def simulated_client(sensor_id, host, port, seconds, speed, seed):
+    """A fake ESP32 node: streams noise with occasional bursts over TCP in 20 ms chunks, in (scaled) real time."""
+    rng = np.random.default_rng(seed)
+    _, writer = await asyncio.open_connection(host, port)
+    writer.write(TCP_HELLO + b" " + sensor_id.encode() + b"\n")
+    interval = CLIENT_CHUNK / SAMPLE_RATE / speed
+    next_send = time.perf_counter()
+    for _ in range(int(seconds * SAMPLE_RATE / CLIENT_CHUNK)):
+        level = 0.5 if rng.random() < 0.01 else 0.02
+        chunk = np.clip(rng.standard_normal(CLIENT_CHUNK) * level, -1, 1)
+        writer.write((chunk * 32767).astype("<i2").tobytes())
+        await writer.drain()
+        next_send += interval
+        await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+    writer.close()
+    await writer.wait_closed()
+
+
+async def report_loop(server, interval=REPORT_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        windows = sum(s.windows for s in server.streams.values())
+        lost = sum(s.lost_packets for s in server.streams.values())
+        print(f"\n{len(server.streams)} streams, {windows} windows classified, {lost} UDP packets lost, "
+              f"{server.batcher.dropped} windows dropped, {server.batcher.errors} failed batches")
+        server.batcher.report()
+        server.batcher.stats.clear()  # Each report covers one interval
+
+
+async def serve(args):
+    backend = load_backend(args.backend, args.model)
+    store = DetectionStore(args.db).start() if args.db else None
+    batcher = Batcher(backend, args.max_batch, args.max_latency_ms, store=store, max_pending=args.max_pending)
+    server = IngestServer(batcher)
+    loop = asyncio.get_running_loop()
+
+    tcp = await asyncio.start_server(server.handle_tcp, args.host, args.tcp_port)
+    udp, _ = await loop.create_datagram_endpoint(lambda: server, local_addr=(args.host, args.udp_port))
+    print(f"Listening on TCP {args.tcp_port} / UDP {args.udp_port} "
+          f"(batch <= {args.max_batch}, deadline {args.max_latency_ms:.0f} ms)")
+
+    tasks = [asyncio.create_task(batcher.run()), asyncio.create_task(report_loop(server))]
+    try:
+        if args.simulate:
+            host = "127.0.0.1" if args.host == "0.0.0.0" else args.host
+            await asyncio.gather(*[simulated_client(f"sim-{i:03d}", host, args.tcp_port, args.seconds, args.speed, i)
+                                   for i in range(args.simulate)])
+            await asyncio.sleep(args.max_latency_ms / 1000 * 2)  # Let the last batch finish
+        else:
+            await tcp.serve_forever()
+    finally:
+        for task in tasks:
+            task.cancel()
+        tcp.close()
+        udp.close()
+        print()
+        batcher.report()
+        print(f"{batcher.dropped} windows dropped (inference behind), {batcher.errors} failed batches")
+        if store is not None:
+            store.close()
+            print(f"{store.written} windows recorded in {args.db} ({store.dropped} dropped, {store.duplicates} duplicates)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-sensor PCM ingest server with cross-stream batched inference.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--tcp-port", type=int, default=TCP_PORT)
+    parser.add_argument("--udp-port", type=int, default=UDP_PORT)
+    parser.add_argument("--backend", default=BACKEND, choices=BACKENDS)
+    parser.add_argument("--model", default=None, help="Model path (default depends on backend)")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-latency-ms", type=float, default=MAX_LATENCY_MS)
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING, help="Windows queued for inference before new ones are dropped")
+    parser.add_argument("--db", help="Record every window and event in this detection store (see detection_store.py)")
+    parser.add_argument("--simulate", type=int, default=0, help="Run N local simulated sensors and exit")
+    parser.add_argument("--seconds", type=float, default=30.0, help="Audio per simulated sensor")
+    parser.add_argument("--speed", type=float, default=1.0, help="Simulated sensors send this many times faster than real time")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("Stopped.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
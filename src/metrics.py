@@ -0,0 +1,167 @@
+import json
+import time
+import bisect
+import threading
+
+import numpy as np
+
+# Latency bucket upper bounds in seconds (50 us .. 10 s, roughly x2 apart), as Prometheus histogram buckets
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGES = ["queue_wait", "buffer_update", "features", "inference", "postprocess"]
+EXPORT_INTERVAL = 10.0  # Seconds between JSON lines snapshots
+PREFIX = "ecoguardian"
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram. observe() is a bisect and two adds, cheap enough for every window.
+    Written by one thread; readers may see a value that is one observation behind.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last bucket: +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (seconds; inf if it is past the last bucket)."""
+        if not self.count:
+            return 0.0
+        k = int(np.searchsorted(np.cumsum(self.counts), q * self.count))
+        return self.buckets[k] if k < len(self.buckets) else float("inf")
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.sum / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.quantile(0.5) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+        }
+
+
+class Metrics:
+    """
+    Live detector telemetry: per-stage latency histograms, counters and the queue depth gauge.
+    snapshot() for code, to_prometheus() for scraping, JsonLinesExporter for a file.
+    """
+
+    def __init__(self, stages=STAGES):
+        self.stages = {stage: LatencyHistogram() for stage in stages}
+        self.counters = {"windows_processed": 0, "windows_coalesced": 0, "blocks_dropped": 0,
+                         "input_overflows": 0, "gate_skipped": 0, "inference_errors": 0}
+        self.queue_depth = 0
+        self.started = time.time()
+        self._rate_time = time.perf_counter()
+        self._rate_count = 0
+        self._rate = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        self.stages[stage].observe(seconds)
+
+    def inc(self, counter, n=1):
+        self.counters[counter] += n
+
+    def windows_per_second(self):
+        """Windows processed per second since the previous call (at most once a second)."""
+        with self._lock:
+            now = time.perf_counter()
+            if now - self._rate_time >= 1.0:
+                processed = self.counters["windows_processed"]
+                self._rate = (processed - self._rate_count) / (now - self._rate_time)
+                self._rate_time, self._rate_count = now, processed
+            return self._rate
+
+    def snapshot(self):
+        return {
+            "time": time.time(),
+            "uptime_s": time.time() - self.started,
+            "windows_per_s": self.windows_per_second(),
+            "queue_depth": self.queue_depth,
+            **dict(self.counters),
+            "stages": {stage: h.snapshot() for stage, h in self.stages.items()},
+        }
+
+    def to_prometheus(self, prefix=PREFIX):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for name, value in self.counters.items():
+            lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+        lines += [f"# TYPE {prefix}_queue_depth gauge", f"{prefix}_queue_depth {self.queue_depth}",
+                  f"# TYPE {prefix}_windows_per_second gauge", f"{prefix}_windows_per_second {self.windows_per_second():.3f}",
+                  f"# TYPE {prefix}_stage_seconds histogram"]
+        for stage, h in self.stages.items():
+            cumulative = 0
+            for bound, n in zip(list(h.buckets) + ["+Inf"], h.counts):
+                cumulative += n
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {h.sum:.9f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+
+class JsonLinesExporter:
+    """Appends a Metrics snapshot to a JSON lines file every `interval` seconds, from a daemon thread."""
+
+    def __init__(self, metrics, path, interval=EXPORT_INTERVAL):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-export", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(self.metrics.snapshot()) + "\n")
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.write()  # Final snapshot
+
+
+def serve_prometheus(metrics, port, host="0.0.0.0"):
+    """Serves /metrics in Prometheus text format from a daemon thread. Returns the server."""
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.to_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):  # No access log on the console
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def print_summary(metrics):
+    snap = metrics.snapshot()
+    print(f"{'Stage':<14} {'count':>8} {'mean ms':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for stage, s in snap["stages"].items():
+        print(f"{stage:<14} {s['count']:>8} {s['mean_ms']:>9.3f} {s['p50_ms']:>8.3f} {s['p99_ms']:>8.3f}")
+    print(", ".join(f"{k}: {snap[k]}" for k in metrics.counters) + f", queue depth: {snap['queue_depth']}")
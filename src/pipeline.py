@@ -0,0 +1,277 @@
+import os
+import ast
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from src import utils
+from src.utils import DATA_DIR, MODEL_DIR, CLASSES, SYNTHETIC_DIR, SYNTHETIC_SHARD_DIR, ensure_dir, file_digest
+
+# Constants
+STATE_PATH = os.path.join(DATA_DIR, "pipeline_state.json")  # Input keys and output digests of the last runs
+LOG_DIR = os.path.join(DATA_DIR, "pipeline_logs")  # One log per stage run (concurrent stages do not interleave)
+JOBS = 2  # Stages run at once (each already uses every core for its own work)
+TARGETS = ["convert"]
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Stage:
+    """
+    One pipeline script: `python -m src.<module>`.
+
+    inputs: files / folders it reads (hashed by content), code: src/ modules whose source it
+    depends on, params: names of the src/utils.py constants it uses (hashed by value, so other
+    edits to utils.py do not rerun it), deps: stages that produce its inputs, outputs: what it writes.
+    """
+
+    def __init__(self, name, module, inputs, outputs, code=(), params=(), deps=()):
+        self.name = name
+        self.module = module
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.code = [module] + list(code)
+        self.params = list(params)
+        self.deps = list(deps)
+
+
+def script_constant(module, name):
+    """Value of a literal module-level constant, read without importing the script (and TensorFlow)."""
+    with open(os.path.join(SRC_DIR, f"{module}.py")) as f:
+        for node in ast.parse(f.read()).body:
+            if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == name for t in node.targets):
+                return ast.literal_eval(node.value)
+    raise KeyError(f"{name} not found in {module}.py")
+
+
+def build_stages():
+    """The pipeline DAG for the current settings (SYNTHETIC_FORMAT, TRAIN_MODE and QAT pick inputs and outputs)."""
+    class_dirs = [os.path.join(DATA_DIR, c) for c in CLASSES]
+    arrays = [os.path.join(DATA_DIR, "X.npy"), os.path.join(DATA_DIR, "y.npy")]
+    synthetic = SYNTHETIC_SHARD_DIR if utils.SYNTHETIC_FORMAT == "shards" else SYNTHETIC_DIR
+    h5 = os.path.join(MODEL_DIR, "forest_guard.h5")
+    models = [h5] + ([os.path.join(MODEL_DIR, "forest_guard_qat.h5")] if script_constant("2_train", "QAT") else [])
+    streamed = script_constant("2_train", "TRAIN_MODE") == "stream"
+    audio_params = ["SAMPLE_RATE", "DURATION", "CLASSES"]
+    feature_params = audio_params + ["N_MELS", "N_FFT", "HOP_LENGTH", "INPUT_SHAPE"]
+
+    stages = [
+        Stage("download", "0_download_data", [], class_dirs, code=["downloader"],
+              params=["ESC50_URL", "METADATA_PATH", "AUDIO_PATH", "CLASSES"]),
+        Stage("generate", "4_generate_synthetic_data", class_dirs, [synthetic],
+              code=["augment", "source_cache", "shard_dataset"],
+              params=audio_params + ["SYNTHETIC_FORMAT"], deps=["download"]),
+        Stage("preprocess", "1_preprocess", [synthetic], arrays,
+              code=["features", "augment", "feature_cache", "source_cache", "shard_dataset"],
+              params=feature_params + ["SYNTHETIC_FORMAT"], deps=["generate"]),
+        # Stream mode mixes source clips on the fly: no synthetic data or X.npy
+        Stage("train", "2_train", class_dirs if streamed else arrays, models + [os.path.join(MODEL_DIR, "confusion_matrix.png")],
+              code=["features", "augment", "stream_dataset", "source_cache"] if streamed else [],
+              params=feature_params, deps=["download"] if streamed else ["preprocess"]),
+        # Post-training quantization calibrates on X.npy, or on source clip mixtures in stream mode
+        # (no X.npy); the held-out check reads the source clips
+        Stage("convert", "3_convert", models + class_dirs + ([] if streamed else arrays),
+              [os.path.join(MODEL_DIR, "model_quantized.tflite"), os.path.join(MODEL_DIR, "model_data.cc")],
+              code=["2_train", "profile_model", "evaluate_quantized", "stream_dataset", "features", "source_cache"],
+              params=feature_params, deps=["train"]),
+        Stage("sweep", "sweep_models", arrays, [os.path.join(MODEL_DIR, "sweep")],
+              code=["2_train", "3_convert", "profile_model"], params=feature_params, deps=["preprocess"]),
+    ]
+    return {s.name: s for s in stages}
+
+
+def required(stages, targets):
+    """The targets and everything upstream of them, in dependency order."""
+    order = []
+
+    def visit(name):
+        if name not in order:
+            for dep in stages[name].deps:
+                visit(dep)
+            order.append(name)
+
+    for target in targets:
+        visit(target)
+    return order
+
+
+class Hasher:
+    """Content digests of files and folders, memoized by (size, mtime) in the state file so unchanged files are not re-read."""
+
+    def __init__(self, memo):
+        self.memo = memo  # path -> [size, mtime_ns, digest]
+
+    def file(self, path):
+        stat = os.stat(path)
+        entry = self.memo.get(path)
+        if entry is None or entry[:2] != [stat.st_size, stat.st_mtime_ns]:
+            entry = [stat.st_size, stat.st_mtime_ns, file_digest(path)]
+            self.memo[path] = entry
+        return entry[2]
+
+    def path(self, path):
+        """Digest of a file, of a folder (relative names and digests of every file under it) or 'missing'."""
+        if os.path.isfile(path):
+            return self.file(path)
+        if not os.path.isdir(path):
+            return "missing"
+        h = hashlib.sha256()
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            for name in sorted(names):
+                full = os.path.join(root, name)
+                h.update(f"{os.path.relpath(full, path)}\0{self.file(full)}\n".encode())
+        return h.hexdigest()
+
+    def stage_key(self, stage):
+        """Everything that determines a stage's outputs: code, declared parameters and input contents."""
+        h = hashlib.sha256()
+        for module in stage.code:
+            h.update(f"code {module} {self.file(os.path.join(SRC_DIR, f'{module}.py'))}\n".encode())
+        params = {name: getattr(utils, name) for name in stage.params}
+        h.update(f"params {json.dumps(params, sort_keys=True, default=str)}\n".encode())
+        for path in stage.inputs:
+            h.update(f"input {path} {self.path(path)}\n".encode())
+        return h.hexdigest()
+
+    def outputs(self, stage):
+        return {path: self.path(path) for path in stage.outputs}
+
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"stages": {}, "files": {}}
+
+
+def save_state(state, path=STATE_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def missing_outputs(stage):
+    """Declared outputs that are absent or empty (a zero-byte file, or a folder without files)."""
+    missing = []
+    for path in stage.outputs:
+        if os.path.isfile(path):
+            ok = os.path.getsize(path) > 0
+        else:
+            ok = os.path.isdir(path) and any(names for _, _, names in os.walk(path))
+        if not ok:
+            missing.append(path)
+    return missing
+
+
+def run_stage(stage):
+    """Runs the stage script in its own interpreter, logging to LOG_DIR. Returns (exit code, seconds, log path)."""
+    log_path = os.path.join(LOG_DIR, f"{stage.name}.log")
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        code = subprocess.call([sys.executable, "-m", f"src.{stage.module}"], stdout=log, stderr=subprocess.STDOUT)
+    return code, time.perf_counter() - start, log_path
+
+
+def run(targets=TARGETS, jobs=JOBS, force=(), dry_run=False):
+    """
+    Runs the stages the targets need, skipping each stage whose key (code, parameters and input
+    contents) matches its last successful run and whose outputs are unchanged since. A rerun
+    stage that reproduces its outputs byte for byte leaves its dependents cached.
+    Stages whose dependencies are done run concurrently (up to `jobs`). Returns the summary rows.
+    """
+    stages = build_stages()
+    order = required(stages, targets)
+    state = load_state()
+    hasher = Hasher(state["files"])
+    ensure_dir(LOG_DIR)
+
+    results = {}  # name -> dict(status, seconds, detail)
+    running = {}  # future -> (stage, key)
+    pending = list(order)
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for name in list(pending):
+                stage = stages[name]
+                dep_status = [results.get(d, {}).get("status") for d in stage.deps]
+                if any(s in ("failed", "blocked") for s in dep_status):
+                    results[name] = {"status": "blocked", "seconds": 0.0, "detail": "upstream failed"}
+                    pending.remove(name)
+                    continue
+                if len(running) >= jobs or not all(s in ("cached", "ran", "would run") for s in dep_status):
+                    continue
+                pending.remove(name)
+                start = time.perf_counter()
+                key = hasher.stage_key(stage)
+                last = state["stages"].get(name, {})
+                hash_seconds = time.perf_counter() - start
+                upstream_ran = any(results[d]["status"] == "would run" for d in stage.deps)
+                if (name not in force and not upstream_ran and last.get("key") == key
+                        and last.get("outputs") == hasher.outputs(stage)):
+                    results[name] = {"status": "cached", "seconds": time.perf_counter() - start, "detail": ""}
+                elif dry_run:
+                    results[name] = {"status": "would run", "seconds": hash_seconds,
+                                     "detail": "forced" if name in force else "upstream changes" if upstream_ran
+                                     else "inputs changed" if last else "never run"}
+                else:
+                    print(f"[{name}] running python -m src.{stage.module} (log: {LOG_DIR}/{name}.log)")
+                    running[pool.submit(run_stage, stage)] = (stage, key)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, key = running.pop(future)
+                code, seconds, log_path = future.result()
+                # Exit 0 only counts with every output written (a script may print an error and still exit 0)
+                missing = missing_outputs(stage) if code == 0 else []
+                if code == 0 and not missing:
+                    state["stages"][stage.name] = {"key": key, "outputs": hasher.outputs(stage), "seconds": seconds,
+                                                   "time": time.time()}
+                    save_state(state)
+                    results[stage.name] = {"status": "ran", "seconds": seconds, "detail": ""}
+                else:
+                    state["stages"].pop(stage.name, None)
+                    problem = f"missing output {', '.join(missing)}" if missing else f"exit {code}"
+                    results[stage.name] = {"status": "failed", "seconds": seconds, "detail": f"{problem}, see {log_path}"}
+                print(f"[{stage.name}] {results[stage.name]['status']} in {seconds:.1f} s")
+
+    state["files"] = {path: entry for path, entry in state["files"].items() if os.path.exists(path)}
+    save_state(state)
+    return [(name, results[name]) for name in order]
+
+
+def print_summary(rows, elapsed):
+    print(f"\n{'Stage':<12} {'Status':<10} {'Wall s':>8}  Detail")
+    for name, r in rows:
+        print(f"{name:<12} {r['status']:<10} {r['seconds']:>8.2f}  {r['detail']}")
+    cached = sum(r["status"] == "cached" for _, r in rows)
+    print(f"{cached}/{len(rows)} stages cached, {sum(r['seconds'] for _, r in rows):.1f} s of stage time in {elapsed:.1f} s wall time")
+
+
+def main():
+    stage_names = list(build_stages())
+    parser = argparse.ArgumentParser(description="Run the pipeline stages a target needs, skipping stages whose inputs did not change.")
+    parser.add_argument("targets", nargs="*", help=f"Stages to bring up to date: {', '.join(stage_names)} (default: {' '.join(TARGETS)})")
+    parser.add_argument("--jobs", "-j", type=int, default=JOBS, help="Stages run at once")
+    parser.add_argument("--force", nargs="+", default=[], choices=stage_names, help="Rerun these stages anyway")
+    parser.add_argument("--dry-run", "-n", action="store_true", help="Only report which stages would run")
+    args = parser.parse_args()
+    unknown = [t for t in args.targets if t not in stage_names]
+    if unknown:
+        parser.error(f"unknown stage(s) {', '.join(unknown)}; choose from {', '.join(stage_names)}")
+
+    start = time.perf_counter()
+    rows = run(args.targets or TARGETS, args.jobs, set(args.force), args.dry_run)
+    print_summary(rows, time.perf_counter() - start)
+    if any(r["status"] in ("failed", "blocked") for _, r in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
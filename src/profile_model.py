@@ -0,0 +1,228 @@
+import os
+import sys
+import time
+import copy
+import argparse
+import numpy as np
+import tensorflow as tf
+from tensorflow.lite.tools import flatbuffer_utils
+
+from src.utils import MODEL_DIR
+
+# Constants
+TFLITE_MODEL_PATH = os.path.join(MODEL_DIR, "model_quantized.tflite")
+# ESP32 budget (520 KB SRAM shared with WiFi, audio buffers and the mel frontend)
+ARENA_BUDGET_KB = 96
+FLASH_BUDGET_KB = 256
+MACS_BUDGET = 5_000_000  # Per inference (one 2 s window every 0.5 s)
+TENSOR_ALIGNMENT = 16  # TFLite Micro arena alignment
+LATENCY_RUNS = 200
+
+# Ops whose first constant input is a weight tensor we can count MACs for
+MAC_OPS = {"CONV_2D", "DEPTHWISE_CONV_2D", "FULLY_CONNECTED"}
+
+
+def load_interpreter(model_path=TFLITE_MODEL_PATH, model_content=None):
+    """Interpreter without the XNNPACK delegate, so every op runs (and is listed) on its own."""
+    interpreter = tf.lite.Interpreter(
+        model_path=None if model_content is not None else model_path, model_content=model_content, num_threads=1,
+        experimental_op_resolver_type=tf.lite.experimental.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES)
+    interpreter.allocate_tensors()
+    return interpreter
+
+
+def tensor_bytes(detail):
+    return int(np.prod(detail["shape"])) * np.dtype(detail["dtype"]).itemsize
+
+
+def aligned(n):
+    return -(-n // TENSOR_ALIGNMENT) * TENSOR_ALIGNMENT
+
+
+def op_macs(op_name, input_shapes, output_shape):
+    """Multiply-accumulates of one conv / depthwise / dense op (0 for everything else)."""
+    if op_name not in MAC_OPS:
+        return 0
+    out_elems = int(np.prod(output_shape))
+    weights = input_shapes[1]
+    if op_name == "CONV_2D":  # (out_ch, kh, kw, in_ch)
+        return out_elems * int(np.prod(weights[1:]))
+    if op_name == "DEPTHWISE_CONV_2D":  # (1, kh, kw, ch * multiplier)
+        return out_elems * int(weights[1] * weights[2])
+    return out_elems * int(weights[1])  # FULLY_CONNECTED: (out, in)
+
+
+def profile_ops(interpreter):
+    """
+    Static per-op cost from the model graph. Returns a list of dicts:
+    index, op, output_shape, macs, param_bytes, activation_bytes.
+    """
+    tensors = {t["index"]: t for t in interpreter.get_tensor_details()}
+    ops = interpreter._get_ops_details()
+    produced = {int(i) for op in ops for i in op["outputs"]}
+    graph_inputs = {d["index"] for d in interpreter.get_input_details()}
+
+    report = []
+    for op in ops:
+        inputs = [int(i) for i in op["inputs"] if i >= 0]
+        constants = [i for i in inputs if i not in produced and i not in graph_inputs]
+        output = tensors[int(op["outputs"][0])]
+        report.append({
+            "index": op["index"],
+            "op": op["op_name"],
+            "output_shape": tuple(int(d) for d in output["shape"]),
+            "macs": op_macs(op["op_name"], [tensors[i]["shape"] for i in inputs], output["shape"]),
+            "param_bytes": sum(tensor_bytes(tensors[i]) for i in constants),
+            "activation_bytes": sum(tensor_bytes(tensors[int(i)]) for i in op["outputs"]),
+        })
+    return report
+
+
+def estimate_arena(interpreter):
+    """
+    Peak bytes of simultaneously live activation tensors (16-byte aligned), in execution order.
+    Each tensor lives from the op that produces it (graph inputs: the start) to its last consumer
+    (graph outputs: the end). This is what the TFLite Micro memory planner has to fit; kernel
+    scratch buffers and per-op runtime structs come on top.
+    Returns (peak bytes, op index at the peak).
+    """
+    tensors = {t["index"]: t for t in interpreter.get_tensor_details()}
+    ops = interpreter._get_ops_details()
+    graph_outputs = {d["index"] for d in interpreter.get_output_details()}
+
+    first, last = {d["index"]: 0 for d in interpreter.get_input_details()}, {}
+    for op in ops:
+        for i in op["outputs"]:
+            first[int(i)] = op["index"]
+        for i in op["inputs"]:
+            if int(i) in first:
+                last[int(i)] = op["index"]
+    for i in graph_outputs:
+        last[i] = len(ops) - 1
+
+    usage = np.zeros(len(ops), dtype=np.int64)
+    for i, start in first.items():
+        usage[start:last.get(i, start) + 1] += aligned(tensor_bytes(tensors[i]))
+    peak_op = int(np.argmax(usage))
+    return int(usage[peak_op]), peak_op
+
+
+def single_op_model(model, op_index):
+    """Flatbuffer of a model that only runs one op (its activation inputs become graph inputs)."""
+    model = copy.deepcopy(model)
+    subgraph = model.subgraphs[0]
+    op = subgraph.operators[op_index]
+    subgraph.operators = [op]
+    subgraph.inputs = [i for i in op.inputs if i >= 0 and model.buffers[subgraph.tensors[i].buffer].data is None]
+    subgraph.outputs = list(op.outputs)
+    model.signatureDefs = []
+    return bytes(flatbuffer_utils.convert_object_to_bytearray(model))
+
+
+def time_invoke(interpreter, runs=LATENCY_RUNS):
+    """Median invoke() latency in ms, with random inputs."""
+    rng = np.random.default_rng(0)
+    for detail in interpreter.get_input_details():
+        if np.issubdtype(detail["dtype"], np.integer):
+            info = np.iinfo(detail["dtype"])
+            data = rng.integers(info.min, info.max, size=detail["shape"], endpoint=True)
+        else:
+            data = rng.standard_normal(detail["shape"])
+        interpreter.set_tensor(detail["index"], data.astype(detail["dtype"]))
+    interpreter.invoke()  # Warm-up
+    times = np.empty(runs)
+    for r in range(runs):
+        start = time.perf_counter()
+        interpreter.invoke()
+        times[r] = time.perf_counter() - start
+    return float(np.median(times) * 1000)
+
+
+def measure_op_latency(model_path=TFLITE_MODEL_PATH, runs=LATENCY_RUNS):
+    """
+    Host latency per op (ms, median, one thread, reference kernels), timed by running each
+    op as its own single-op model. Returns (per-op list, whole-model latency).
+    """
+    model = flatbuffer_utils.read_model(model_path)
+    per_op = [time_invoke(load_interpreter(model_content=single_op_model(model, k)), runs)
+              for k in range(len(model.subgraphs[0].operators))]
+    return per_op, time_invoke(load_interpreter(model_path), runs)
+
+
+def profile_model(model_path=TFLITE_MODEL_PATH, latency_runs=LATENCY_RUNS):
+    """Full profile: per-op table, totals and (if latency_runs) measured host latency."""
+    interpreter = load_interpreter(model_path)
+    ops = profile_ops(interpreter)
+    arena_bytes, peak_op = estimate_arena(interpreter)
+    profile = {
+        "ops": ops,
+        "macs": sum(op["macs"] for op in ops),
+        "param_bytes": sum(op["param_bytes"] for op in ops),
+        "flash_bytes": os.path.getsize(model_path),
+        "arena_bytes": arena_bytes,
+        "peak_op": peak_op,
+    }
+    if latency_runs:
+        per_op, total = measure_op_latency(model_path, latency_runs)
+        for op, ms in zip(ops, per_op):
+            op["latency_ms"] = ms
+        profile["latency_ms"] = total
+    return profile
+
+
+def check_budget(profile, arena_kb=ARENA_BUDGET_KB, flash_kb=FLASH_BUDGET_KB, macs=MACS_BUDGET):
+    """Returns a list of budget violations (empty if the model fits)."""
+    violations = []
+    if profile["arena_bytes"] > arena_kb * 1024:
+        violations.append(f"Tensor arena {profile['arena_bytes'] / 1024:.1f} KB > {arena_kb} KB")
+    if profile["flash_bytes"] > flash_kb * 1024:
+        violations.append(f"Model size {profile['flash_bytes'] / 1024:.1f} KB > {flash_kb} KB")
+    if profile["macs"] > macs:
+        violations.append(f"{profile['macs']:,} MACs per inference > {macs:,}")
+    return violations
+
+
+def print_report(profile):
+    has_latency = "latency_ms" in profile
+    print(f"{'#':>3}  {'Op':<18} {'Output':<16} {'MACs':>11} {'Params':>9} {'Activ.':>9}" + ("  Host ms" if has_latency else ""))
+    for op in profile["ops"]:
+        shape = "x".join(str(d) for d in op["output_shape"])
+        line = f"{op['index']:>3}  {op['op']:<18} {shape:<16} {op['macs']:>11,} {op['param_bytes']:>9,} {op['activation_bytes']:>9,}"
+        if has_latency:
+            line += f"  {op['latency_ms']:7.3f}"
+        print(line)
+    print(f"\nTotal MACs:        {profile['macs']:,}")
+    print(f"Parameters:        {profile['param_bytes'] / 1024:.1f} KB")
+    print(f"Model (flash):     {profile['flash_bytes'] / 1024:.1f} KB")
+    print(f"Tensor arena est.: {profile['arena_bytes'] / 1024:.1f} KB (peak at op {profile['peak_op']}, activations only)")
+    if has_latency:
+        print(f"Host latency:      {profile['latency_ms']:.3f} ms per inference "
+              f"(sum of ops {sum(op['latency_ms'] for op in profile['ops']):.3f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-op cost of a TFLite model and ESP32 budget check.")
+    parser.add_argument("--model", default=TFLITE_MODEL_PATH)
+    parser.add_argument("--arena-kb", type=float, default=ARENA_BUDGET_KB)
+    parser.add_argument("--flash-kb", type=float, default=FLASH_BUDGET_KB)
+    parser.add_argument("--macs", type=int, default=MACS_BUDGET)
+    parser.add_argument("--runs", type=int, default=LATENCY_RUNS, help="Latency runs per op (0 to skip timing)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"Error: Model file {args.model} not found. Run 3_convert.py first.")
+        sys.exit(1)
+
+    profile = profile_model(args.model, args.runs)
+    print_report(profile)
+
+    violations = check_budget(profile, args.arena_kb, args.flash_kb, args.macs)
+    for v in violations:
+        print(f"[FAIL] Over budget: {v}")
+    if violations:
+        sys.exit(1)
+    print("[OK] Within ESP32 budget.")
+
+
+if __name__ == "__main__":
+    main()
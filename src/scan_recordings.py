@@ -0,0 +1,216 @@
+import os
+import csv
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+from src.utils import CLASSES, SAMPLE_RATE, BLOCK_SIZE, STEP_SIZE
+from src.features import StreamingMelSpectrogram
+from src.inference import load_backend, BACKENDS
+
+# Constants
+BATCH_SIZE = 256  # Windows per inference call
+THRESHOLD = 0.6  # Same as demo_laptop_mic.py
+BACKEND = "tflite"
+READ_BLOCK_SECONDS = 30  # Decode granularity (memory use is bounded by this, not file length)
+EVENT_FIELDS = ["file", "start", "end", "class", "peak_confidence"]
+
+# Per-process model (loaded once by the pool initializer)
+_backend = None
+
+
+def _init_worker(backend, model_path):
+    global _backend
+    # One interpreter thread per process; parallelism comes from the process pool
+    kwargs = {"num_threads": 1} if backend == "tflite" else {}
+    _backend = load_backend(backend, model_path, **kwargs)
+
+
+def read_blocks(file_path, block_seconds=READ_BLOCK_SECONDS):
+    """
+    Stream-decodes a WAV file as mono float32 blocks at SAMPLE_RATE.
+    Files at other sample rates are resampled incrementally.
+    """
+    with sf.SoundFile(file_path) as f:
+        resampler = None
+        if f.samplerate != SAMPLE_RATE:
+            import soxr  # Installed with librosa
+            resampler = soxr.ResampleStream(f.samplerate, SAMPLE_RATE, 1, dtype="float32")
+
+        block_frames = int(f.samplerate * block_seconds)
+        while True:
+            data = f.read(block_frames, dtype="float32", always_2d=True)
+            last = len(data) < block_frames
+            audio = data.mean(axis=1)
+            if resampler is not None:
+                audio = resampler.resample_chunk(audio, last=last)
+            if len(audio):
+                yield audio
+            if last:
+                break
+
+
+def iter_windows(file_path):
+    """
+    Yields (start_time, log_mel) for every sliding window (DURATION long, STEP_SIZE apart).
+    Uses the streaming frontend, so each window only computes its new mel frames.
+    The last partial step is zero-padded so the end of the file is covered.
+    """
+    frontend = StreamingMelSpectrogram(window_size=BLOCK_SIZE)
+    pending = np.zeros(0, dtype=np.float32)
+    start = None  # Start sample of the current window
+
+    for audio in read_blocks(file_path):
+        pending = np.concatenate([pending, audio])
+        if start is None:
+            if len(pending) < BLOCK_SIZE:
+                continue
+            # First window: fill the whole buffer at once
+            start = 0
+            yield 0.0, frontend.push(pending[:BLOCK_SIZE])
+            pending = pending[BLOCK_SIZE:]
+        while len(pending) >= STEP_SIZE:
+            start += STEP_SIZE
+            yield start / SAMPLE_RATE, frontend.push(pending[:STEP_SIZE])
+            pending = pending[STEP_SIZE:]
+
+    if start is None:
+        if len(pending):  # File shorter than one window
+            yield 0.0, frontend.push(np.pad(pending, (0, BLOCK_SIZE - len(pending))))
+    elif len(pending):
+        start += STEP_SIZE
+        yield start / SAMPLE_RATE, frontend.push(np.pad(pending, (0, STEP_SIZE - len(pending))))
+
+
+def iter_predictions(file_path, backend, batch_size=BATCH_SIZE):
+    """Yields (start_time, probabilities) per window, running inference in batches."""
+    batch = np.empty((batch_size, 64, 63, 1), dtype=np.float32)
+    times = []
+    for start_time, log_mel in iter_windows(file_path):
+        batch[len(times), ..., 0] = log_mel
+        times.append(start_time)
+        if len(times) == batch_size:
+            yield from zip(times, backend.predict(batch))
+            times = []
+    if times:
+        yield from zip(times, backend.predict(batch[:len(times)]))
+
+
+def detect_events(predictions, threshold=THRESHOLD, duration=BLOCK_SIZE / SAMPLE_RATE):
+    """
+    Merges consecutive windows with the same detected (non-background) class into events.
+    Returns a list of dicts: start, end, class, peak_confidence (times in seconds).
+    """
+    events = []
+    current = None
+    for start_time, probs in predictions:
+        class_idx = int(np.argmax(probs))
+        label = CLASSES[class_idx]
+        confidence = float(probs[class_idx])
+        detected = confidence > threshold and label != "background"
+
+        if current is not None and (not detected or label != current["class"]):
+            events.append(current)
+            current = None
+        if detected:
+            if current is None:
+                current = {"start": start_time, "end": start_time + duration, "class": label, "peak_confidence": confidence}
+            else:
+                current["end"] = start_time + duration
+                current["peak_confidence"] = max(current["peak_confidence"], confidence)
+    if current is not None:
+        events.append(current)
+    return events
+
+
+def scan_file(file_path, backend=None, threshold=THRESHOLD, batch_size=BATCH_SIZE):
+    """
+    Scans one recording and returns its event timeline.
+    Uses the worker's model when called from scan_files.
+    """
+    backend = backend or _backend
+    events = detect_events(iter_predictions(file_path, backend, batch_size), threshold)
+    for event in events:
+        event["file"] = file_path
+    return events
+
+
+def scan_files(file_paths, backend=BACKEND, model_path=None, workers=None, threshold=THRESHOLD, batch_size=BATCH_SIZE):
+    """
+    Scans many recordings in parallel (one process per core, one file per task).
+    Yields (file_path, events, error) in input order; a file that fails has events None and
+    the exception as error, and the other files are still scanned.
+    """
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(backend, model_path)) as pool:
+        futures = [pool.submit(scan_file, path, None, threshold, batch_size) for path in file_paths]
+        for path, future in zip(file_paths, futures):
+            try:
+                yield path, future.result(), None
+            except Exception as e:
+                yield path, None, e
+
+
+def find_recordings(paths):
+    """Expands directories into the WAV files they contain."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, n) for n in sorted(names) if n.lower().endswith(".wav"))
+        else:
+            files.append(path)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan long field recordings and output an event timeline.")
+    parser.add_argument("paths", nargs="+", help="WAV files or directories")
+    parser.add_argument("--output", "-o", help="CSV output path (default: stdout)")
+    parser.add_argument("--backend", default=BACKEND, choices=BACKENDS)
+    parser.add_argument("--model", default=None, help="Model path (default depends on backend)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    files = find_recordings(args.paths)
+    if not files:
+        print("Error: No WAV files found.", file=sys.stderr)
+        return
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    writer = csv.DictWriter(out, fieldnames=EVENT_FIELDS)
+    writer.writeheader()
+
+    start = time.perf_counter()
+    total_audio = 0.0
+    failed = []
+    for path, events, error in scan_files(files, args.backend, args.model, args.workers, args.threshold, args.batch_size):
+        if error is not None:
+            print(f"Error scanning {path}: {error}", file=sys.stderr)
+            failed.append(path)
+            continue
+        for event in events:
+            writer.writerow({**event, "start": f"{event['start']:.2f}", "end": f"{event['end']:.2f}",
+                             "peak_confidence": f"{event['peak_confidence']:.3f}"})
+        out.flush()
+        total_audio += sf.info(path).duration
+        print(f"Scanned {path}: {len(events)} events", file=sys.stderr)
+
+    if args.output:
+        out.close()
+    elapsed = time.perf_counter() - start
+    print(f"Scanned {total_audio / 3600:.2f} h of audio in {elapsed:.1f} s "
+          f"({total_audio / max(elapsed, 1e-9):.0f}x real time)", file=sys.stderr)
+    if failed:
+        print(f"{len(failed)} of {len(files)} files could not be scanned: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+from src.utils import CLASSES, SAMPLE_RATE, ensure_dir
+
+MANIFEST = "manifest.json"
+FORMATS = {"pcm16": np.int16, "float16": np.float16}  # Audio clips / feature arrays
+PCM_SCALE = 32767.0
+
+
+def encode(array, fmt):
+    """float32 clips (or features) -> the shard dtype."""
+    if fmt == "pcm16":
+        return (np.clip(array, -1.0, 1.0) * PCM_SCALE).round().astype(np.int16)
+    return np.asarray(array, dtype=FORMATS[fmt])
+
+
+def decode(array, fmt):
+    """Shard rows -> float32 (one conversion copy; use ShardDataset.rows() for the stored dtype)."""
+    if fmt == "pcm16":
+        return array.astype(np.float32) / PCM_SCALE
+    return array.astype(np.float32)
+
+
+def write_shard(root, name, arrays, records, fmt="pcm16"):
+    """
+    Writes one shard (<root>/<name>.npy, rows = arrays) and returns its records, each
+    completed with shard, row and a content digest of the stored row (keys the feature cache).
+    Safe to call from parallel workers as long as names differ; the manifest is written once
+    by write_manifest().
+    """
+    data = encode(np.stack(arrays), fmt)
+    tmp_path = os.path.join(root, f"{name}.{os.getpid()}.tmp.npy")
+    np.save(tmp_path, data)
+    os.replace(tmp_path, os.path.join(root, f"{name}.npy"))
+    return [dict(record, shard=name, row=row, digest=hashlib.sha256(data[row].tobytes()).hexdigest())
+            for row, record in enumerate(records)]
+
+
+def write_manifest(root, records, fmt="pcm16", **info):
+    """
+    Writes the manifest: format, sample rate, row shape and one record per item (label,
+    shard, row, digest and any generation parameters), in the given order. Index i of the
+    dataset is records[i].
+    """
+    shards = sorted({r["shard"] for r in records})
+    shape = list(np.load(os.path.join(root, f"{shards[0]}.npy"), mmap_mode="r").shape[1:]) if shards else []
+    manifest = {"format": fmt, "sample_rate": SAMPLE_RATE, "classes": CLASSES, "shape": shape,
+                "shards": shards, "records": records, **info}
+    tmp_path = os.path.join(root, MANIFEST + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(root, MANIFEST))
+
+
+def exists(root):
+    return os.path.exists(os.path.join(root, MANIFEST))
+
+
+class ShardDataset:
+    """
+    Read side of a sharded dataset: a manifest plus .npy shards of int16 PCM clips or float16
+    features, opened as read-only memory maps (only the rows touched are read from disk).
+
+    row(i) -> stored row i and shard(name) -> a whole shard, both zero-copy views of the map;
+    dataset[i] -> float32 row i; rows(indices) / batch(indices) -> a stored-dtype / float32 batch.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.format = self.manifest["format"]
+        self.records = self.manifest["records"]
+        self.labels = np.array([CLASSES.index(r["label"]) for r in self.records], dtype=np.int64)
+        shard_index = {name: k for k, name in enumerate(self.manifest["shards"])}
+        self._shard_of = np.array([shard_index[r["shard"]] for r in self.records], dtype=np.int64)
+        self._row_of = np.array([r["row"] for r in self.records], dtype=np.int64)
+        self._maps = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def shard(self, name):
+        if name not in self._maps:
+            self._maps[name] = np.load(os.path.join(self.root, f"{name}.npy"), mmap_mode="r")
+        return self._maps[name]
+
+    def row(self, i):
+        """Stored row i (a view into the memory map)."""
+        return self.shard(self.manifest["shards"][self._shard_of[i]])[self._row_of[i]]
+
+    def __getitem__(self, i):
+        return decode(self.row(i), self.format)
+
+    def rows(self, indices):
+        """Stored rows for a batch of indices, read shard by shard (one fancy index per shard)."""
+        indices = np.asarray(indices)
+        out = np.empty((len(indices), *self.manifest["shape"]), dtype=FORMATS[self.format])
+        shards = self._shard_of[indices]
+        for k in np.unique(shards):
+            pos = np.flatnonzero(shards == k)
+            out[pos] = self.shard(self.manifest["shards"][k])[self._row_of[indices[pos]]]
+        return out
+
+    def batch(self, indices):
+        """float32 rows for a batch of indices."""
+        return decode(self.rows(indices), self.format)
+
+
+def create(root):
+    """Empties (or creates) a dataset directory before writing shards."""
+    ensure_dir(root)
+    for name in os.listdir(root):
+        if name.endswith(".npy") or name.startswith(MANIFEST):
+            os.remove(os.path.join(root, name))
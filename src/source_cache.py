@@ -0,0 +1,152 @@
+import os
+import json
+import numpy as np
+import librosa
+from concurrent.futures import ProcessPoolExecutor
+
+from src.utils import DATA_DIR, SAMPLE_RATE, DURATION, ensure_dir, params_digest
+
+CACHE_DIR = os.path.join(DATA_DIR, "source_cache")
+# Everything that changes a decoded clip (keys the cache directory)
+CACHE_PARAMS = {"sample_rate": SAMPLE_RATE, "duration": DURATION, "decoder": "librosa.load"}
+WORKERS = os.cpu_count()
+PARALLEL_MIN_FILES = 32  # Decode misses in a process pool from this many on
+
+# Folders already opened in this process: folder -> (index of file path, memory-mapped clips)
+_opened = {}
+
+
+def decode_clip(path):
+    """Decodes, resamples to SAMPLE_RATE and pads/truncates a file to DURATION (float32)."""
+    target_len = int(SAMPLE_RATE * DURATION)
+    audio, _ = librosa.load(path, sr=SAMPLE_RATE, duration=DURATION)
+    clip = np.zeros(target_len, dtype=np.float32)
+    clip[:min(len(audio), target_len)] = audio[:target_len]
+    return clip
+
+
+def _try_decode(path):
+    """decode_clip() that returns (clip, None) or (None, error message), so one bad file does not stop a pool."""
+    try:
+        return decode_clip(path), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return [os.path.basename(path), stat.st_size, stat.st_mtime_ns]
+
+
+def _cache_paths(folder, params=CACHE_PARAMS, cache_dir=CACHE_DIR):
+    key = os.path.normpath(os.path.abspath(folder)).strip(os.sep).replace(os.sep, "__")
+    entry_dir = os.path.join(cache_dir, params_digest(params))
+    return os.path.join(entry_dir, f"{key}.npy"), os.path.join(entry_dir, f"{key}.json")
+
+
+def _usable(files, clips, failed):
+    """Drops the files that could not be decoded (and their zeroed rows)."""
+    if not failed:
+        return files, clips
+    ok = [k for k, f in enumerate(files) if os.path.basename(f) not in failed]
+    return [files[k] for k in ok], clips[ok]
+
+
+def load_folder(folder, workers=WORKERS, cache_dir=CACHE_DIR):
+    """
+    All decodable .wav files of a folder (sorted) as decoded clips. Returns (file paths, (N, samples)
+    read-only memory map; an in-memory copy if some files could not be decoded).
+
+    Clips live in <cache_dir>/<params digest>/<folder>.npy with a manifest of each file's name,
+    size and mtime, so a SAMPLE_RATE / DURATION change misses the whole cache and an added,
+    removed or rewritten file only decodes that file; the rest are copied from the old cache.
+    Files that fail to decode keep a zeroed row, are listed in the manifest's "failed" (name ->
+    error) and are left out of the result; they are retried on the next rebuild.
+    """
+    files = [os.path.join(folder, f) for f in sorted(os.listdir(folder)) if f.endswith('.wav')]
+    signatures = [_signature(f) for f in files]
+    npy_path, manifest_path = _cache_paths(folder, cache_dir=cache_dir)
+    manifest = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["files"] == signatures:
+            return _usable(files, np.load(npy_path, mmap_mode='r'), manifest.get("failed", {}))
+
+    # Rebuild: rows of unchanged files come from the old cache, the rest are decoded
+    old_rows = {}
+    if manifest is not None and os.path.exists(npy_path):
+        old_failed = manifest.get("failed", {})
+        old_rows = {tuple(sig): row for row, sig in enumerate(manifest["files"]) if sig[0] not in old_failed}
+        old = np.load(npy_path, mmap_mode='r')
+    misses = [k for k, sig in enumerate(signatures) if tuple(sig) not in old_rows]
+    ensure_dir(os.path.dirname(npy_path))
+    tmp_path = f"{npy_path}.{os.getpid()}.tmp.npy"
+    failed = {}
+    try:
+        clips = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                          shape=(len(files), int(SAMPLE_RATE * DURATION)))
+        for k, sig in enumerate(signatures):
+            if tuple(sig) in old_rows:
+                clips[k] = old[old_rows[tuple(sig)]]
+        paths = [files[k] for k in misses]
+
+        def store(clips, decoded):
+            for k, path, (clip, error) in zip(misses, paths, decoded):
+                if error is None:
+                    clips[k] = clip
+                else:
+                    failed[os.path.basename(path)] = error
+                    print(f"Error decoding {path}: {error}")
+
+        if workers > 1 and len(paths) >= PARALLEL_MIN_FILES:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                store(clips, pool.map(_try_decode, paths, chunksize=16))
+        else:
+            store(clips, map(_try_decode, paths))
+        clips.flush()
+        del clips
+        if old_rows:
+            del old
+        os.replace(tmp_path, npy_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    manifest_tmp = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(manifest_tmp, "w") as f:
+        json.dump({"params": CACHE_PARAMS, "files": signatures, "failed": failed}, f)
+    os.replace(manifest_tmp, manifest_path)
+    print(f"Source cache: {folder}: {len(files) - len(misses)} clips reused, {len(misses) - len(failed)} decoded"
+          + (f", {len(failed)} failed." if failed else "."))
+    _opened.pop(os.path.abspath(folder), None)
+    return _usable(files, np.load(npy_path, mmap_mode='r'), failed)
+
+
+def _open(folder):
+    key = os.path.abspath(folder)
+    if key not in _opened:
+        files, clips = load_folder(folder)
+        _opened[key] = ({os.path.abspath(f): row for row, f in enumerate(files)}, clips)
+    return _opened[key]
+
+
+def load_clip(path):
+    """One decoded clip (a row of its folder's cache; the folder is validated once per process)."""
+    index, clips = _open(os.path.dirname(path))
+    row = index.get(os.path.abspath(path))
+    if row is None:
+        raise ValueError(f"{path} could not be decoded (see the source cache manifest)")
+    return clips[row]
+
+
+def decodable(paths):
+    """The paths that load_clip() can return (files that failed to decode are dropped)."""
+    return [p for p in paths if os.path.abspath(p) in _open(os.path.dirname(p))[0]]
+
+
+def load_clips(paths):
+    """Decoded clips of any files, in order, as one in-memory (N, samples) array."""
+    out = np.zeros((len(paths), int(SAMPLE_RATE * DURATION)), dtype=np.float32)
+    for k, path in enumerate(paths):
+        out[k] = load_clip(path)
+    return out
@@ -0,0 +1,109 @@
+import os
+import numpy as np
+import tensorflow as tf
+
+from src.utils import DATA_DIR, CLASSES, SAMPLE_RATE, DURATION, INPUT_SHAPE
+from src.features import log_mel_spectrogram
+from src.augment import augment_pitch_speed, add_noise, apply_gain, mix_audio
+from src import source_cache
+
+# Constants (same mixing recipe as 4_generate_synthetic_data.py + 1_preprocess.py)
+BACKGROUND_CLASS = "background"
+SNR_RANGE = (-10.0, 5.0)  # dB, target buried in noise to slightly louder
+AUGMENT_PROB = 0.8  # Pitch shift or time stretch on the foreground
+PITCH_RANGE = (-2.0, 2.0)  # Semitones
+SPEED_RANGE = (0.8, 1.2)
+GAIN_RANGE = (0.5, 1.5)  # Volume variation of pure background samples
+NOISE_PROB = 0.25  # White noise on the final mixture
+NOISE_FACTOR = 0.005
+VAL_FRACTION = 0.2  # Source files held out for validation (split by file, so no clip leaks)
+
+
+def list_source_files(label, data_dir=DATA_DIR):
+    folder = os.path.join(data_dir, label)
+    if not os.path.isdir(folder):
+        return []
+    return [os.path.join(folder, f) for f in sorted(os.listdir(folder)) if f.endswith('.wav')]
+
+
+def load_clips(files):
+    """Loads fixed-length clips (DURATION at SAMPLE_RATE) into one (N, samples) array, from the source cache."""
+    return source_cache.load_clips(files)
+
+
+def load_sources(data_dir=DATA_DIR, val_fraction=VAL_FRACTION, seed=0):
+    """
+    Loads the source clips of every class and splits them by file into train / validation.
+    Returns (train, val), each a dict {label: (N, samples) array}.
+    """
+    rng = np.random.default_rng(seed)
+    train, val = {}, {}
+    for label in CLASSES:
+        files = source_cache.decodable(list_source_files(label, data_dir))
+        if not files:
+            print(f"Warning: No clips for {label}")
+            continue
+        files = [files[i] for i in rng.permutation(len(files))]
+        n_val = int(round(len(files) * val_fraction)) if len(files) > 1 else 0
+        train[label] = load_clips(files[n_val:])
+        if n_val:
+            val[label] = load_clips(files[:n_val])
+    return train, val
+
+
+def mix_batch(sources, batch_size, rng):
+    """
+    Draws one batch of fresh mixtures from in-memory source clips.
+    Returns (features (batch_size, *INPUT_SHAPE), sparse labels (batch_size,)).
+    """
+    labels = np.array([CLASSES.index(l) for l in sources])[rng.integers(len(sources), size=batch_size)]
+    backgrounds = sources[BACKGROUND_CLASS]
+    audio = backgrounds[rng.integers(len(backgrounds), size=batch_size)]
+
+    # Pure background samples: optional volume variation
+    is_bg = labels == CLASSES.index(BACKGROUND_CLASS)
+    gains = np.where(rng.random(batch_size) < 0.5, rng.uniform(*GAIN_RANGE, size=batch_size), 1.0)
+    audio[is_bg] = apply_gain(audio[is_bg], gains[is_bg])
+
+    # Target samples: random foreground of the class, pitch/speed augmented, mixed at a random SNR
+    targets = np.flatnonzero(~is_bg)
+    if len(targets):
+        fores = np.stack([sources[CLASSES[labels[k]]][rng.integers(len(sources[CLASSES[labels[k]]]))] for k in targets])
+        augment = rng.random(len(targets)) < AUGMENT_PROB
+        use_pitch = rng.random(len(targets)) < 0.5
+        pitch_steps = np.where(augment & use_pitch, rng.uniform(*PITCH_RANGE, size=len(targets)), np.nan)
+        speed_rates = np.where(augment & ~use_pitch, rng.uniform(*SPEED_RANGE, size=len(targets)), np.nan)
+        fores = augment_pitch_speed(fores, pitch_steps, speed_rates)
+        audio[targets] = mix_audio(fores, audio[targets], rng.uniform(*SNR_RANGE, size=len(targets)))
+
+    noisy = rng.random(batch_size) < NOISE_PROB
+    audio[noisy] = add_noise(audio[noisy], NOISE_FACTOR, rng)
+
+    return log_mel_spectrogram(audio)[..., np.newaxis], labels.astype(np.int32)
+
+
+def make_dataset(sources, batch_size, seed=0, num_batches=None):
+    """
+    tf.data pipeline of on-the-fly mixtures: batch i is drawn from np.random.default_rng([seed, i]),
+    so every epoch sees new mixtures and the stream is reproducible. Infinite unless num_batches is set.
+    Batches are generated in parallel (parallel map) and prefetched; labels are sparse.
+    """
+    missing = [label for label in CLASSES if label not in sources]
+    if BACKGROUND_CLASS in missing:
+        raise ValueError("No background clips found.")
+    if missing:
+        print(f"Warning: Training without {missing}")
+
+    def generate(batch_idx):
+        return mix_batch(sources, batch_size, np.random.default_rng([seed, int(batch_idx)]))
+
+    def generate_tf(batch_idx):
+        features, labels = tf.numpy_function(generate, [batch_idx], (tf.float32, tf.int32))
+        features.set_shape((batch_size, *INPUT_SHAPE))
+        labels.set_shape((batch_size,))
+        return features, labels
+
+    indices = tf.data.Dataset.counter() if num_batches is None else tf.data.Dataset.range(num_batches)
+    return (indices
+            .map(generate_tf, num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+            .prefetch(tf.data.AUTOTUNE))
@@ -0,0 +1,195 @@
+import numpy as np
+
+from src.utils import STEP_SIZE, HOP_LENGTH
+from src.inference import KERAS_MODEL_PATH
+
+HOP_FRAMES = STEP_SIZE // HOP_LENGTH  # Mel frames the window advances per hop (16)
+
+
+class _Conv:
+    """Conv2D / DepthwiseConv2D ('same', stride 1) with BatchNorm folded in and optional fused ReLU."""
+    stride = 1
+
+    def __init__(self, kernel, depthwise):
+        self.kernel = kernel.astype(np.float32)  # (kh, kw, C_in, C_out) or (kh, kw, C, 1)
+        self.depthwise = depthwise
+        out_channels = kernel.shape[2] if depthwise else kernel.shape[3]
+        self.bias = np.zeros(out_channels, dtype=np.float32)
+        self.relu = False
+        self.pad_h, self.pad_t = kernel.shape[0] // 2, kernel.shape[1] // 2
+
+    def fold_batch_norm(self, scale, shift):
+        if self.depthwise:
+            self.kernel = self.kernel * scale[:, np.newaxis]
+        else:
+            self.kernel = self.kernel * scale
+        self.bias = self.bias * scale + shift
+
+    def out_len(self, t_in):
+        return t_in
+
+    def receptive(self, cols):
+        """(n, k) input columns each output column reads (may fall outside the window)."""
+        return cols[:, np.newaxis] + np.arange(-self.pad_t, self.pad_t + 1)
+
+    def uses_padding(self, cols, t_in):
+        return (cols < self.pad_t) | (cols > t_in - 1 - self.pad_t)
+
+    def compute(self, x, cols):
+        """x: (H, T, C) layer input. Returns the output columns `cols`, shape (H, len(cols), C_out)."""
+        if self.kernel.shape[:2] == (1, 1) and not self.depthwise:
+            out = x[:, cols] @ self.kernel[0, 0]
+        else:
+            padded = np.pad(x, ((self.pad_h, self.pad_h), (self.pad_t, self.pad_t), (0, 0)))
+            patches = np.lib.stride_tricks.sliding_window_view(padded, self.kernel.shape[:2], axis=(0, 1))[:, cols]
+            if self.depthwise:
+                out = np.einsum("hncij,ijc->hnc", patches, self.kernel[..., 0], optimize=True)
+            else:
+                out = np.einsum("hncij,ijco->hno", patches, self.kernel, optimize=True)
+        out += self.bias
+        return np.maximum(out, 0, out=out) if self.relu else out
+
+
+class _MaxPool:
+    """MaxPooling2D ('valid', stride = pool size)."""
+
+    def __init__(self, pool_size):
+        self.pool_h, self.stride = pool_size
+
+    def out_len(self, t_in):
+        return t_in // self.stride
+
+    def receptive(self, cols):
+        return cols[:, np.newaxis] * self.stride + np.arange(self.stride)
+
+    def uses_padding(self, cols, t_in):
+        return np.zeros(len(cols), dtype=bool)
+
+    def compute(self, x, cols):
+        rows = x.shape[0] // self.pool_h
+        idx = self.receptive(cols).ravel()
+        blocks = x[:rows * self.pool_h, idx].reshape(rows, self.pool_h, len(cols), self.stride, x.shape[2])
+        return blocks.max(axis=(1, 3))
+
+
+def fold_layers(model):
+    """
+    Converts a build_ds_cnn Keras model into streaming stages (BatchNorm and ReLU folded
+    into the preceding conv) plus the (weights, bias) of the final Dense layer.
+    """
+    from tensorflow.keras import layers
+
+    stages, dense = [], None
+    for layer in model.layers:
+        # DepthwiseConv2D subclasses Conv2D only on Keras 2, so test both
+        if isinstance(layer, (layers.DepthwiseConv2D, layers.Conv2D)):
+            depthwise = isinstance(layer, layers.DepthwiseConv2D)
+            # Keras 2 keeps the depthwise weights in depthwise_kernel, Keras 3 in kernel
+            kernel = getattr(layer, "depthwise_kernel", None) if depthwise else None
+            conv = _Conv((layer.kernel if kernel is None else kernel).numpy(), depthwise)
+            stages.append(conv)
+            if tuple(layer.strides) != (1, 1) or layer.padding != "same" or tuple(layer.dilation_rate) != (1, 1):
+                raise ValueError(f"Layer {layer.name}: only stride-1 'same' convolutions can be streamed.")
+            if layer.use_bias:
+                conv.bias = layer.bias.numpy().astype(np.float32)
+            if layer.activation.__name__ == "relu":
+                conv.relu = True
+        elif isinstance(layer, layers.BatchNormalization):
+            conv = stages[-1]
+            gamma = layer.gamma.numpy() if layer.scale else 1.0
+            beta = layer.beta.numpy() if layer.center else 0.0
+            scale = (gamma / np.sqrt(layer.moving_variance.numpy() + layer.epsilon)).astype(np.float32)
+            conv.fold_batch_norm(scale, (beta - layer.moving_mean.numpy() * scale).astype(np.float32))
+        elif isinstance(layer, layers.ReLU):
+            stages[-1].relu = True
+        elif isinstance(layer, layers.MaxPooling2D):
+            if layer.padding != "valid" or tuple(layer.strides) != tuple(layer.pool_size):
+                raise ValueError(f"Layer {layer.name}: only non-overlapping 'valid' pooling can be streamed.")
+            stages.append(_MaxPool(layer.pool_size))
+        elif isinstance(layer, layers.Dense):
+            kernel, bias = layer.get_weights()
+            dense = (kernel.astype(np.float32), bias.astype(np.float32))
+        elif not isinstance(layer, (layers.GlobalAveragePooling2D, layers.Dropout, layers.InputLayer)):
+            raise ValueError(f"Layer {layer.name} ({type(layer).__name__}) is not supported by the streaming model.")
+    return stages, dense
+
+
+class StreamingBackend:
+    """
+    build_ds_cnn model that keeps every conv / pool activation of the previous window and,
+    when the window has advanced by hop_frames, only recomputes the time columns whose
+    inputs changed: the new frames, the columns whose 'same' padding moved, and whatever
+    those reach through the following layers. The rest is shifted from the cache.
+
+    Changed input columns are found by comparing the window with the previous one, so
+    the output is always that of the full-window model. Features normalised to the window
+    maximum (power_to_db ref=np.max) change everywhere when the loudest bin enters or
+    leaves the window; those hops are recomputed in full.
+    """
+
+    def __init__(self, model_path=KERAS_MODEL_PATH, hop_frames=HOP_FRAMES, model=None):
+        import tensorflow as tf
+        self.model_path = model_path
+        self.hop_frames = hop_frames
+        self.stages, (self.dense_kernel, self.dense_bias) = fold_layers(model or tf.keras.models.load_model(model_path))
+        self.reset()
+
+    def reset(self):
+        self._window = None
+        self._cache = [None] * len(self.stages)
+        self.computed_columns = 0  # Conv / pool output columns computed, for the reuse ratio
+        self.total_columns = 0
+
+    def _dirty_inputs(self, x):
+        """Input columns that are not the previous window's columns shifted by hop_frames (None: no usable state)."""
+        t, shift = x.shape[1], self.hop_frames
+        if self._window is None or self._window.shape != x.shape or not 0 < shift < t:
+            return None
+        dirty = np.ones(t, dtype=bool)
+        dirty[:t - shift] = np.any(x[:, :t - shift] != self._window[:, shift:], axis=(0, 2))
+        return dirty
+
+    def forward(self, x):
+        """x: (H, T, C) window. Returns the class logits."""
+        dirty = self._dirty_inputs(x)
+        self._window = x.copy()
+        shift = self.hop_frames
+
+        act = x
+        for i, stage in enumerate(self.stages):
+            t_in, t_out = act.shape[1], stage.out_len(act.shape[1])
+            out = self._cache[i]
+            if dirty is not None and out is not None and shift % stage.stride == 0 and shift // stage.stride < t_out:
+                shift //= stage.stride
+                cols = np.arange(t_out)
+                receptive = stage.receptive(cols)
+                inside = (receptive >= 0) & (receptive < t_in)
+                reads_dirty = np.any(dirty[np.clip(receptive, 0, t_in - 1)] & inside, axis=1)
+                moved_padding = stage.uses_padding(cols, t_in) | stage.uses_padding(cols + shift, t_in)
+                dirty = reads_dirty | moved_padding | (cols + shift >= t_out)
+                cols = np.flatnonzero(dirty)
+                out[:, :-shift] = out[:, shift:]
+                out[:, cols] = stage.compute(act, cols)
+            else:
+                dirty = None
+                cols = np.arange(t_out)
+                out = stage.compute(act, cols)
+            self._cache[i] = out
+            self.computed_columns += len(cols)
+            self.total_columns += t_out
+            act = out
+
+        return act.mean(axis=(0, 1)) @ self.dense_kernel + self.dense_bias
+
+    def predict(self, input_data):
+        """
+        input_data: (N, 64, 63, 1) float32 windows, in stream order. Returns (N, num_classes) probabilities.
+        """
+        logits = np.stack([self.forward(np.asarray(window, dtype=np.float32)) for window in input_data])
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    @property
+    def reuse_ratio(self):
+        """Fraction of conv / pool output columns served from the cache so far."""
+        return 1.0 - self.computed_columns / max(self.total_columns, 1)
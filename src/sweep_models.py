@@ -0,0 +1,200 @@
+import os
+import sys
+import csv
+import argparse
+import importlib
+import itertools
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.utils import DATA_DIR, MODEL_DIR, CLASSES, ensure_dir
+
+# Constants
+WIDTHS = [0.25, 0.5, 1.0, 1.5]  # Channel multipliers (1.0 = 16/32/64, the shipped model)
+DEPTHS = [1, 2, 3]  # DS blocks (2 = the shipped model)
+EPOCHS = 3  # Same as 2_train.py
+BATCH_SIZE = 128
+WORKERS = min(4, os.cpu_count())  # Each worker trains one variant at a time
+CALIBRATION_SAMPLES = 100  # Same as 3_convert.py
+LATENCY_RUNS = 200
+TEST_SIZE = 0.2  # Same held-out split as 2_train.py
+SPLIT_SEED = 42
+SWEEP_DIR = os.path.join(MODEL_DIR, "sweep")
+RESULTS_CSV = os.path.join(SWEEP_DIR, "sweep_results.csv")
+RESULTS_PLOT = os.path.join(SWEEP_DIR, "sweep_pareto.png")
+FIELDS = ["name", "width", "depth", "params", "flash_kb", "arena_kb", "macs",
+          "float_accuracy", "int8_accuracy", "latency_ms", "pareto"]
+
+
+def split_indices(n):
+    from sklearn.model_selection import train_test_split
+    train_idx, test_idx = train_test_split(np.arange(n), test_size=TEST_SIZE, random_state=SPLIT_SEED)
+    return np.sort(train_idx), np.sort(test_idx)
+
+
+def variant_name(width, depth):
+    return f"ds_cnn_w{width:g}_d{depth}"
+
+
+def _init_worker(threads):
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def train_variant(width, depth, epochs=EPOCHS):
+    """
+    Trains, converts and profiles one variant (runs in a worker process).
+    X.npy is opened as a memory map, so every worker reads the same page-cached features
+    and training batches are gathered from it one at a time.
+    Returns a result row (without latency, which is measured afterwards on an idle machine).
+    """
+    import tensorflow as tf
+    from src.evaluate_quantized import predict_tflite, accuracy
+    from src.profile_model import profile_model
+    train = importlib.import_module("src.2_train")
+    convert = importlib.import_module("src.3_convert")
+
+    X = np.load(os.path.join(DATA_DIR, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(DATA_DIR, "y.npy"))
+    train_idx, test_idx = split_indices(len(y))
+    X_test = np.asarray(X[test_idx], dtype=np.float32)
+    rng = np.random.default_rng([SPLIT_SEED, depth, int(width * 100)])
+
+    def batches():
+        order = rng.permutation(train_idx)
+        for start in range(0, len(order), BATCH_SIZE):
+            idx = np.sort(order[start:start + BATCH_SIZE])  # Sequential reads from the memory map
+            yield np.asarray(X[idx], dtype=np.float32), y[idx]
+
+    train_ds = tf.data.Dataset.from_generator(batches, output_signature=(
+        tf.TensorSpec((None, *X.shape[1:]), tf.float32), tf.TensorSpec((None,), y.dtype))).prefetch(2)
+
+    model = train.build_ds_cnn(X.shape[1:], len(CLASSES), width=width, depth=depth)
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    model.fit(train_ds, epochs=epochs, verbose=0)
+    float_accuracy = accuracy(y[test_idx], model.predict(X_test, batch_size=BATCH_SIZE, verbose=0))
+
+    def representative_dataset():
+        for i in train_idx[:CALIBRATION_SAMPLES]:
+            yield [np.asarray(X[i:i + 1], dtype=np.float32)]
+
+    name = variant_name(width, depth)
+    model_path = os.path.join(SWEEP_DIR, name + ".tflite")
+    with open(model_path, "wb") as f:
+        f.write(convert.quantize_to_int8(model, representative_dataset))
+
+    probs, _ = predict_tflite(X_test, model_path, workers=1)
+    profile = profile_model(model_path, latency_runs=0)
+    return {
+        "name": name, "width": width, "depth": depth, "params": model.count_params(),
+        "flash_kb": profile["flash_bytes"] / 1024, "arena_kb": profile["arena_bytes"] / 1024,
+        "macs": profile["macs"], "float_accuracy": float_accuracy,
+        "int8_accuracy": accuracy(y[test_idx], probs),
+    }
+
+
+def measure_latency(rows, runs=LATENCY_RUNS):
+    """Median per-window int8 latency (batch size 1, one thread), one model at a time."""
+    from src.evaluate_quantized import window_latency
+    X = np.load(os.path.join(DATA_DIR, "X.npy"), mmap_mode="r")
+    _, test_idx = split_indices(len(X))
+    X_test = np.asarray(X[test_idx[:runs]], dtype=np.float32)
+    for row in rows:
+        row["latency_ms"] = float(np.median(window_latency(X_test, os.path.join(SWEEP_DIR, row["name"] + ".tflite"), runs)))
+
+
+def mark_pareto(rows, cost="latency_ms"):
+    """Flags rows no other variant beats on both int8 accuracy and `cost`."""
+    for row in rows:
+        row["pareto"] = not any(
+            other["int8_accuracy"] >= row["int8_accuracy"] and other[cost] <= row[cost]
+            and (other["int8_accuracy"] > row["int8_accuracy"] or other[cost] < row[cost])
+            for other in rows)
+
+
+def print_table(rows):
+    print(f"{'Variant':<18} {'Params':>8} {'Flash KB':>9} {'Arena KB':>9} {'MACs':>11} "
+          f"{'Float %':>8} {'Int8 %':>7} {'ms':>7}  Pareto")
+    for r in rows:
+        print(f"{r['name']:<18} {r['params']:>8,} {r['flash_kb']:>9.1f} {r['arena_kb']:>9.1f} {r['macs']:>11,} "
+              f"{r['float_accuracy']:>8.2f} {r['int8_accuracy']:>7.2f} {r['latency_ms']:>7.3f}  {'*' if r['pareto'] else ''}")
+
+
+def save_csv(rows, path=RESULTS_CSV):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Results saved to {path}")
+
+
+def plot_pareto(rows, path=RESULTS_PLOT):
+    import matplotlib.pyplot as plt
+    axes_spec = [("flash_kb", "Model size (KB)"), ("macs", "MACs per inference"), ("latency_ms", "Host int8 latency (ms)")]
+    fig, axes = plt.subplots(1, len(axes_spec), figsize=(18, 5), sharey=True)
+    for ax, (key, label) in zip(axes, axes_spec):
+        for depth in sorted({r["depth"] for r in rows}):
+            group = [r for r in rows if r["depth"] == depth]
+            ax.scatter([r[key] for r in group], [r["int8_accuracy"] for r in group], label=f"depth {depth}")
+        front = sorted((r for r in rows if r["pareto"]), key=lambda r: r[key])
+        ax.plot([r[key] for r in front], [r["int8_accuracy"] for r in front], "k--", linewidth=1, label="Pareto (latency)")
+        for r in rows:
+            ax.annotate(f"w{r['width']:g}", (r[key], r["int8_accuracy"]), fontsize=7,
+                        textcoords="offset points", xytext=(3, 3))
+        ax.set_xscale("log")
+        ax.set_xlabel(label)
+        ax.grid(True, alpha=0.3)
+    axes[0].set_ylabel("Int8 accuracy (%)")
+    axes[0].legend()
+    fig.suptitle("DS-CNN width/depth sweep")
+    fig.tight_layout()
+    fig.savefig(path)
+    print(f"Pareto plot saved to {path}")
+
+
+def sweep(widths=WIDTHS, depths=DEPTHS, epochs=EPOCHS, workers=WORKERS):
+    """Trains every (width, depth) variant over `workers` processes. Returns the result rows."""
+    ensure_dir(SWEEP_DIR)
+    variants = list(itertools.product(widths, depths))
+    threads = max(1, os.cpu_count() // workers)
+
+    rows = []
+    # spawn: TensorFlow is not fork-safe once its runtime has started
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(threads,)) as pool:
+        futures = {pool.submit(train_variant, w, d, epochs): (w, d) for w, d in variants}
+        for future in as_completed(futures):
+            row = future.result()
+            print(f"[{len(rows) + 1}/{len(variants)}] {row['name']}: int8 {row['int8_accuracy']:.2f}%, "
+                  f"{row['flash_kb']:.1f} KB, {row['macs']:,} MACs")
+            rows.append(row)
+
+    rows.sort(key=lambda r: (r["depth"], r["width"]))
+    measure_latency(rows)
+    mark_pareto(rows)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train DS-CNN width/depth variants and report accuracy vs size, MACs and latency.")
+    parser.add_argument("--widths", type=float, nargs="+", default=WIDTHS)
+    parser.add_argument("--depths", type=int, nargs="+", default=DEPTHS)
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(DATA_DIR, "X.npy")):
+        print("Error: X.npy or y.npy not found. Run 1_preprocess.py first.")
+        sys.exit(1)
+
+    rows = sweep(args.widths, args.depths, args.epochs, args.workers)
+    print()
+    print_table(rows)
+    save_csv(rows)
+    plot_pareto(rows)
+
+
+if __name__ == "__main__":
+    main()
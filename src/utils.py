@@ -5,8 +5,11 @@ CLASSES = ["background", "chainsaw", "gunshot"]
 SAMPLE_RATE = 16000
 DURATION = 2.0
 
-METADATA_URL = "https://raw.githubusercontent.com/karolpiczak/ESC-50/master/meta/esc50.csv"
-AUDIO_BASE_URL = "https://raw.githubusercontent.com/karolpiczak/ESC-50/master/audio/"
+ESC50_URL = "https://raw.githubusercontent.com/karolpiczak/ESC-50/master/"
+METADATA_PATH = "meta/esc50.csv"  # Relative to ESC50_URL (or a local ESC-50 mirror)
+AUDIO_PATH = "audio/"
+METADATA_URL = ESC50_URL + METADATA_PATH
+AUDIO_BASE_URL = ESC50_URL + AUDIO_PATH
 METADATA_FILENAME = "esc50.csv"
 
 N_MELS = 64
@@ -14,7 +17,15 @@ N_FFT = 1024
 HOP_LENGTH = 512
 MODEL_DIR = "models"
 INPUT_SHAPE = (64, 63, 1)
+
+# Sliding window (real-time detector and offline scanner)
+BLOCK_SIZE = int(SAMPLE_RATE * DURATION)
+WINDOW_STEP = 0.5  # Seconds
+# Rounded to whole STFT hops so consecutive windows share mel frames (8192 samples = 0.512s)
+STEP_SIZE = int(round(SAMPLE_RATE * WINDOW_STEP / HOP_LENGTH)) * HOP_LENGTH
 SYNTHETIC_DIR = os.path.join(DATA_DIR, "synthetic_train")
+SYNTHETIC_SHARD_DIR = os.path.join(DATA_DIR, "synthetic_shards")
+SYNTHETIC_FORMAT = "wav"  # "wav" (one file per mixture in SYNTHETIC_DIR) or "shards" (int16 shards + manifest, see shard_dataset.py)
 
 def ensure_dir(directory):
     """
@@ -23,3 +34,22 @@ def ensure_dir(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
         print(f"Created directory: {directory}")
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    Returns the SHA-256 hex digest of a file's content.
+    """
+    import hashlib
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def params_digest(params):
+    """
+    Returns a short stable digest of a dict of parameters (used to key caches).
+    """
+    import hashlib
+    import json
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
@@ -0,0 +1,69 @@
+import numpy as np
+import librosa
+
+from src.utils import SAMPLE_RATE, DURATION, N_MELS, N_FFT, HOP_LENGTH
+from src.features import StreamingMelSpectrogram, log_mel_spectrogram
+
+BLOCK_SIZE = int(SAMPLE_RATE * DURATION)
+TOLERANCE_DB = 1e-2  # Max allowed absolute difference in dB (float32 FFT round-off near the -80 dB floor)
+NUM_HOPS = 24
+
+def reference_log_mel(audio):
+    """Full-window Log-Mel-Spectrogram (Same logic as 1_preprocess.py)."""
+    mel_spec = librosa.feature.melspectrogram(y=audio, sr=SAMPLE_RATE, n_mels=N_MELS, n_fft=N_FFT, hop_length=HOP_LENGTH)
+    return librosa.power_to_db(mel_spec, ref=np.max)
+
+def check_streaming(step_size, seed=0):
+    """Replays random audio through the streaming frontend and compares every window."""
+    rng = np.random.default_rng(seed)
+    frontend = StreamingMelSpectrogram(window_size=BLOCK_SIZE)
+    buffer = np.zeros(BLOCK_SIZE, dtype=np.float32)
+
+    max_err = 0.0
+    for i in range(NUM_HOPS):
+        # Mix of silence, noise bursts and tones so the ref=np.max scaling changes
+        t = np.arange(step_size) / SAMPLE_RATE
+        block = rng.uniform(0, 1) * np.sin(2 * np.pi * rng.uniform(100, 4000) * t)
+        if i % 3 == 0:
+            block = block + rng.standard_normal(step_size) * rng.uniform(0, 0.5)
+        block = block.astype(np.float32)
+
+        buffer = np.roll(buffer, -step_size)
+        buffer[-step_size:] = block
+        streamed = frontend.push(block)
+        max_err = max(max_err, float(np.max(np.abs(streamed - reference_log_mel(buffer)))))
+
+    ok = max_err <= TOLERANCE_DB
+    print(f"[{'OK' if ok else 'FAIL'}] Streaming step={step_size}: max error {max_err:.2e} dB")
+    return ok
+
+def check_batch(batch_size=16, seed=0):
+    """Compares the batched engine against librosa clip by clip."""
+    rng = np.random.default_rng(seed)
+    gains = rng.uniform(0, 1, size=(batch_size, 1))
+    batch = (rng.standard_normal((batch_size, BLOCK_SIZE)) * gains).astype(np.float32)
+    batch[0] = 0.0  # Silent clip (all values clipped to -TOP_DB)
+
+    batched = log_mel_spectrogram(batch)
+    max_err = max(float(np.max(np.abs(batched[i] - reference_log_mel(batch[i])))) for i in range(batch_size))
+
+    ok = max_err <= TOLERANCE_DB
+    print(f"[{'OK' if ok else 'FAIL'}] Batched N={batch_size}: max error {max_err:.2e} dB")
+    return ok
+
+def main():
+    print("Verifying Mel Features...")
+    all_passed = check_batch()
+
+    # Frame-aligned hop (incremental path), unaligned hop (full recompute fallback)
+    for step_size in [16 * HOP_LENGTH, 8000, HOP_LENGTH]:
+        if not check_streaming(step_size):
+            all_passed = False
+
+    if all_passed:
+        print("\nSUCCESS: Batched and streaming features match librosa.")
+    else:
+        print("\nWARNING: Features differ from librosa.")
+
+if __name__ == "__main__":
+    main()
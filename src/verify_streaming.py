@@ -0,0 +1,81 @@
+import os
+import time
+import importlib
+import numpy as np
+import tensorflow as tf
+
+from src.utils import CLASSES, INPUT_SHAPE, BLOCK_SIZE, STEP_SIZE
+from src.features import StreamingMelSpectrogram
+from src.inference import KERAS_MODEL_PATH
+from src.streaming_model import StreamingBackend, HOP_FRAMES
+
+TOLERANCE = 1e-4  # Max allowed absolute difference in probability (float32 round-off, BatchNorm folding)
+NUM_HOPS = 24
+
+
+def load_keras_model():
+    if os.path.exists(KERAS_MODEL_PATH):
+        return tf.keras.models.load_model(KERAS_MODEL_PATH)
+    # Equivalence does not depend on the weights, so an untrained model is fine here
+    print(f"Warning: {KERAS_MODEL_PATH} not found. Checking an untrained build_ds_cnn.")
+    train = importlib.import_module("src.2_train")
+    return train.build_ds_cnn(INPUT_SHAPE, len(CLASSES))
+
+
+def compare(model, windows, title):
+    """Runs consecutive windows through the streaming and full-window models and compares every output."""
+    streaming = StreamingBackend(model=model)
+    max_err, agree, stream_s, full_s = 0.0, 0, 0.0, 0.0
+    for window in windows:
+        start = time.perf_counter()
+        streamed = streaming.predict(window[np.newaxis])
+        stream_s += time.perf_counter() - start
+        start = time.perf_counter()
+        full = model(window[np.newaxis], training=False).numpy()
+        full_s += time.perf_counter() - start
+        max_err = max(max_err, float(np.max(np.abs(streamed - full))))
+        agree += int(np.argmax(streamed) == np.argmax(full))
+
+    ok = max_err <= TOLERANCE and agree == len(windows)
+    print(f"[{'OK' if ok else 'FAIL'}] {title}: max error {max_err:.2e}, {agree}/{len(windows)} same class, "
+          f"{streaming.reuse_ratio * 100:.0f}% of columns reused "
+          f"({stream_s / len(windows) * 1000:.2f} ms vs {full_s / len(windows) * 1000:.2f} ms per window)")
+    return ok
+
+
+def feature_windows(seed=0):
+    """Sliding windows over a random mel-frame stream (hop-invariant features: every hop can reuse the cache)."""
+    rng = np.random.default_rng(seed)
+    n_mels, n_frames = INPUT_SHAPE[:2]
+    stream = rng.uniform(-80, 0, size=(n_mels, n_frames + NUM_HOPS * HOP_FRAMES)).astype(np.float32)
+    return [stream[:, i * HOP_FRAMES:i * HOP_FRAMES + n_frames, np.newaxis] for i in range(NUM_HOPS)]
+
+
+def audio_windows(seed=0):
+    """Windows from the live frontend over noise with a loud burst (normalised to the window maximum)."""
+    rng = np.random.default_rng(seed)
+    frontend = StreamingMelSpectrogram(window_size=BLOCK_SIZE)
+    windows = []
+    for i in range(NUM_HOPS):
+        block = rng.standard_normal(STEP_SIZE).astype(np.float32) * 0.05
+        if i == NUM_HOPS // 2:
+            block[:STEP_SIZE // 4] *= 20  # The window maximum changes when this enters and leaves
+        windows.append(frontend.push(block)[..., np.newaxis].copy())
+    return windows
+
+
+def main():
+    print("Verifying Streaming Model...")
+    model = load_keras_model()
+    all_passed = compare(model, feature_windows(), "Shifted mel frames")
+    if not compare(model, audio_windows(), "Live frontend"):
+        all_passed = False
+
+    if all_passed:
+        print("\nSUCCESS: Streaming model matches the full-window model.")
+    else:
+        print("\nWARNING: Streaming model differs from the full-window model.")
+
+
+if __name__ == "__main__":
+    main()